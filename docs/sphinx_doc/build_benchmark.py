@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""Reproducible benchmarks of ``build_versions.py`` on synthetic repositories
+
+Each run generates a git repository of a configurable size (tags, markdown
+pages with ``_ZH`` translations, an importable package, large extra assets)
+next to a local bare ``origin``, copies the current docs template into it and
+times these scenarios with the template's own ``build_versions.py``:
+
+* ``cold``: first build of ``main`` and every tag;
+* ``warm``: the same build again, nothing changed;
+* ``add-tag``: a new release tag was pushed;
+* ``edit-page``: one page of ``main`` was edited.
+
+Everything is generated from a seed with fixed commit dates and runs offline.
+Results are written as JSON and compared against a saved baseline::
+
+    python build_benchmark.py run --output bench.json --baseline baseline.json
+    python build_benchmark.py compare baseline.json bench.json
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import random
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from build_versions import (
+    DOCS_REL,
+    DOCS_SOURCE_IGNORE,
+    PACKAGE_DIR,
+    REPO_ROOT,
+    load_extra_assets_config,
+)
+from copy_strategy import copy_tree
+
+SCENARIOS = ["cold", "warm", "add-tag", "edit-page"]
+DEFAULT_BUILD_ARGS = "--incremental --keep-worktrees"
+DEFAULT_THRESHOLD = 0.10  # Relative slowdown reported as a regression
+DEFAULT_MIN_DELTA = 1.0  # Seconds; smaller slowdowns are treated as noise
+RESULTS_VERSION = 1
+
+# Fixed identity and dates so generated commits (and their SHAs) are reproducible
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@localhost",
+    "GIT_COMMITTER_NAME": "benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@localhost",
+    "GIT_AUTHOR_DATE": "2024-01-01T00:00:00+00:00",
+    "GIT_COMMITTER_DATE": "2024-01-01T00:00:00+00:00",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+WORDS = (
+    "data operator filter mapper pipeline sample dataset quality text image "
+    "video audio token model recipe config process batch export analyze "
+    "deduplicate clean format field score ratio language stats"
+).split()
+
+
+@dataclass
+class BenchSpec:
+    """Size of the synthetic repository and how it is built"""
+
+    tags: int = 3
+    pages: int = 40
+    translated: float = 0.5  # Share of pages with a _ZH translation
+    modules: int = 10
+    asset_files: int = 4
+    asset_mb: int = 20  # Total size of the extra assets
+    languages: list[str] = field(default_factory=lambda: ["en", "zh_CN"])
+    build_args: str = DEFAULT_BUILD_ARGS  # Extra build_versions.py arguments
+    seed: int = 0
+
+
+def git(repo: Path, *args: str):
+    subprocess.run(
+        ["git", *args],
+        cwd=repo,
+        env={**os.environ, **GIT_ENV},
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def commit(repo: Path, message: str):
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def page_text(
+    rng: random.Random, index: int, pages: int, zh: bool = False, translated: int = 0
+) -> str:
+    """A page linking to the next one; the first ``translated`` have a ``_ZH`` copy"""
+    title = f"Page {index}" + (" (中文)" if zh else "")
+    lines = [f"# {title}", ""]
+    for section in range(3):
+        lines += [f"## Section {section}", ""]
+        lines += [" ".join(sentence(rng) for _ in range(5)), ""]
+        lines += ["```python", f"result = process(batch_{section})", "```", ""]
+        lines += ["| field | score |", "| --- | --- |"]
+        lines += [f"| {rng.choice(WORDS)} | {rng.random():.3f} |" for _ in range(3)]
+        lines.append("")
+    following = (index + 1) % pages
+    # Chinese pages link to the translation of the next page if it has one
+    suffix = "_ZH" if zh and following < translated else ""
+    lines.append(f"See [page {following}](page_{following:04d}{suffix}.md).")
+    return "\n".join(lines) + "\n"
+
+
+def module_text(rng: random.Random, index: int) -> str:
+    lines = [f'"""{sentence(rng, 6)}"""', ""]
+    for c in range(3):
+        lines += [
+            "",
+            f"class Op{index}_{c}:",
+            f'    """{sentence(rng)}',
+            "",
+            "    Args:",
+            "        ratio (float): " + sentence(rng, 6),
+            '    """',
+            "",
+            "    def __init__(self, ratio: float = 0.5):",
+            "        self.ratio = ratio",
+        ]
+        for m in range(3):
+            lines += [
+                "",
+                f"    def method_{m}(self, sample: dict) -> dict:",
+                f'        """{sentence(rng, 8)}',
+                "",
+                "        Returns:",
+                "            dict: " + sentence(rng, 5),
+                '        """',
+                "        return sample",
+            ]
+    lines += ["", "", f"def helper_{index}(value: int) -> int:"]
+    lines += [f'    """{sentence(rng, 8)}"""', "    return value", ""]
+    return "\n".join(lines)
+
+
+def copy_template(repo: Path):
+    """The docs template under test, as ``build_versions.py`` copies it"""
+    copy_tree(REPO_ROOT / DOCS_REL, repo / DOCS_REL, ignore=DOCS_SOURCE_IGNORE)
+
+
+def generate_repo(work_dir: Path, spec: BenchSpec) -> Path:
+    """Create ``work_dir/repo`` with ``spec.tags`` tags and a bare origin"""
+    rng = random.Random(spec.seed)
+    origin, repo = work_dir / "origin.git", work_dir / "repo"
+    origin.mkdir(parents=True)
+    git(origin, "init", "-q", "--bare", "-b", "main")
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "remote", "add", "origin", str(origin))
+
+    (repo / "README.md").write_text(
+        "# Benchmark\n\n" + sentence(rng, 30) + "\n", encoding="utf-8"
+    )
+    (repo / "README_ZH.md").write_text(
+        "# 基准测试\n\n" + sentence(rng, 30) + "\n", encoding="utf-8"
+    )
+    docs = repo / "docs"
+    docs.mkdir()
+    translated = round(spec.pages * spec.translated)
+    for i in range(spec.pages):
+        name = f"page_{i:04d}"
+        text = page_text(rng, i, spec.pages)
+        (docs / f"{name}.md").write_text(text, encoding="utf-8")
+        if i < translated:
+            text = page_text(rng, i, spec.pages, zh=True, translated=translated)
+            (docs / f"{name}_ZH.md").write_text(text, encoding="utf-8")
+    (docs / "changelog.md").write_text("# Changelog\n\n", encoding="utf-8")
+
+    package = repo / PACKAGE_DIR
+    package.mkdir()
+    (package / "__init__.py").write_text('"""Synthetic package"""\n', "utf-8")
+    for i in range(spec.modules):
+        (package / f"module_{i:03d}.py").write_text(module_text(rng, i), "utf-8")
+
+    assets = load_extra_assets_config()["assets"]
+    if assets and spec.asset_files:
+        asset_dir = repo / assets[0]
+        asset_dir.mkdir(parents=True, exist_ok=True)
+        size = spec.asset_mb * 1024 * 1024 // spec.asset_files
+        for i in range(spec.asset_files):
+            (asset_dir / f"asset_{i:03d}.bin").write_bytes(rng.randbytes(size))
+
+    copy_template(repo)
+    commit(repo, "Initial commit")
+    for _ in range(spec.tags):
+        add_tag(repo)
+    git(repo, "push", "-q", "origin", "main", "--tags")
+    return repo
+
+
+def add_tag(repo: Path) -> str:
+    """Commit a changelog entry and tag it as the next minor version"""
+    out = subprocess.check_output(["git", "tag"], cwd=repo, text=True)
+    tag = f"v0.{len(out.split()) + 1}.0"
+    with open(repo / "docs" / "changelog.md", "a", encoding="utf-8") as f:
+        f.write(f"- {tag}\n")
+    commit(repo, f"Release {tag}")
+    git(repo, "tag", tag)
+    return tag
+
+
+def edit_page(repo: Path):
+    page = repo / "docs" / "page_0000.md"
+    with open(page, "a", encoding="utf-8") as f:
+        f.write("\nEdited paragraph.\n")
+    commit(repo, "Edit a page")
+
+
+def run_build(repo: Path, spec: BenchSpec, log_path: Path) -> float:
+    """Time one ``build_versions.py`` run of main and all tags"""
+    cmd = [
+        sys.executable,
+        str(DOCS_REL / "build_versions.py"),
+        "--branches",
+        "main",
+        "--tags",
+        "--languages",
+        *spec.languages,
+        *shlex.split(spec.build_args),
+    ]
+    env = dict(os.environ, PROJECT="benchmark")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run(
+            cmd, cwd=repo, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"[BENCH] Build failed, see {log_path}")
+    return seconds
+
+
+def run_scenarios(work_dir: Path, spec: BenchSpec, run: int) -> dict[str, float]:
+    """One fresh repository, timed through every scenario in order"""
+    repo = generate_repo(work_dir / f"run{run}", spec)
+    logs = work_dir / "logs"
+    logs.mkdir(exist_ok=True)
+    times = {}
+    for scenario in SCENARIOS:
+        if scenario == "add-tag":
+            add_tag(repo)
+            git(repo, "push", "-q", "origin", "main", "--tags")
+        elif scenario == "edit-page":
+            edit_page(repo)
+            git(repo, "push", "-q", "origin", "main")
+        times[scenario] = run_build(repo, spec, logs / f"{scenario}-{run}.log")
+        print(f"[BENCH] run {run + 1} {scenario}: {times[scenario]:.2f}s")
+    return times
+
+
+def environment() -> dict:
+    try:
+        sphinx = importlib.metadata.version("sphinx")
+    except importlib.metadata.PackageNotFoundError:
+        sphinx = None
+    git_version = subprocess.check_output(["git", "--version"], text=True).strip()
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "sphinx": sphinx,
+        "git": git_version,
+        "cpus": os.cpu_count(),
+    }
+
+
+def template_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(spec: BenchSpec, repeat: int, work_dir: Path) -> dict:
+    runs = [run_scenarios(work_dir, spec, i) for i in range(repeat)]
+    return {
+        "version": RESULTS_VERSION,
+        "spec": asdict(spec),
+        "environment": environment(),
+        "template_commit": template_commit(),
+        "scenarios": {
+            name: {
+                "median": statistics.median(r[name] for r in runs),
+                "runs": [r[name] for r in runs],
+            }
+            for name in SCENARIOS
+        },
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta: float = DEFAULT_MIN_DELTA,
+) -> tuple[str, list[str]]:
+    """Table of median times and the scenarios that regressed"""
+    lines, regressions = [], []
+    if baseline.get("spec") != current.get("spec"):
+        lines.append("[WARN] Baseline was measured with a different spec")
+    if baseline.get("environment") != current.get("environment"):
+        lines.append("[WARN] Baseline was measured in a different environment")
+    lines.append(f"{'scenario':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            lines.append(f"{name:<12} {'-':>10} {result['median']:>9.2f}s")
+            continue
+        old, new = base["median"], result["median"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if new > old * (1 + threshold) and new - old > min_delta:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        lines.append(f"{name:<12} {old:>9.2f}s {new:>9.2f}s {change:>+7.1%}{flag}")
+    return "\n".join(lines), regressions
+
+
+def report_comparison(baseline_path: Path, current: dict, args) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    table, regressions = compare(baseline, current, args.threshold, args.min_delta)
+    print(table)
+    if regressions:
+        print(f"[BENCH] Regressions: {', '.join(regressions)}")
+        return 1
+    print("[BENCH] No regressions")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark documentation builds on synthetic repositories"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Generate repositories and time the builds")
+    defaults = BenchSpec()
+    run.add_argument("--tags", type=int, default=defaults.tags, metavar="N")
+    run.add_argument("--pages", type=int, default=defaults.pages, metavar="M")
+    run.add_argument(
+        "--translated",
+        type=float,
+        default=defaults.translated,
+        metavar="RATIO",
+        help=f"Share of pages with a _ZH translation (default: {defaults.translated})",
+    )
+    run.add_argument("--modules", type=int, default=defaults.modules, metavar="K")
+    run.add_argument("--asset-files", type=int, default=defaults.asset_files)
+    run.add_argument(
+        "--asset-mb",
+        type=int,
+        default=defaults.asset_mb,
+        help=f"Total size of the extra assets (default: {defaults.asset_mb})",
+    )
+    run.add_argument(
+        "--languages", "-l", nargs="+", default=defaults.languages, metavar="LANG"
+    )
+    run.add_argument(
+        "--build-args",
+        default=DEFAULT_BUILD_ARGS,
+        help=f"Extra build_versions.py arguments (default: '{DEFAULT_BUILD_ARGS}')",
+    )
+    run.add_argument("--seed", type=int, default=defaults.seed)
+    run.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        metavar="R",
+        help="Run every scenario R times on fresh repositories and keep the median",
+    )
+    run.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="Where repositories are generated (default: a temporary directory, "
+        "removed afterwards)",
+    )
+    run.add_argument("--output", "-o", type=Path, default=Path("benchmark.json"))
+    run.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Compare against this results file; exits with 1 on a regression",
+    )
+
+    cmp = sub.add_parser("compare", help="Compare two results files")
+    cmp.add_argument("baseline", type=Path)
+    cmp.add_argument("current", type=Path)
+
+    for p in (run, cmp):
+        p.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f"Relative slowdown counted as a regression (default: {DEFAULT_THRESHOLD})",
+        )
+        p.add_argument(
+            "--min-delta",
+            type=float,
+            default=DEFAULT_MIN_DELTA,
+            metavar="SECONDS",
+            help=f"Ignore slowdowns below this many seconds (default: {DEFAULT_MIN_DELTA})",
+        )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "compare":
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+        return report_comparison(args.baseline, current, args)
+
+    spec = BenchSpec(
+        tags=args.tags,
+        pages=args.pages,
+        translated=args.translated,
+        modules=args.modules,
+        asset_files=args.asset_files,
+        asset_mb=args.asset_mb,
+        languages=args.languages,
+        build_args=args.build_args,
+        seed=args.seed,
+    )
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="docs-bench-"))
+    print(f"[BENCH] Generating repositories in {work_dir}")
+    try:
+        results = run_benchmark(spec, args.repeat, work_dir)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    args.output.write_text(json.dumps(results, indent=1), encoding="utf-8")
+    print(f"[BENCH] Results written to {args.output}")
+    if args.baseline is not None:
+        return report_comparison(args.baseline, results, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
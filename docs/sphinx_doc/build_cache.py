@@ -0,0 +1,169 @@
+"""Persistent, content-addressed cache of built documentation outputs
+
+Each entry holds the HTML output of one (version, language) build and is
+addressed by a key derived from everything that can change that output: the
+commit being documented, the shared docs template, the language, the build
+options and the relevant environment. Entries are evicted in least recently
+used order once the cache grows beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from importlib import metadata
+from pathlib import Path
+
+# Environment variables read by conf.py that change the rendered output
+CACHE_ENV_KEYS = [
+    "PROJECT",
+    "REPO_OWNER",
+    "HTML_TITLE",
+    "PACKAGE_DIR",
+    "JUICER_API_URL",
+]
+# Build toolchain whose version is part of every key
+TOOLCHAIN_PACKAGES = ["sphinx", "pydata-sphinx-theme", "myst-parser", "docutils"]
+# Directories under the docs template that never affect the build
+TEMPLATE_IGNORE = {"build", "__pycache__", "node_modules", ".git"}
+# Build artifacts that are not worth keeping in the cache
+OUTPUT_IGNORE = [".doctrees"]
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(value: str) -> int:
+    """Parse a human readable size such as ``500M`` or ``10G`` into bytes"""
+    value = value.strip().upper().removesuffix("B")
+    unit = value[-1] if value and value[-1] in SIZE_UNITS else ""
+    number = value[: -len(unit)] if unit else value
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def hash_tree(root: Path, ignore=TEMPLATE_IGNORE) -> str:
+    """Hash relative paths and contents of all files below ``root``"""
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in ignore)
+        for name in sorted(filenames):
+            path = Path(dirpath) / name
+            digest.update(path.relative_to(root).as_posix().encode())
+            digest.update(b"\0")
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def toolchain_versions() -> dict[str, str]:
+    """Installed versions of the packages that render the docs"""
+    versions = {}
+    for name in TOOLCHAIN_PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = ""
+    return versions
+
+
+def dir_size(path: Path) -> int:
+    """Total size in bytes of all files below ``path``"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class BuildCache:
+    """Directory of cached build outputs with LRU eviction
+
+    Layout::
+
+        <cache_dir>/entries/<key>/        copy of SITE_DIR/<lang>/<version>
+        <cache_dir>/entries/<key>.json    size, label and last access time
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.entries_dir = self.cache_dir / "entries"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Derive an entry key from the JSON-serializable build inputs"""
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry(self, key: str) -> tuple[Path, Path]:
+        return self.entries_dir / key, self.entries_dir / f"{key}.json"
+
+    def _read_meta(self, meta_path: Path) -> dict | None:
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path: Path, meta: dict):
+        tmp = meta_path.with_suffix(f".tmp{os.getpid()}-{threading.get_ident()}")
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, meta_path)
+
+    def restore(self, key: str, out_dir: Path) -> bool:
+        """Replace ``out_dir`` with the cached output for ``key`` if present"""
+        entry, meta_path = self._entry(key)
+        with self._lock:
+            meta = self._read_meta(meta_path)
+            if meta is None or not entry.is_dir():
+                return False
+            meta["last_used"] = time.time()
+            self._write_meta(meta_path, meta)
+
+        if out_dir.exists():
+            shutil.rmtree(out_dir)
+        out_dir.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copytree(entry, out_dir)
+        return True
+
+    def store(self, key: str, out_dir: Path, **info):
+        """Copy a finished build into the cache and evict old entries"""
+        entry, meta_path = self._entry(key)
+        tmp = self.entries_dir / f".{key}.tmp{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(out_dir, tmp, ignore=shutil.ignore_patterns(*OUTPUT_IGNORE))
+
+        with self._lock:
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+            now = time.time()
+            meta = dict(info, size=dir_size(entry), created=now, last_used=now)
+            self._write_meta(meta_path, meta)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its limit"""
+        entries = []
+        for meta_path in self.entries_dir.glob("*.json"):
+            meta = self._read_meta(meta_path)
+            if meta is not None:
+                entries.append((meta.get("last_used", 0), meta_path, meta))
+
+        total = sum(meta.get("size", 0) for _, _, meta in entries)
+        for _, meta_path, meta in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            key = meta_path.stem
+            print(f"[CACHE] evict {meta.get('label', key)} ({key[:12]})")
+            meta_path.unlink(missing_ok=True)
+            shutil.rmtree(self.entries_dir / key, ignore_errors=True)
+            total -= meta.get("size", 0)
@@ -0,0 +1,328 @@
+"""Phase timing of documentation builds (``build_versions.py --profile``)
+
+``build_versions.py`` records spans (git fetch, checkout, template copy,
+source aggregation, sphinx-apidoc, every sphinx-build run) in ``PROFILER``.
+The ``build_timing`` Sphinx extension adds the phases of each sphinx-build,
+per-document read and write times, the slowest imports and the peak RSS.
+``write_reports`` merges both into one JSON file per (ref, language) and an
+aggregate text and HTML report, optionally with a Chrome trace that opens in
+chrome://tracing or https://ui.perfetto.dev.
+
+Re-render the reports of a profile directory with::
+
+    python build_profile.py DIR [--trace]
+"""
+
+import argparse
+import html
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+TOP_N = 15  # Rows in the "slowest" tables of the aggregate report
+
+
+class Profiler:
+    """Thread-safe recorder of named, timed spans"""
+
+    def __init__(self):
+        self.out_dir: Path | None = None
+        self.spans: list[dict] = []
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.out_dir is not None
+
+    def enable(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, ref: str | None = None, lang: str | None = None, **args):
+        """Time the body as ``name``; spans of a ref without a language (e.g.
+        its checkout) count towards every language of that ref
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            span = {
+                "name": name,
+                "ref": ref,
+                "lang": lang,
+                "start": start,
+                "duration": time.time() - start,
+                "thread": threading.get_ident(),
+                "args": args,
+            }
+            with self.lock:
+                self.spans.append(span)
+
+    def sphinx_profile(self, ref: str, lang: str) -> Path | None:
+        """Where the build_timing extension writes the data of one build"""
+        if not self.enabled:
+            return None
+        return self.out_dir / f"{ref}-{lang}.sphinx.json"
+
+
+PROFILER = Profiler()
+
+
+def collect_profiles(profiler: Profiler, builds: list[tuple[str, str]]) -> list[dict]:
+    """Merge pipeline spans and sphinx data into one profile per build"""
+    profiles = []
+    for ref, lang in builds:
+        path = profiler.sphinx_profile(ref, lang)
+        try:
+            sphinx = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            sphinx = None
+        spans = [
+            s for s in profiler.spans if s["ref"] == ref and s["lang"] in (None, lang)
+        ]
+        profiles.append(
+            {
+                "ref": ref,
+                "lang": lang,
+                "pipeline": sorted(spans, key=lambda s: s["start"]),
+                "sphinx": sphinx,
+            }
+        )
+    return profiles
+
+
+def pipeline_totals(profile: dict) -> dict[str, float]:
+    totals = {}
+    for span in profile["pipeline"]:
+        totals[span["name"]] = totals.get(span["name"], 0.0) + span["duration"]
+    return totals
+
+
+def slowest(profiles: list[dict], section: str, key: str) -> list[tuple]:
+    """Top entries of a per-build sphinx table across all builds"""
+    rows = []
+    for profile in profiles:
+        for entry in (profile["sphinx"] or {}).get(section, []):
+            rows.append((entry[key], entry["name"], profile["ref"], profile["lang"]))
+    return sorted(rows, reverse=True)[:TOP_N]
+
+
+def render_text(profiles: list[dict], global_spans: list[dict]) -> str:
+    lines = []
+    for span in global_spans:
+        lines.append(f"{span['name']:<24} {span['duration']:8.2f}s")
+    if global_spans:
+        lines.append("")
+
+    for profile in profiles:
+        sphinx = profile["sphinx"] or {}
+        lines.append(f"== {profile['ref']} ({profile['lang']})")
+        for name, seconds in pipeline_totals(profile).items():
+            lines.append(f"  {name:<22} {seconds:8.2f}s")
+        for name, seconds in sphinx.get("phases", {}).items():
+            lines.append(f"    sphinx {name:<15} {seconds:8.2f}s")
+        if sphinx.get("peak_rss_mb") is not None:
+            lines.append(f"  {'peak RSS':<22} {sphinx['peak_rss_mb']:8.0f} MB")
+        lines.append("")
+
+    for title, section, key, unit in [
+        ("Slowest documents (read)", "read", "seconds", "s"),
+        ("Slowest documents (write)", "write", "seconds", "s"),
+        (
+            "Slowest imports during the build (autosummary, autodoc)",
+            "imports",
+            "cumulative",
+            "s",
+        ),
+        ("Slowest imports at startup", "startup_imports", "cumulative", "s"),
+    ]:
+        rows = slowest(profiles, section, key)
+        if not rows:
+            continue
+        lines.append(title)
+        for value, name, ref, lang in rows:
+            lines.append(f"  {value:8.3f}{unit}  {name}  [{ref} {lang}]")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render_html(profiles: list[dict], global_spans: list[dict]) -> str:
+    def table(headers, rows):
+        head = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in row) + "</tr>"
+            for row in rows
+        )
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    names = []
+    for profile in profiles:
+        for name in pipeline_totals(profile):
+            if name not in names:
+                names.append(name)
+    phases = []
+    for profile in profiles:
+        for name in (profile["sphinx"] or {}).get("phases", {}):
+            if name not in phases:
+                phases.append(name)
+    rows = []
+    for profile in profiles:
+        totals = pipeline_totals(profile)
+        sphinx = profile["sphinx"] or {}
+        rows.append(
+            [profile["ref"], profile["lang"]]
+            + [f"{totals[n]:.2f}" if n in totals else "" for n in names]
+            + [
+                f"{sphinx['phases'][p]:.2f}" if p in sphinx.get("phases", {}) else ""
+                for p in phases
+            ]
+            + [f"{sphinx['peak_rss_mb']:.0f}" if sphinx.get("peak_rss_mb") else ""]
+        )
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Build profile</title>",
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse;margin:1em 0}"
+        "td,th{border:1px solid #ccc;padding:2px 8px;text-align:right}"
+        "td:first-child,th:first-child{text-align:left}</style></head><body>",
+        "<h1>Build profile</h1>",
+    ]
+    if global_spans:
+        parts.append(
+            table(
+                ["step", "s"],
+                [[s["name"], f"{s['duration']:.2f}"] for s in global_spans],
+            )
+        )
+    parts.append("<h2>Builds (seconds)</h2>")
+    parts.append(
+        table(
+            ["ref", "lang"] + names + [f"sphinx {p}" for p in phases] + ["peak RSS MB"],
+            rows,
+        )
+    )
+    for title, section, key in [
+        ("Slowest documents (read)", "read", "seconds"),
+        ("Slowest documents (write)", "write", "seconds"),
+        (
+            "Slowest imports during the build (autosummary, autodoc)",
+            "imports",
+            "cumulative",
+        ),
+        ("Slowest imports at startup", "startup_imports", "cumulative"),
+    ]:
+        top = slowest(profiles, section, key)
+        if top:
+            parts.append(f"<h2>{title}</h2>")
+            parts.append(
+                table(
+                    ["seconds", "name", "ref", "lang"],
+                    [[f"{v:.3f}", n, r, l] for v, n, r, l in top],
+                )
+            )
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def chrome_trace(profiles: list[dict], global_spans: list[dict]) -> dict:
+    """Trace Event Format: one process per build, pipeline and sphinx spans"""
+    events = []
+
+    def add(pid, tid, name, start, duration, args=None):
+        events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": int(start * 1e6),
+                "dur": int(duration * 1e6),
+                "args": args or {},
+            }
+        )
+
+    for span in global_spans:
+        add(0, "pipeline", span["name"], span["start"], span["duration"], span["args"])
+    events.append(
+        {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "run"}}
+    )
+    for pid, profile in enumerate(profiles, start=1):
+        label = f"{profile['ref']} ({profile['lang']})"
+        events.append(
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}}
+        )
+        for span in profile["pipeline"]:
+            add(
+                pid,
+                "pipeline",
+                span["name"],
+                span["start"],
+                span["duration"],
+                span["args"],
+            )
+        for span in (profile["sphinx"] or {}).get("events", []):
+            add(pid, span["track"], span["name"], span["start"], span["duration"])
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_reports(
+    out_dir: Path,
+    profiles: list[dict],
+    global_spans: list[dict],
+    trace: bool = False,
+):
+    """Write per-build JSON, report.txt, report.html and optionally trace.json"""
+    out_dir = Path(out_dir)
+    for profile in profiles:
+        path = out_dir / f"{profile['ref']}-{profile['lang']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(profile, indent=1), encoding="utf-8")
+    (out_dir / "run.json").write_text(
+        json.dumps({"pipeline": global_spans}, indent=1), encoding="utf-8"
+    )
+    text = render_text(profiles, global_spans)
+    (out_dir / "report.txt").write_text(text, encoding="utf-8")
+    (out_dir / "report.html").write_text(
+        render_html(profiles, global_spans), encoding="utf-8"
+    )
+    if trace:
+        (out_dir / "trace.json").write_text(
+            json.dumps(chrome_trace(profiles, global_spans)), encoding="utf-8"
+        )
+    return text
+
+
+def load_reports(out_dir: Path) -> tuple[list[dict], list[dict]]:
+    """Read back the per-build profiles written by ``write_reports``"""
+    profiles = []
+    for path in sorted(Path(out_dir).rglob("*.json")):
+        if path.name.endswith(".sphinx.json") or path.name in (
+            "run.json",
+            "trace.json",
+        ):
+            continue
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if "ref" in data and "lang" in data:
+            profiles.append(data)
+    try:
+        run = json.loads((Path(out_dir) / "run.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        run = {}
+    return profiles, run.get("pipeline", [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render build profile reports")
+    parser.add_argument("profile_dir", type=Path, help="Directory given to --profile")
+    parser.add_argument("--trace", action="store_true", help="Also write trace.json")
+    args = parser.parse_args()
+    profiles, global_spans = load_reports(args.profile_dir)
+    print(write_reports(args.profile_dir, profiles, global_spans, args.trace))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,49 @@
 #!/usr/bin/env python3
 import os
 import re
+import json
+import hashlib
+import sys
+import time
 import shutil
+import signal
 import subprocess
 import argparse
+import filecmp
+import tempfile
 import yaml
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 from packaging import version as pv
 
+from build_profile import PROFILER, collect_profiles, write_reports
+from static_assets import SHARED_DIR, optimize_site, release_static
+from search_shards import index_dirs, index_site
+from check_links import check_site, summarize, write_report
+from deploy_delta import write_manifests
+from image_assets import (
+    PIPELINE as IMAGE_PIPELINE,
+    process_images,
+    summarize as summarize_images,
+)
+from refs import RefIndex, load_previous
+from translate_pages import (
+    DEFAULT_BACKEND as DEFAULT_TRANSLATOR,
+    is_generated,
+    summarize as summarize_translation,
+    translate_missing,
+)
+from checkout import CHECKOUT_MODES, CheckoutSpec, materialize, remove_checkout
+from copy_strategy import COPY_MODES, ContentStore, CopyStats, copy_tree, place_file
+from build_cache import (
+    CACHE_ENV_KEYS,
+    BuildCache,
+    hash_tree,
+    parse_size,
+    toolchain_versions,
+)
+
 # Repository structure and build configuration
 MIN_TAG = os.environ.get("MIN_TAG", "v0.0.0")  # Minimum version tag to build
 PACKAGE_DIR = os.environ.get("PACKAGE_DIR", "data_juicer")  # API directory
@@ -18,24 +54,133 @@ EXTRA_DATA_REL = Path("tests/ops/data")
 WORKTREES_DIR = (
     REPO_ROOT / ".worktrees"
 )  # Temporary worktree directory for version builds
+LOG_DIR = WORKTREES_DIR / "_logs"  # Per-job build logs when running in parallel
+REF_INDEX_FILE = WORKTREES_DIR / "refs.json"  # Commits of all refs in the last run
+# Segment cache of --translate when no --cache-dir is given
+TRANSLATION_CACHE = WORKTREES_DIR / "_translations"
+# Image variants of --optimize-images when no --cache-dir is given
+IMAGE_CACHE = WORKTREES_DIR / "_images"
+DEFAULT_CACHE_SIZE = "5G"  # Size limit of the persistent build cache
+VERSIONS_MANIFEST = "versions.json"  # Version list read by the switcher at runtime
+BUILD_KEY_FILE = ".buildkey"  # Stamp of the inputs an output dir was built from
+DOCTREES_DIR = ".doctrees"  # sphinx-build's default doctree dir inside the output
+MEMORY_REPORT = "memory_budget.json"  # Written to DOCTREES_DIR by memory_budget
+APIDOC_STAMP = ".apidoc_stamp"  # Inputs the API rst in source/api was generated from
+APIDOC_TEMPLATES = Path("_templates")  # sphinx-apidoc -t, relative to the cwd
 DOCS_REL = Path("docs/sphinx_doc")
+# Never copied from the docs template into worktrees
+DOCS_SOURCE_IGNORE = {".git", "build", "__pycache__", "node_modules"}
+AGGREGATE_MANIFEST = ".aggregate_manifest.json"  # Sources synced into docs source
+# Directories never searched for markdown/rst sources
+AGGREGATE_EXCLUDE_DIRS = {
+    "outputs",
+    "sphinx_doc",
+    ".github",
+    ".git",
+    "node_modules",
+    WORKTREES_DIR.name,
+}
 REMOTE = "origin"  # Git remote name
+TAG_RE = re.compile(r"^v\d+\.\d+\.\d+$")
+# Signs in a build log that sphinx-build or one of its workers ran out of
+# memory; Sphinx reports a worker killed by the OOM killer as an EOFError
+OUT_OF_MEMORY_RE = re.compile(
+    r"MemoryError|Cannot allocate memory|\bKilled\b|BrokenProcessPool"
+    r"|\bworker\b.*\bdied\b|\bEOFError\b"
+)
 DEFAULT_LANGS = ["en", "zh_CN"]  # Default supported documentation languages
+# How autodoc reads the package: by importing it, or statically from its source
+API_MODES = ["import", "static"]
 
 # Build options
 KEEP_WORKTREES = False  # Whether to keep worktrees after build (default: cleanup)
 HAS_SUBMODULES = False  # Set True if repo uses submodules and needs initialization
 
 
-def run(cmd, cwd=None, env=None, check=True):
-    """Execute shell command with logging"""
-    print(f"[RUN] {' '.join(map(str, cmd))}")
-    subprocess.run(cmd, cwd=cwd, env=env, check=check)
+@dataclass
+class BuildOptions:
+    """Settings shared by every build of one run"""
+
+    enable_api_doc: bool = True
+    jobs: int = 1  # Concurrent (version, language) builds
+    cpu_budget: int | None = None  # CPUs shared by concurrent sphinx-build runs
+    copy_mode: str = "copy"  # See copy_strategy.COPY_MODES
+    checkout_mode: str = "worktree"  # See checkout.CHECKOUT_MODES
+    keep_worktrees: bool = KEEP_WORKTREES
+    cache_dir: Path | None = None  # Persistent cache (build outputs, API rst, autodoc)
+    api_mode: str = "import"  # See API_MODES
+    api_import_modules: list[str] = field(default_factory=list)
+    share_doctrees: bool = False  # Later languages of a ref reuse the first's doctrees
+    # Documents later languages re-read anyway (shared_doctrees_reread)
+    share_doctrees_reread: list[str] = field(default_factory=lambda: ["api/*"])
+    ecosystem: list[Path] = field(default_factory=list)  # Sibling sites to link to
+    max_memory: int | None = None  # Bytes shared by concurrent sphinx-build runs
+    translate: str | None = None  # translate_pages backend for pages without _ZH
+    nav_json: bool = False  # Sidebar rendered client-side from one nav.json
+    optimize_images: bool = False  # Resized WebP variants of extra asset images
+
+
+@dataclass
+class BuildResult:
+    """Outcome of one scheduled (ref, language) build"""
+
+    ref_label: str
+    lang: str
+    status: str  # "ok", "cached", "unchanged", "failed" or "skipped"
+    duration: float = 0.0
+    log_path: Path | None = None
+    error: str = ""
+
+
+def run(cmd, cwd=None, env=None, check=True, log=None):
+    """Execute shell command with logging
+
+    When ``log`` is an open file, the command line and all of its output are
+    written there instead of the console, so parallel jobs don't interleave.
+    """
+    line = f"[RUN] {' '.join(map(str, cmd))}"
+    if log is None:
+        print(line)
+        subprocess.run(cmd, cwd=cwd, env=env, check=check)
+        return
+    log.write(line + "\n")
+    log.flush()
+    subprocess.run(
+        cmd, cwd=cwd, env=env, check=check, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def out_of_memory(error: subprocess.CalledProcessError, log=None, offset=0) -> bool:
+    """Whether a failed command ran out of memory, by its exit status or log
+
+    Only the part of ``log`` written from ``offset`` on is searched.
+    """
+    # The OOM killer sends SIGKILL; a shell reports that as 128 + 9
+    if error.returncode in (-signal.SIGKILL, 128 + signal.SIGKILL):
+        return True
+    if log is None:
+        return False  # Output went to the console
+    try:
+        with open(log.name, "rb") as f:
+            f.seek(offset)
+            text = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return False
+    return OUT_OF_MEMORY_RE.search(text) is not None
+
+
+def log_print(message: str, log=None):
+    """Print a progress message to the console or to a job log"""
+    if log is None:
+        print(message)
+    else:
+        log.write(message + "\n")
+        log.flush()
 
 
 def is_valid_tag(tag: str) -> bool:
     """Check if tag matches version pattern and meets minimum version requirement"""
-    if not re.match(r"^v\d+\.\d+\.\d+$", tag):
+    if not TAG_RE.match(tag):
         return False
     try:
         return pv.parse(tag) >= pv.parse(MIN_TAG)
@@ -43,12 +188,31 @@ def is_valid_tag(tag: str) -> bool:
         return False
 
 
+_ref_index: RefIndex | None = None
+
+
+def load_refs(fetch: bool) -> RefIndex:
+    """Fetch the remote unless ``fetch`` is false and list the commit of every ref"""
+    global _ref_index
+    with PROFILER.span("git fetch" if fetch else "list refs"):
+        _ref_index = RefIndex.load(REMOTE, fetch, run=run)
+    return _ref_index
+
+
 def get_tags():
-    """Fetch and filter valid version tags from remote repository"""
-    run(["git", "fetch", "--tags", "--force", REMOTE])
-    out = subprocess.check_output(["git", "tag"], text=True).strip()
-    tags = [t for t in out.splitlines() if t]
-    return [t for t in tags if is_valid_tag(t)]
+    """Valid version tags, from the refs listed by ``load_refs``"""
+    return [t for t in ref_index().tags if is_valid_tag(t)]
+
+
+def ref_index() -> RefIndex:
+    if _ref_index is None:
+        return load_refs(fetch=False)
+    return _ref_index
+
+
+def resolve_commit(ref: str) -> str | None:
+    """Resolve a branch or tag to the commit SHA it points to"""
+    return ref_index().resolve(ref)
 
 
 def load_extra_assets_config():
@@ -60,43 +224,33 @@ def load_extra_assets_config():
         return yaml.safe_load(f)
 
 
-def ensure_clean_worktree(path: Path):
-    """Remove existing worktree if present to ensure clean state"""
-    if path.exists():
-        try:
-            run(["git", "worktree", "remove", "--force", str(path)])
-        except Exception:
-            shutil.rmtree(path, ignore_errors=True)
-
-
-def copy_docs_source_to(wt_root: Path):
+def copy_docs_source_to(wt_root: Path, log=None, copy_mode="copy", stats=None):
     """Copy current docs source to worktree to unify templates and extensions"""
     src = REPO_ROOT / DOCS_REL
     dst = wt_root / DOCS_REL
     dst.parent.mkdir(parents=True, exist_ok=True)
-    print(f"[COPY] {src} -> {dst}")
-    shutil.copytree(
-        src,
-        dst,
-        dirs_exist_ok=True,
-        ignore=shutil.ignore_patterns(".git", "build", ".pyc"),
-    )
+    log_print(f"[COPY] {src} -> {dst} ({copy_mode})", log)
+    copy_tree(src, dst, copy_mode, stats, ignore=DOCS_SOURCE_IGNORE)
 
 
-def maybe_init_submodules(wt_root: Path):
+def maybe_init_submodules(wt_root: Path, log=None):
     """Initialize submodules in worktree if repository uses them"""
     if HAS_SUBMODULES:
         try:
-            run(["git", "submodule", "update", "--init", "--recursive"], cwd=wt_root)
+            run(
+                ["git", "submodule", "update", "--init", "--recursive"],
+                cwd=wt_root,
+                log=log,
+            )
         except Exception as e:
-            print(f"[WARN] submodule init failed: {e}")
+            log_print(f"[WARN] submodule init failed: {e}", log)
 
 
-def create_index_rst(target_dir: Path):
+def create_index_rst(target_dir: Path, log=None):
     index_rst = target_dir / "index.rst"
     # index_ZH_rst = target_dir / "index_ZH.rst"
     if not index_rst.exists():
-        print(f"[CREATE] index_rst: {index_rst}")
+        log_print(f"[CREATE] index_rst: {index_rst}", log)
         folder_name = target_dir.name.capitalize()
         content = f"""\
 {folder_name}
@@ -112,129 +266,774 @@ def create_index_rst(target_dir: Path):
         index_rst.write_text(content, encoding="utf-8")
 
 
-def copy_markdown_files(wt_root: Path):
-    print(f"[TRACE] wt_root: {wt_root}")
-    exclude_paths = ["outputs", "sphinx_doc", ".github"]
-    for md_file in wt_root.rglob("*.md"):
-        if any(path in str(md_file) for path in exclude_paths):
+def is_doc_source(rel_path: Path) -> bool:
+    """Whether a file (relative to the repository root) is a docs source"""
+    if any(part in AGGREGATE_EXCLUDE_DIRS for part in rel_path.parts[:-1]):
+        return False
+    name = rel_path.name
+    return name.endswith(".md") or (
+        rel_path.parts[:1] == ("docs",) and name.endswith(".rst")
+    )
+
+
+def scan_doc_sources(wt_root: Path) -> dict[Path, Path]:
+    """Collect documentation sources in a single walk of the worktree
+
+    Returns a mapping of target path (relative to the Sphinx source dir) to
+    source file. Markdown is collected everywhere, reStructuredText only below
+    ``docs/``. Excluded directories are pruned without being descended into.
+    """
+    sources = {}
+    for dirpath, dirnames, filenames in os.walk(wt_root):
+        rel_dir = Path(dirpath).relative_to(wt_root)
+        dirnames[:] = [d for d in dirnames if d not in AGGREGATE_EXCLUDE_DIRS]
+        for name in filenames:
+            if is_doc_source(rel_dir / name):
+                sources[rel_dir / name] = Path(dirpath) / name
+    return sources
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ecosystem_digest(paths: list[Path]) -> str:
+    """Hash of every ecosystem.json in the given sibling sites"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [path] if path.is_file() else sorted(path.rglob("ecosystem.json"))
+        for manifest in files:
+            digest.update(f"{manifest}:{file_digest(manifest)}\n".encode())
+    return digest.hexdigest()
+
+
+def load_aggregate_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def copy_markdown_files(
+    wt_root: Path, log=None, copy_mode="copy", stats=None, docs_root=None
+) -> dict[str, int]:
+    """Sync markdown/rst sources of a worktree into its Sphinx source dir
+
+    Files are compared against the manifest of the previous run by mtime and
+    size, then by content hash; only changed files are copied, and files that
+    disappeared from the worktree are removed. Unchanged targets keep their
+    mtime so Sphinx's incremental build can skip them. ``docs_root`` is the
+    docs template the sources go to (default: the worktree's own). Returns
+    counts.
+    """
+    log_print(f"[TRACE] wt_root: {wt_root}", log)
+    start = time.perf_counter()
+    docs_root = docs_root or wt_root / DOCS_REL
+    source_dir = docs_root / "source"
+    manifest_path = docs_root / AGGREGATE_MANIFEST
+    previous = load_aggregate_manifest(manifest_path)
+    manifest = {}
+    counts = {"scanned": 0, "copied": 0, "unchanged": 0, "removed": 0, "kept": 0}
+    index_dirs = set()
+
+    for rel_target, src_file in sorted(scan_doc_sources(wt_root).items()):
+        counts["scanned"] += 1
+        key = rel_target.as_posix()
+        target = source_dir / rel_target
+        entry = previous.get(key)
+        st = src_file.stat()
+
+        # Files that come from the docs template itself are never overwritten
+        # (machine translations of a page are replaced by a real translation)
+        if entry is None and target.exists() and not is_generated(target):
+            counts["kept"] += 1
             continue
-        if md_file.parent == wt_root and md_file.name.lower() in [
-            "readme.md",
-            "readme_zh.md",
-        ]:
-            target = wt_root / DOCS_REL / "source" / md_file.name
+
+        if entry is not None and target.exists():
+            if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                manifest[key] = entry
+                counts["unchanged"] += 1
+                continue
+            digest = file_digest(src_file)
+            if entry["sha256"] == digest:
+                manifest[key] = dict(entry, mtime_ns=st.st_mtime_ns, size=st.st_size)
+                counts["unchanged"] += 1
+                continue
         else:
-            target = wt_root / DOCS_REL / "source" / md_file.relative_to(wt_root)
-        target_dir = target.parent
-        target_dir.mkdir(parents=True, exist_ok=True)
+            digest = file_digest(src_file)
 
-        if not target.exists():
-            print(f"[COPY] {md_file} -> {target}")
-            shutil.copy2(md_file, target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        log_print(f"[COPY] {src_file} -> {target}", log)
+        place_file(src_file, target, copy_mode, stats)
+        manifest[key] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": digest,
+        }
+        counts["copied"] += 1
 
         # Create index.rst for operators (data-juicer)
-        if "/operators/" in str(md_file):
-            create_index_rst(target_dir)
+        if "operators" in rel_target.parent.parts:
+            index_dirs.add(target.parent)
 
-    docs_path = wt_root / Path("docs")
-    for rst_file in docs_path.rglob("*.rst"):
-        if any(path in str(rst_file) for path in exclude_paths):
-            continue
-        target = wt_root / DOCS_REL / "source" / rst_file.relative_to(wt_root)
-        target.parent.mkdir(parents=True, exist_ok=True)
-        if not target.exists():
-            print(f"[COPY] {rst_file} -> {target}")
-            shutil.copy2(rst_file, target)
+    for target_dir in sorted(index_dirs):
+        create_index_rst(target_dir, log)
+
+    for key in previous.keys() - manifest.keys():
+        stale = source_dir / key
+        if stale.exists():
+            log_print(f"[REMOVE] {stale}", log)
+            stale.unlink()
+        counts["removed"] += 1
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    log_print(
+        "[AGGREGATE] {scanned} sources: {copied} copied, {unchanged} unchanged, "
+        "{removed} removed, {kept} kept from template".format(**counts)
+        + f" in {time.perf_counter() - start:.2f}s",
+        log,
+    )
 
     assets_list = load_extra_assets_config()["assets"]
 
     for asset_rel_path in assets_list:
         if (wt_root / asset_rel_path).exists():
-            shutil.copytree(
+            copy_tree(
                 wt_root / asset_rel_path,
-                wt_root / DOCS_REL / "source" / "extra" / asset_rel_path,
-                dirs_exist_ok=True,
+                source_dir / "extra" / asset_rel_path,
+                copy_mode,
+                stats,
             )
 
+    return counts
+
 
-def build_one(
+def checkout_spec(enable_api_doc: bool) -> CheckoutSpec:
+    """Paths of a ref that the docs build reads"""
+    return CheckoutSpec(
+        package_dir=PACKAGE_DIR if enable_api_doc else None,
+        asset_paths=list(load_extra_assets_config()["assets"]),
+        exclude_dirs=AGGREGATE_EXCLUDE_DIRS,
+    )
+
+
+def prepare_worktree(
     ref: str,
     ref_label: str,
-    available_versions: list[str],
-    enable_api_doc: bool = True,
-    langs: list[str] = None,
-):
-    """Build documentation for a single version/branch"""
-    if langs is None:
-        langs = DEFAULT_LANGS
+    options: BuildOptions | None = None,
+    log=None,
+    stats: CopyStats | None = None,
+) -> Path | None:
+    """Check out a ref and assemble its Sphinx source tree
 
-    # Create and setup worktree for the specific git reference
+    Returns the worktree path, or None if the ref has no documentation source.
+    The API rst is generated here once so every language build can share it.
+    A kept checkout of the same commit is reused as is.
+    """
+    options = options or BuildOptions()
+
+    # Create and setup a checkout of the specific git reference
     wt = WORKTREES_DIR / ref_label
-    ensure_clean_worktree(wt)
-    run(["git", "worktree", "add", "--force", str(wt), ref])
-    maybe_init_submodules(wt)
+    # Checkouts are detached at a SHA: git does not guess branches from
+    # remote-tracking refs there, so a name it cannot resolve must not reach it
+    commit = resolve_commit(ref)
+    if commit is None:
+        raise ValueError(
+            f"{ref!r} is not a tag, a branch (local or on a remote) or a commit"
+        )
+    with PROFILER.span("checkout", ref_label, mode=options.checkout_mode):
+        state = materialize(
+            ref,
+            commit,
+            wt,
+            options.checkout_mode,
+            checkout_spec(options.enable_api_doc),
+            log,
+        )
+        log_print(f"[CHECKOUT] {ref_label} ({options.checkout_mode}): {state}", log)
+        if options.checkout_mode != "archive":
+            maybe_init_submodules(wt, log)
 
     # Override docs/sphinx_doc with current repo version for unified templates
-    copy_docs_source_to(wt)
-    copy_markdown_files(wt)
+    ref_stats = CopyStats()
+    with PROFILER.span("copy template", ref_label):
+        copy_docs_source_to(wt, log, options.copy_mode, ref_stats)
+    with PROFILER.span("aggregate sources", ref_label):
+        copy_markdown_files(wt, log, options.copy_mode, ref_stats)
+    log_print(f"[COPY] {ref_label}: {ref_stats.report()}", log)
+    if stats is not None:
+        stats.merge(ref_stats)
 
     src = wt / DOCS_REL / "source"
+    if options.translate and src.exists():
+        cache_dir = TRANSLATION_CACHE
+        if options.cache_dir:
+            cache_dir = options.cache_dir / "translations"
+        with PROFILER.span("translate", ref_label):
+            counts = translate_missing(src, options.translate, cache_dir, log=log)
+        log_print(f"[TRANSLATE] {ref_label}: {summarize_translation(counts)}", log)
+
+    if options.optimize_images and (src / "extra").is_dir():
+        cache_dir = IMAGE_CACHE
+        if options.cache_dir:
+            cache_dir = options.cache_dir / "images"
+        with PROFILER.span("images", ref_label):
+            counts = process_images(src / "extra", cache_dir, options.copy_mode)
+        log_print(f"[IMAGES] {ref_label}: {summarize_images(counts)}", log)
+
     if not src.exists():
-        print(f"[SKIP] {ref_label}: {src} not found")
-        if not KEEP_WORKTREES:
-            run(["git", "worktree", "remove", "--force", str(wt)])
+        log_print(f"[SKIP] {ref_label}: {src} not found", log)
+        remove_worktree(wt, options, log)
+        return None
+
+    # Generate the API rst files (only if enabled)
+    if options.enable_api_doc:
+        with PROFILER.span("apidoc", ref_label):
+            generate_api_docs(wt, src, options, log)
+
+    return wt
+
+
+def apidoc_key(package_root: Path, apidoc_args: list[str]) -> str:
+    """Hash what sphinx-apidoc output depends on: module layout and templates
+
+    apidoc only lists modules and packages, so file contents don't matter;
+    autodoc reads them later at build time.
+    """
+    modules = sorted(
+        p.relative_to(package_root).as_posix()
+        for p in package_root.rglob("*.py")
+        if "__pycache__" not in p.parts
+    )
+    templates = {}
+    if APIDOC_TEMPLATES.is_dir():
+        templates = {
+            p.name: file_digest(p) for p in sorted(APIDOC_TEMPLATES.glob("*_t"))
+        }
+    return BuildCache.make_key(
+        modules=modules,
+        templates=templates,
+        args=apidoc_args,
+        toolchain=toolchain_versions(),
+    )
+
+
+def sync_api_dir(generated: Path, api_dir: Path) -> dict[str, int]:
+    """Move freshly generated API rst into place, touching only changed files
+
+    Unchanged files keep their mtime so Sphinx does not re-read them, and rst
+    of modules that no longer exist is removed.
+    """
+    counts = {"written": 0, "unchanged": 0, "removed": 0}
+    api_dir.mkdir(parents=True, exist_ok=True)
+    names = {p.name for p in generated.glob("*.rst")}
+    for name in sorted(names):
+        target = api_dir / name
+        if target.exists() and filecmp.cmp(generated / name, target, shallow=False):
+            counts["unchanged"] += 1
+            continue
+        shutil.copyfile(generated / name, target)
+        counts["written"] += 1
+    for stale in api_dir.glob("*.rst"):
+        if stale.name not in names:
+            stale.unlink()
+            counts["removed"] += 1
+    return counts
+
+
+def generate_api_docs(wt: Path, src: Path, options: BuildOptions, log=None):
+    """Run sphinx-apidoc for a worktree unless its module layout is unchanged
+
+    The key of the last run is stamped into ``source/api``; with a cache dir
+    the generated rst is also kept there and shared across refs.
+    """
+    api_dir = src / "api"
+    apidoc_args = ["-t", str(APIDOC_TEMPLATES), "-e"]
+    key = apidoc_key(wt / PACKAGE_DIR, apidoc_args)
+    stamp = api_dir / APIDOC_STAMP
+    if stamp.exists() and stamp.read_text(encoding="utf-8").strip() == key:
+        log_print(f"[APIDOC] {api_dir}: module layout unchanged, skipped", log)
         return
 
-    # Build documentation for each supported language
-    for lang in langs:
-        out_dir = SITE_DIR / lang / ref_label
-        out_dir.mkdir(parents=True, exist_ok=True)
+    cached = options.cache_dir / "apidoc" / key if options.cache_dir else None
+    if cached is not None and cached.is_dir():
+        counts = sync_api_dir(cached, api_dir)
+        source = "restored from cache"
+    else:
+        with tempfile.TemporaryDirectory(dir=WORKTREES_DIR) as tmp:
+            api_cmd = ["sphinx-apidoc", "-o", tmp, str(wt / PACKAGE_DIR), *apidoc_args]
+            run(api_cmd, log=log)
+            counts = sync_api_dir(Path(tmp), api_dir)
+            if cached is not None:
+                # Builds run in threads: each stages in a directory of its own
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                staging = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=cached.parent))
+                try:
+                    shutil.copytree(tmp, staging, dirs_exist_ok=True)
+                    os.replace(staging, cached)
+                except OSError:  # Stored concurrently by another build
+                    pass
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+        source = "generated"
+    stamp.write_text(key + "\n", encoding="utf-8")
+    log_print(
+        f"[APIDOC] {api_dir}: {source}; {counts['written']} written, "
+        f"{counts['unchanged']} unchanged, {counts['removed']} removed",
+        log,
+    )
+
+
+def sphinx_env(
+    ref: str, ref_label: str, wt: Path, options: BuildOptions
+) -> dict[str, str]:
+    """Environment variables that conf.py reads for a build of ``ref``"""
+    env = {
+        "DOCS_VERSION": ref_label,  # Documentation version label (e.g., latest, v1.5.0)
+        "GIT_REF_FOR_LINKS": ref,  # Git reference for GitHub links
+        "VERSIONS_MANIFEST": VERSIONS_MANIFEST,  # Version list for the switcher
+        "REPO_ROOT": str(wt),  # Version-specific code root for autodoc imports
+        "API_DOC_MODE": options.api_mode,
+        "API_IMPORT_MODULES": ",".join(options.api_import_modules),
+    }
+    if options.cache_dir is not None:
+        env["AUTODOC_CACHE_DIR"] = str(Path(options.cache_dir).resolve() / "autodoc")
+    if options.share_doctrees:
+        env["SHARE_DOCTREES"] = "1"
+        env["SHARED_DOCTREES_REREAD"] = ",".join(options.share_doctrees_reread)
+    if options.max_memory:
+        budget = options.max_memory // max(1, options.jobs)
+        env["MAX_MEMORY_MB"] = str(budget >> 20)
+    if options.ecosystem:
+        env["ECOSYSTEM_MANIFESTS"] = os.pathsep.join(map(str, options.ecosystem))
+    if options.nav_json:
+        env["NAV_JSON"] = "1"
+    return env
+
+
+def build_language(
+    ref: str,
+    ref_label: str,
+    lang: str,
+    wt: Path,
+    sphinx_jobs: str = "auto",
+    log=None,
+    options: BuildOptions | None = None,
+    seed_lang: str | None = None,
+):
+    """Run sphinx-build for one language of a prepared worktree
+
+    With ``options.cache_dir``, autodoc output is cached below it by module
+    source; ``options.api_mode`` selects import-based or static API docs.
+    With ``seed_lang``, the build starts from the doctrees of that language's
+    build of the same worktree and only re-reads what differs (see
+    ``source/shared_doctrees.py``).
+    """
+    options = options or BuildOptions()
+    src = wt / DOCS_REL / "source"
+    out_dir = SITE_DIR / lang / ref_label
+    out_dir.mkdir(parents=True, exist_ok=True)
+    release_static(out_dir)
+    if seed_lang is not None:
+        with PROFILER.span("seed doctrees", ref_label, lang):
+            seed_doctrees(SITE_DIR / seed_lang / ref_label, out_dir, log)
+
+    # Setup environment variables for Sphinx build
+    env = os.environ.copy()
+    env.update(sphinx_env(ref, ref_label, wt, options))
+    profile = PROFILER.sphinx_profile(ref_label, lang)
+    if profile is not None:
+        profile.parent.mkdir(parents=True, exist_ok=True)
+        env["BUILD_PROFILE"] = str(profile.resolve())
+
+    # Execute Sphinx build command
+    cmd = [
+        "sphinx-build",
+        "-b",
+        "html",  # HTML builder
+        "-D",
+        f"language={lang}",  # Set language for this build
+        "-j",
+        str(sphinx_jobs),
+        str(src),  # Source directory
+        str(out_dir),  # Output directory
+    ]
+    while True:
+        with PROFILER.span("sphinx-build", ref_label, lang, jobs=str(sphinx_jobs)):
+            offset = log.tell() if log is not None else 0
+            try:
+                run(cmd, env=env, log=log)
+                break
+            except subprocess.CalledProcessError as e:
+                # Under a memory budget, retry a build that ran out of memory
+                # with fewer workers (down to one): a killed worker fails it
+                workers = os.cpu_count() if sphinx_jobs == "auto" else int(sphinx_jobs)
+                if (
+                    not options.max_memory
+                    or workers <= 1
+                    or not out_of_memory(e, log, offset)
+                ):
+                    raise
+                sphinx_jobs = str(workers // 2)
+                cmd[cmd.index("-j") + 1] = sphinx_jobs
+                log_print(
+                    f"[MEMORY] {ref_label} ({lang}) ran out of memory, retrying with "
+                    f"-j {sphinx_jobs}",
+                    log,
+                )
+    if options.max_memory:
+        report_memory(out_dir, ref_label, lang, log)
+
 
-        # Setup environment variables for Sphinx build
-        env = os.environ.copy()
-        env["DOCS_VERSION"] = (
-            ref_label  # Documentation version label (e.g., latest, v1.5.0)
+def report_memory(out_dir: Path, ref_label: str, lang: str, log=None):
+    """Print the memory the memory_budget extension observed, if it ran"""
+    try:
+        report = json.loads(
+            (out_dir / DOCTREES_DIR / MEMORY_REPORT).read_text(encoding="utf-8")
         )
-        env["GIT_REF_FOR_LINKS"] = ref  # Git reference for GitHub links
-        env["AVAILABLE_VERSIONS"] = ",".join(
-            available_versions
-        )  # All available versions for switcher
-        env["REPO_ROOT"] = str(wt)  # Version-specific code root for autodoc imports
-
-        # Generate the API rst files (only if enabled)
-        if enable_api_doc:
-            api_cmd = [
-                "sphinx-apidoc",
-                "-o",
-                str(wt / DOCS_REL / "source" / "api"),
-                str(wt / PACKAGE_DIR),
-                "-t",
-                "_templates",
-                "-e",
-            ]
-            run(api_cmd, env=env)
-
-        # Execute Sphinx build command
-        cmd = [
-            "sphinx-build",
-            "-b",
-            "html",  # HTML builder
-            "-D",
-            f"language={lang}",  # Set language for this build
-            "-j",
-            "auto",
-            str(src),  # Source directory
-            str(out_dir),  # Output directory
-        ]
-        run(cmd, env=env)
-
-    # Cleanup worktree after successful build
-    if not KEEP_WORKTREES:
-        run(["git", "worktree", "remove", "--force", str(wt)])
+    except (OSError, ValueError):
+        return
+    log_print(
+        f"[MEMORY] {ref_label} ({lang}): peak ~{report['estimated_peak_mb']:.0f} "
+        f"of {report['budget_mb']:.0f} MiB, main {report['main_peak_mb']:.0f} MiB, "
+        f"up to {report['workers']}/{report['requested']} workers of "
+        f"{report['worker_peak_mb']:.0f} MiB",
+        log,
+    )
+
+
+def seed_doctrees(seed_dir: Path, out_dir: Path, log=None):
+    """Replace the doctrees of ``out_dir`` by a copy of those of ``seed_dir``
+
+    Sphinx rewrites doctree pickles in place, so they are copied rather than
+    linked to keep the seed build intact.
+    """
+    seed, target = seed_dir / DOCTREES_DIR, out_dir / DOCTREES_DIR
+    if not (seed / "environment.pickle").is_file():
+        return
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(seed, target)
+    log_print(f"[DOCTREES] seeded {target} from {seed}", log)
+
+
+def remove_worktree(wt: Path, options: BuildOptions | None = None, log=None):
+    """Cleanup worktree after build unless worktrees are kept for reuse"""
+    keep = options.keep_worktrees if options is not None else KEEP_WORKTREES
+    if not keep:
+        remove_checkout(wt, log)
+
+
+def dedupe_site_assets(out_dir: Path, store: ContentStore, stats=None, log=None):
+    """Link the extra assets of a built site to their shared store objects"""
+    asset_stats = CopyStats()
+    for asset_rel_path in load_extra_assets_config()["assets"]:
+        if (out_dir / asset_rel_path).exists():
+            store.dedupe_tree(out_dir / asset_rel_path, asset_stats)
+    log_print(f"[ASSETS] {out_dir}: {asset_stats.report()}", log)
+    if stats is not None:
+        stats.merge(asset_stats)
+
+
+def sphinx_jobs_for(jobs: int, cpu_budget: int | None) -> str:
+    """Split the CPU budget between concurrent builds for ``sphinx-build -j``"""
+    if jobs <= 1 and cpu_budget is None:
+        return "auto"
+    budget = cpu_budget or os.cpu_count() or 1
+    return str(max(1, budget // max(1, jobs)))
+
+
+def open_job_log(name: str, jobs: int):
+    """Open a per-job log file when builds run concurrently"""
+    if jobs <= 1:
+        return None, None
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"{name}.log"
+    return open(log_path, "w", encoding="utf-8"), log_path
+
+
+def tail_log(log_path: Path, lines: int = 20) -> str:
+    """Return the last lines of a job log for failure reports"""
+    try:
+        content = log_path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return ""
+    return "\n".join(content.splitlines()[-lines:])
+
+
+def schedule_builds(
+    targets: list[tuple[str, str, list[str]]],
+    options: BuildOptions,
+    cache: BuildCache | None = None,
+    build_keys: dict[tuple[str, str], str] | None = None,
+    asset_store: ContentStore | None = None,
+    copy_stats: CopyStats | None = None,
+) -> list[BuildResult]:
+    """Build all (ref, label, languages) targets, ``options.jobs`` at a time
+
+    Each ref is prepared once; its language builds are queued as soon as the
+    worktree is ready and the worktree is removed after the last one finishes.
+    At most ``jobs`` refs are checked out at a time to bound disk usage. The
+    work itself happens in git/sphinx subprocesses, so a thread pool is enough
+    to keep ``jobs`` of them running concurrently. With
+    ``options.share_doctrees`` the first language of a ref runs alone and
+    the others start from a copy of its doctrees once it is done. Successful builds are
+    stamped with their entry in ``build_keys`` and stored in ``cache``; their
+    extra assets are deduplicated through ``asset_store``.
+    """
+    build_keys = build_keys or {}
+    jobs = options.jobs
+    sphinx_jobs = sphinx_jobs_for(jobs, options.cpu_budget)
+    print(
+        f"[SCHED] {sum(len(t[2]) for t in targets)} builds of {len(targets)} refs, "
+        f"{jobs} concurrent jobs, sphinx-build -j {sphinx_jobs}"
+    )
+
+    def prepare_task(ref, ref_label):
+        log, log_path = open_job_log(f"{ref_label}-prepare", jobs)
         try:
-            run(["git", "worktree", "prune"])  # Clean up worktree references
-        except Exception:
-            pass
+            wt = prepare_worktree(ref, ref_label, options, log, copy_stats)
+            return wt, None
+        except Exception as e:
+            return None, BuildResult(ref_label, "-", "failed", 0.0, log_path, str(e))
+        finally:
+            if log is not None:
+                log.close()
+
+    def lang_task(ref, ref_label, lang, wt, seed_lang=None):
+        log, log_path = open_job_log(f"{ref_label}-{lang}", jobs)
+        start = time.perf_counter()
+        try:
+            build_language(
+                ref, ref_label, lang, wt, sphinx_jobs, log, options, seed_lang
+            )
+            if asset_store is not None:
+                with PROFILER.span("dedupe assets", ref_label, lang):
+                    dedupe_site_assets(
+                        SITE_DIR / lang / ref_label, asset_store, copy_stats, log
+                    )
+            key = build_keys.get((ref_label, lang))
+            if key is not None:
+                write_build_key(SITE_DIR / lang / ref_label, key)
+            if cache is not None and key is not None:
+                log_print(f"[CACHE] store {ref_label} ({lang}) as {key[:12]}", log)
+                with PROFILER.span("cache store", ref_label, lang):
+                    cache.store(
+                        key, SITE_DIR / lang / ref_label, label=ref_label, lang=lang
+                    )
+            status, error = "ok", ""
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            if log is not None:
+                log.close()
+        duration = time.perf_counter() - start
+        return BuildResult(ref_label, lang, status, duration, log_path, error)
+
+    def report_failure(result):
+        print(f"[FAIL] {result.ref_label} ({result.lang}): {result.error}")
+        if result.log_path is not None:
+            print(tail_log(result.log_path))
+
+    results: list[BuildResult] = []
+    queue = list(targets)
+    target_langs = {ref_label: langs for _, ref_label, langs in targets}
+    remaining_langs: dict[str, int] = {}
+    queued_langs: dict[str, list[str]] = {}  # Waiting for the seed language
+    seed_langs: dict[str, str | None] = {}
+    worktrees: dict[str, Path] = {}
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+
+        def start_next_ref():
+            if queue:
+                ref, ref_label, _ = queue.pop(0)
+                print(f"[BUILD] Preparing {ref_label}")
+                pending[pool.submit(prepare_task, ref, ref_label)] = (ref, ref_label)
+
+        def start_lang(ref, ref_label, lang):
+            print(f"[BUILD] Building {ref_label} ({lang})")
+            future = pool.submit(
+                lang_task,
+                ref,
+                ref_label,
+                lang,
+                worktrees[ref_label],
+                seed_langs.get(ref_label),
+            )
+            pending[future] = (ref, ref_label)
+
+        def finish_ref(ref_label):
+            wt = worktrees.pop(ref_label, None)
+            if wt is not None:
+                try:
+                    remove_worktree(wt, options)
+                except Exception as e:
+                    print(f"[WARN] failed to remove worktree for {ref_label}: {e}")
+            start_next_ref()
+
+        for _ in range(max(1, jobs)):
+            start_next_ref()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ref, ref_label = pending.pop(future)
+                outcome = future.result()
+
+                if isinstance(outcome, BuildResult):  # A language build finished
+                    results.append(outcome)
+                    if outcome.status == "failed":
+                        report_failure(outcome)
+                    else:
+                        print(
+                            f"[DONE] {ref_label} ({outcome.lang}) "
+                            f"in {outcome.duration:.1f}s"
+                        )
+                    remaining_langs[ref_label] -= 1
+                    if remaining_langs[ref_label] == 0:
+                        finish_ref(ref_label)
+                        continue
+                    # The seed language finished: start the others from it
+                    queued = queued_langs.pop(ref_label, [])
+                    if queued:
+                        ok = outcome.status == "ok"
+                        seed_langs[ref_label] = outcome.lang if ok else None
+                    for l in queued:
+                        start_lang(ref, ref_label, l)
+                    continue
+
+                wt, failed = outcome  # A prepare task finished
+                langs = target_langs[ref_label]
+                if failed is not None:
+                    report_failure(failed)
+                    results.extend(
+                        BuildResult(
+                            ref_label, l, "failed", 0.0, failed.log_path, failed.error
+                        )
+                        for l in langs
+                    )
+                    finish_ref(ref_label)
+                    continue
+                if wt is None:
+                    results.extend(BuildResult(ref_label, l, "skipped") for l in langs)
+                    finish_ref(ref_label)
+                    continue
+
+                worktrees[ref_label] = wt
+                remaining_langs[ref_label] = len(langs)
+                if options.share_doctrees:
+                    queued_langs[ref_label] = list(langs[1:])
+                    langs = langs[:1]
+                for l in langs:
+                    start_lang(ref, ref_label, l)
+
+    return results
+
+
+def compute_build_keys(
+    refs: list[tuple[str, str]],
+    langs: list[str],
+    enable_api_doc: bool,
+    read_options: dict | None = None,
+) -> dict[tuple[str, str], str]:
+    """Hash the build inputs of every (version, language) whose commit resolves
+
+    The version list is deliberately not an input: the switcher loads it from
+    the versions manifest, so publishing a new tag leaves old outputs valid.
+    ``read_options`` holds the settings that change how documents are read
+    or resolved (API docs mode, doctree sharing between languages, sibling
+    project manifests).
+    """
+    template_hash = hash_tree(REPO_ROOT / DOCS_REL)
+    toolchain = toolchain_versions()
+    env = {name: os.environ.get(name, "") for name in CACHE_ENV_KEYS}
+    keys = {}
+    for ref, ref_label in refs:
+        commit = resolve_commit(ref)
+        if commit is None:
+            continue
+        for lang in langs:
+            keys[(ref_label, lang)] = BuildCache.make_key(
+                commit=commit,
+                ref=ref,
+                label=ref_label,
+                template=template_hash,
+                lang=lang,
+                api_doc=enable_api_doc,
+                api_options=read_options or {},
+                env=env,
+                toolchain=toolchain,
+            )
+    return keys
+
+
+def read_build_key(out_dir: Path) -> str | None:
+    """Return the build key an output directory was last built from"""
+    try:
+        return (out_dir / BUILD_KEY_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def write_build_key(out_dir: Path, key: str):
+    """Stamp an output directory with the key of the inputs it was built from"""
+    (out_dir / BUILD_KEY_FILE).write_text(key + "\n", encoding="utf-8")
+
+
+def site_outputs() -> list[tuple[Path, str | None]]:
+    """Every (version, language) output under SITE_DIR with its build key"""
+    outputs = []
+    lang_dirs = sorted(SITE_DIR.iterdir()) if SITE_DIR.is_dir() else []
+    for lang_dir in lang_dirs:
+        if not lang_dir.is_dir() or lang_dir.name == SHARED_DIR:
+            continue
+        for out_dir in sorted(lang_dir.iterdir()):
+            if (out_dir / "_static").is_dir():
+                outputs.append((out_dir, read_build_key(out_dir)))
+    return outputs
+
+
+def write_versions_manifest(versions: list[str], langs: list[str]) -> Path:
+    """Write the site-wide version list loaded by the version switcher
+
+    Only versions and languages that have output under SITE_DIR are listed,
+    so the manifest never points at a version that failed to build.
+    """
+    built_langs = [lang for lang in langs if (SITE_DIR / lang).is_dir()]
+    built_versions = [
+        v for v in versions if any((SITE_DIR / lang / v).is_dir() for lang in langs)
+    ]
+    manifest = {"versions": built_versions, "languages": built_langs}
+    path = SITE_DIR / VERSIONS_MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    print(f"[MANIFEST] {path}: {len(built_versions)} versions, languages {built_langs}")
+    return path
+
+
+def print_summary(results: list[BuildResult]):
+    """Print a table of all builds with their status and duration"""
+    print("[SUMMARY]")
+    width = max([len(r.ref_label) for r in results] + [len("version")])
+    print(f"  {'version':<{width}}  {'lang':<6}  {'status':<9}  {'time':>8}  log")
+    for r in sorted(results, key=lambda r: (r.ref_label, r.lang)):
+        log_path = str(r.log_path) if r.log_path else "-"
+        print(
+            f"  {r.ref_label:<{width}}  {r.lang:<6}  {r.status:<9}  "
+            f"{r.duration:>7.1f}s  {log_path}"
+        )
+    failed = [r for r in results if r.status == "failed"]
+    print(
+        f"[SUMMARY] {len(results) - len(failed)} built, reused or skipped, "
+        f"{len(failed)} failed"
+    )
 
 
 def parse_args():
@@ -251,6 +1050,17 @@ Example usage:
   %(prog)s --branches main dev                      # Build specified branches with all tags
   %(prog)s --branches main dev --languages en zh    # Build with English and Chinese docs
   %(prog)s -l en zh -A                              # Short form: build en/zh docs without API
+  %(prog)s --tags -j 4                              # Build 4 (version, language) pairs at a time
+  %(prog)s --tags --incremental                     # Build only new/changed versions, refresh versions.json
+  %(prog)s --api-mode static                        # API docs from parsed sources, no package imports
+  %(prog)s --share-doctrees                         # zh_CN reuses the documents parsed for en
+  %(prog)s --ecosystem ../hub-site                 # Resolve links against a sibling project
+  %(prog)s -l en zh_CN --translate                  # Machine-translate pages without a _ZH page
+  %(prog)s --tags --nav-json                        # Sidebar from one nav.json per build
+  %(prog)s --tags --optimize-images                 # Resized WebP variants of extra asset images
+  %(prog)s --profile build/profile --profile-trace  # Phase/document timings and a Chrome trace
+  %(prog)s --tags --optimize-static                 # Shared, fingerprinted, precompressed statics
+  %(prog)s --tags --content-manifest                # Per-output file hashes for deploy_delta.py
         """,
     )
 
@@ -261,6 +1071,104 @@ Example usage:
         help="Disable API documentation generation (default: API docs enabled)",
     )
 
+    parser.add_argument(
+        "--api-mode",
+        choices=API_MODES,
+        default="import",
+        help="How API docs read the package: 'import' runs autodoc, which needs "
+        "the package and its dependencies installed; 'static' parses the "
+        "sources with ast and imports nothing (default: import)",
+    )
+
+    parser.add_argument(
+        "--api-import-modules",
+        nargs="+",
+        default=[],
+        metavar="PATTERN",
+        help="Modules (fnmatch patterns, e.g. 'data_juicer.core.*') that "
+        "--api-mode static still documents by importing them",
+    )
+
+    parser.add_argument(
+        "--share-doctrees",
+        action="store_true",
+        help="Build the languages of each version one after another and let "
+        "later languages reuse the documents the first one parsed, re-reading "
+        "only translated, changed and language-specific pages",
+    )
+
+    parser.add_argument(
+        "--share-doctrees-reread",
+        nargs="*",
+        default=["api/*"],
+        metavar="PATTERN",
+        help="With --share-doctrees, documents (fnmatch patterns) later "
+        "languages re-read anyway so that Sphinx's generated labels, such as "
+        "field names and index entries, are translated (default: api/*; "
+        "give no pattern to reuse them too)",
+    )
+
+    parser.add_argument(
+        "--ecosystem",
+        nargs="+",
+        type=Path,
+        default=[],
+        metavar="DIR",
+        help="Local copies of sibling project sites (or their ecosystem.json "
+        "files): references missing here resolve to their pages and the "
+        "search page also lists their matching titles. Every build writes "
+        "its own ecosystem.json for the siblings to use",
+    )
+
+    parser.add_argument(
+        "--translate",
+        nargs="?",
+        const=DEFAULT_TRANSLATOR,
+        default=None,
+        metavar="BACKEND",
+        help="Before building, machine-translate the Markdown pages that have "
+        "no _ZH page for the zh_CN build, keeping code blocks and links. "
+        "Segments are translated in concurrent batches and cached (below "
+        "--cache-dir, else .worktrees), so later runs only translate new or "
+        "edited paragraphs. BACKEND is translators:<engine> or "
+        f"module:function (default: {DEFAULT_TRANSLATOR})",
+    )
+
+    parser.add_argument(
+        "--nav-json",
+        action="store_true",
+        help="Write the navigation tree of each build once to nav.json and "
+        "let sidebar.js render the section navigation from it, instead of "
+        "embedding the rendered toctree in every page",
+    )
+
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="Before building, add resized WebP variants of the images of the "
+        "extra asset trees (extra_assets.yaml) and record their sizes, so "
+        "pages give images their dimensions and a srcset. Images are cached "
+        "by content hash (below --cache-dir, else .worktrees); resizing needs "
+        "Pillow, without it only the sizes are recorded",
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Record phase, per-document and import timings and peak RSS of "
+        "every build; writes one JSON per (version, language) plus "
+        "report.txt and report.html to DIR",
+    )
+
+    parser.add_argument(
+        "--profile-trace",
+        action="store_true",
+        help="With --profile, also write DIR/trace.json for chrome://tracing "
+        "or Perfetto",
+    )
+
     parser.add_argument(
         "--tags",
         nargs="*",  # 0 or more arguments
@@ -290,21 +1198,177 @@ Example usage:
         "Example: --languages en zh",
     )
 
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of (version, language) builds to run concurrently (default: 1). "
+        "With N > 1 each build logs to its own file under .worktrees/_logs",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only build versions whose output is missing or was built from "
+        "different inputs; the versions manifest is always rewritten",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Enable the persistent build cache in DIR. Versions whose commit, "
+        "docs template, language and settings are unchanged are restored from "
+        "the cache instead of being rebuilt",
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        default=DEFAULT_CACHE_SIZE,
+        metavar="SIZE",
+        help=f"Size limit of the build cache, e.g. 500M or 10G (default: "
+        f"{DEFAULT_CACHE_SIZE}). Least recently used entries are evicted first",
+    )
+
+    parser.add_argument(
+        "--checkout",
+        choices=CHECKOUT_MODES,
+        default="worktree",
+        help="How each ref is materialized: a full git worktree, a sparse "
+        "worktree of only the docs sources, package and extra assets, or an "
+        "'archive' of just those blobs streamed from git (default: worktree)",
+    )
+
+    parser.add_argument(
+        "--no-fetch",
+        action="store_true",
+        help="Do not fetch tags from the remote; build from the local refs "
+        "only (offline builds, CI checkouts that already fetched)",
+    )
+
+    parser.add_argument(
+        "--keep-worktrees",
+        action="store_true",
+        help="Keep checkouts under .worktrees after building. A kept checkout "
+        "is reused when its ref has not moved and updated in place otherwise",
+    )
+
+    parser.add_argument(
+        "--copy-mode",
+        choices=COPY_MODES,
+        default="copy",
+        help="How the docs template, sources and extra assets are placed in "
+        "each worktree: plain copies, hardlinks, reflinks (copy-on-write "
+        "clones on btrfs/xfs) or 'auto' to try reflink, then hardlink. "
+        "Always falls back to copying (default: copy)",
+    )
+
+    parser.add_argument(
+        "--asset-store",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Content-addressed store in DIR that extra assets of all built "
+        "versions are hardlinked to, so identical files are stored once",
+    )
+
+    parser.add_argument(
+        "--search-index",
+        choices=["sharded", "all-versions"],
+        default=None,
+        help="After building, split each searchindex.js into a core file and "
+        "term shards by prefix that the search page loads on demand; "
+        "'all-versions' writes one combined index per language instead, so "
+        "search covers every version (default: keep searchindex.js)",
+    )
+
+    parser.add_argument(
+        "--optimize-static",
+        action="store_true",
+        help=f"After building, store the _static files of all versions once "
+        f"under build/{SHARED_DIR} with content-hashed names, point the pages "
+        "at them and write .gz/.br siblings of HTML, CSS, JS and JSON files",
+    )
+
+    parser.add_argument(
+        "--no-precompress",
+        action="store_true",
+        help="With --optimize-static, skip the .gz/.br files (for hosts such "
+        "as GitHub Pages that compress on the fly)",
+    )
+
+    parser.add_argument(
+        "--content-manifest",
+        action="store_true",
+        help="After building, write the SHA-256 of every file of each output "
+        "to its .content_manifest.json (only new or touched files are hashed); "
+        "deploy_delta.py diffs them against the published site",
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        default=None,
+        metavar="SIZE",
+        help="Memory budget shared by concurrent builds, e.g. 6G. Each "
+        "sphinx-build measures its workers on the first documents and runs "
+        "only as many as fit (at most -j/--cpu-budget); a build that runs out "
+        "of memory is retried with half the workers down to one. Peaks are "
+        "reported",
+    )
+
+    parser.add_argument(
+        "--check-links",
+        type=Path,
+        default=None,
+        metavar="REPORT",
+        help="After building, check internal links and anchors, language and "
+        "version switcher targets and GitHub links into this repository "
+        "(against the local git trees) across the whole site, and write a "
+        "JSON report of the broken ones to REPORT",
+    )
+
+    parser.add_argument(
+        "--cpu-budget",
+        type=int,
+        default=None,
+        metavar="CPUS",
+        help="Total CPUs shared by concurrent builds; each sphinx-build gets "
+        "CPUS // N workers (default: all CPUs, or '-j auto' when N is 1)",
+    )
+
     return parser.parse_args()
 
 
 def main():
     """Main entry point: build documentation for all versions"""
     args = parse_args()
+    if args.profile is not None:
+        PROFILER.enable(args.profile)
 
     print(
         f"[CONFIG] API documentation generation: {'Disabled' if args.no_api_doc else 'Enabled'}"
     )
+    if not args.no_api_doc:
+        print(f"[CONFIG] API documentation mode: {args.api_mode}")
     print(f"[CONFIG] Build branches: {args.branches}")
     print(f"[CONFIG] Languages: {args.languages}")
 
     WORKTREES_DIR.mkdir(exist_ok=True)
 
+    # Resolve every branch and tag once; only a tag build fetches the remote
+    fetch = args.tags is not None and not args.no_fetch
+    index = load_refs(fetch)
+    moved = index.moved_since(load_previous(REF_INDEX_FILE))
+    print(
+        f"[REFS] {len(index.branches)} branches, {len(index.tags)} tags"
+        + ("" if fetch else " (not fetched)")
+        + (f"; moved since the last run: {', '.join(moved)}" if moved else "")
+    )
+    index.save(REF_INDEX_FILE)
+
     # Get version list
     versions = list(args.branches)  # Start with branches specified from command line
     tags_to_build = []
@@ -341,17 +1405,140 @@ def main():
     print(f"[INFO] Total {len(versions)} versions to build: {versions}")
 
     enable_api_doc = not args.no_api_doc
+    options = BuildOptions(
+        enable_api_doc=enable_api_doc,
+        jobs=args.jobs,
+        cpu_budget=args.cpu_budget,
+        copy_mode=args.copy_mode,
+        checkout_mode=args.checkout,
+        keep_worktrees=KEEP_WORKTREES or args.keep_worktrees,
+        cache_dir=args.cache_dir,
+        api_mode=args.api_mode,
+        api_import_modules=args.api_import_modules,
+        share_doctrees=args.share_doctrees,
+        share_doctrees_reread=args.share_doctrees_reread,
+        ecosystem=[p.resolve() for p in args.ecosystem],
+        max_memory=parse_size(args.max_memory) if args.max_memory else None,
+        translate=args.translate if "zh_CN" in args.languages else None,
+        nav_json=args.nav_json,
+        optimize_images=args.optimize_images,
+    )
+
+    # Build all specified branches, then all tags (if any)
+    refs = [(branch, branch) for branch in args.branches]
+    refs += [(tag, tag) for tag in tags_to_build]
+
+    start = time.perf_counter()
+    cache = None
+    build_keys = {}
+    results = []
+    targets = []
+    if args.cache_dir or args.incremental:
+        read_options = {}
+        if enable_api_doc and options.api_mode != "import":
+            read_options = {
+                "mode": options.api_mode,
+                "import_modules": options.api_import_modules,
+            }
+        if options.share_doctrees:
+            read_options["share_doctrees"] = options.share_doctrees_reread
+        if options.ecosystem:
+            read_options["ecosystem"] = ecosystem_digest(options.ecosystem)
+        if options.translate:
+            read_options["translate"] = options.translate
+        if options.nav_json:
+            read_options["nav_json"] = True
+        if options.optimize_images:
+            read_options["optimize_images"] = IMAGE_PIPELINE
+        with PROFILER.span("build keys"):
+            build_keys = compute_build_keys(
+                refs, args.languages, enable_api_doc, read_options
+            )
+    if args.cache_dir:
+        cache = BuildCache(args.cache_dir, parse_size(args.cache_size))
+        print(f"[CACHE] Using {cache.cache_dir} (limit {args.cache_size})")
+
+    for ref, ref_label in refs:
+        langs_to_build = []
+        for lang in args.languages:
+            out_dir = SITE_DIR / lang / ref_label
+            key = build_keys.get((ref_label, lang))
+            if key is None:
+                langs_to_build.append(lang)
+            elif args.incremental and read_build_key(out_dir) == key:
+                print(f"[SKIP] {ref_label} ({lang}) is up to date")
+                results.append(BuildResult(ref_label, lang, "unchanged"))
+            elif cache is not None and cache.restore(key, out_dir):
+                print(f"[CACHE] hit {ref_label} ({lang}), restored {key[:12]}")
+                write_build_key(out_dir, key)
+                results.append(BuildResult(ref_label, lang, "cached"))
+            else:
+                langs_to_build.append(lang)
+        if langs_to_build:
+            targets.append((ref, ref_label, langs_to_build))
 
-    # Build all specified branches
-    for branch in args.branches:
-        print(f"[BUILD] Building branch: {branch}")
-        build_one(branch, branch, versions, enable_api_doc, args.languages)
+    copy_stats = CopyStats()
+    asset_store = None
+    if args.asset_store:
+        asset_store = ContentStore(args.asset_store, args.copy_mode)
+    results += schedule_builds(
+        targets,
+        options,
+        cache=cache,
+        build_keys=build_keys,
+        asset_store=asset_store,
+        copy_stats=copy_stats,
+    )
+    print(f"[COPY] Total: {copy_stats.report()}")
+    if args.search_index:
+        with PROFILER.span("search index"):
+            report = index_site(
+                SITE_DIR,
+                [out_dir for out_dir, _ in site_outputs()],
+                all_versions=args.search_index == "all-versions",
+            )
+        print(f"[SEARCH] {report}")
+    if args.optimize_static:
+        with PROFILER.span("optimize static"):
+            report = optimize_site(
+                SITE_DIR,
+                site_outputs(),
+                precompress=not args.no_precompress,
+                extra_roots=index_dirs(SITE_DIR),
+            )
+        print(f"[STATIC] {report}")
+    if args.content_manifest:
+        with PROFILER.span("content manifests"):
+            report = write_manifests([out_dir for out_dir, _ in site_outputs()])
+        print(f"[MANIFEST] {report}")
+    write_versions_manifest(versions, args.languages)
+    if args.check_links:
+        with PROFILER.span("check links"):
+            link_report = check_site(
+                SITE_DIR,
+                f"{os.environ.get('REPO_OWNER', 'datajuicer')}/"
+                f"{os.environ.get('PROJECT', 'data-juicer')}",
+                REPO_ROOT,
+            )
+        write_report(link_report, args.check_links)
+        print(f"[LINKS] {summarize(link_report)} -> {args.check_links}")
+    print_summary(results)
+    if PROFILER.enabled:
+        builds = [(r.ref_label, r.lang) for r in results if r.lang != "-"]
+        built = [b for b in builds if PROFILER.sphinx_profile(*b).exists()]
+        global_spans = [s for s in PROFILER.spans if s["ref"] is None]
+        report = write_reports(
+            args.profile,
+            collect_profiles(PROFILER, built),
+            global_spans,
+            trace=args.profile_trace,
+        )
+        print(report)
+        print(f"[PROFILE] Reports written to {args.profile}")
+    print(f"[INFO] Total build time: {time.perf_counter() - start:.1f}s")
 
-    # Build all tags (if any)
-    for tag in tags_to_build:
-        print(f"[BUILD] Building tag: {tag}")
-        build_one(tag, tag, versions, enable_api_doc, args.languages)
+    return 1 if any(r.status == "failed" for r in results) else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
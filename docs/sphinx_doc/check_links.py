@@ -0,0 +1,270 @@
+"""Offline validation of the links of a built site
+
+``check_site`` parses every HTML page under the site directory, across all
+versions and languages, in one parallel pass and records the anchors
+(``id``/``name``) each page defines. Against that index it checks:
+
+* internal links and resources: the target file exists and, for pages,
+  the ``#fragment`` is an anchor of the target;
+* language-switch links (``data-lang`` items of the switcher);
+* version-switch targets: the switcher builds ``<version>/<page>.html``
+  from ``versions.json`` at runtime, so each listed version must have the
+  page;
+* GitHub ``blob``/``tree`` links into this repository: the path must exist
+  in the git tree of the linked ref, read locally with ``git ls-tree``.
+
+Other external links are counted but not fetched. The report is a JSON file
+with the totals and one entry per broken link.
+
+Check an existing site with::
+
+    python check_links.py build --report build-links.json [--strict]
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from static_assets import SHARED_DIR
+
+SKIP_DIRS = {"_static", "_sources", "_images", "_downloads", SHARED_DIR}
+GITHUB_RE = re.compile(
+    r"^https?://github\.com/(?P<repo>[^/]+/[^/]+)/(?:blob|tree)/(?P<ref>[^/]+)"
+    r"(?:/(?P<path>[^?#]*))?"
+)
+VERSIONS_MANIFEST = "versions.json"
+
+
+class PageParser(HTMLParser):
+    """Anchors, links and version switcher settings of one page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.anchors: set[str] = set()
+        self.links: list[tuple[str, str]] = []  # (kind, url)
+        self.switcher: tuple[str, str] | None = None  # (version root, pagename)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get("id"):
+            self.anchors.add(attrs["id"])
+        if tag == "a" and attrs.get("name"):
+            self.anchors.add(attrs["name"])
+        for name in ("href", "src"):
+            if attrs.get(name):
+                kind = "language" if "data-lang" in attrs else "internal"
+                self.links.append((kind, attrs[name]))
+        if "data-version-root" in attrs and "data-pagename" in attrs:
+            self.switcher = (attrs["data-version-root"], attrs["data-pagename"])
+
+
+def parse_page(site_dir: str, rel: str) -> tuple:
+    parser = PageParser()
+    with open(os.path.join(site_dir, rel), encoding="utf-8", errors="replace") as f:
+        parser.feed(f.read())
+    return rel, sorted(parser.anchors), parser.links, parser.switcher
+
+
+def find_pages(site_dir: Path) -> list[str]:
+    pages = []
+    for dirpath, dirnames, filenames in os.walk(site_dir):
+        dirnames[:] = sorted(
+            d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")
+        )
+        rel_dir = os.path.relpath(dirpath, site_dir)
+        for name in sorted(filenames):
+            if name.endswith(".html"):
+                pages.append(posixpath.normpath(posixpath.join(rel_dir, name)))
+    return pages
+
+
+def resolve(page: str, url: str) -> tuple[str, str] | None:
+    """(site-relative path, fragment) of a relative URL, None if it leaves the site"""
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    if not path:
+        return page, parts.fragment
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(page), path))
+    if target == ".." or target.startswith("../"):
+        return None
+    if path.endswith("/") or target == ".":
+        target = posixpath.join("" if target == "." else target, "index.html")
+    return target, parts.fragment
+
+
+class GitTrees:
+    """Paths of the git tree of each ref, listed once per ref"""
+
+    def __init__(self, repo_dir: Path):
+        self.repo_dir = repo_dir
+        self.trees: dict[str, set[str] | None] = {}
+
+    def paths(self, ref: str) -> set[str] | None:
+        if ref not in self.trees:
+            self.trees[ref] = self.list_tree(ref)
+        return self.trees[ref]
+
+    def list_tree(self, ref: str) -> set[str] | None:
+        for candidate in (ref, f"origin/{ref}", f"refs/tags/{ref}"):
+            try:
+                out = subprocess.check_output(
+                    ["git", "ls-tree", "-r", "-z", "--name-only", candidate],
+                    cwd=self.repo_dir,
+                    stderr=subprocess.DEVNULL,
+                )
+            except subprocess.CalledProcessError:
+                continue
+            paths = set()
+            for path in out.decode("utf-8", "replace").split("\0"):
+                while path and path not in paths:
+                    paths.add(path)
+                    path = posixpath.dirname(path)
+            return paths
+        return None
+
+
+def check_site(
+    site_dir: Path,
+    repo: str,
+    repo_dir: Path,
+    jobs: int | None = None,
+) -> dict:
+    """Check every page under ``site_dir``; returns the report"""
+    site_dir = Path(site_dir)
+    pages = find_pages(site_dir)
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        parsed = list(
+            pool.map(parse_page, [str(site_dir)] * len(pages), pages, chunksize=32)
+        )
+    anchors = {rel: set(ids) for rel, ids, _, _ in parsed}
+    try:
+        manifest = json.loads((site_dir / VERSIONS_MANIFEST).read_text("utf-8"))
+        versions = manifest.get("versions", [])
+    except (OSError, ValueError):
+        versions = []
+
+    trees = GitTrees(repo_dir)
+    counts = {"internal": 0, "language": 0, "version": 0, "github": 0}
+    skipped = {"external": 0, "github_unknown_ref": 0}
+    broken = []
+    file_exists: dict[str, bool] = {}
+
+    def exists(target: str) -> bool:
+        if target not in file_exists:
+            file_exists[target] = target in anchors or (site_dir / target).is_file()
+        return file_exists[target]
+
+    def check_internal(page, kind, url):
+        resolved = resolve(page, url)
+        counts[kind] += 1
+        if resolved is None:
+            broken.append((page, kind, url, "outside the site"))
+            return
+        target, fragment = resolved
+        if not exists(target):
+            broken.append((page, kind, url, "missing file"))
+        elif fragment and target in anchors and fragment not in anchors[target]:
+            broken.append((page, kind, url, "missing anchor"))
+
+    for page, _, links, switcher in parsed:
+        for kind, url in links:
+            if url.startswith(("#", "?")) and not url.strip("#?"):
+                continue
+            github = GITHUB_RE.match(url)
+            if github:
+                if github["repo"].lower() != repo.lower():
+                    skipped["external"] += 1
+                    continue
+                paths = trees.paths(github["ref"])
+                if paths is None:
+                    skipped["github_unknown_ref"] += 1
+                    continue
+                counts["github"] += 1
+                path = unquote(github["path"] or "").strip("/")
+                if path and path not in paths:
+                    broken.append((page, "github", url, "not in the git tree"))
+                continue
+            scheme = urlsplit(url).scheme
+            if scheme or url.startswith("//"):
+                if scheme in ("http", "https") or url.startswith("//"):
+                    skipped["external"] += 1
+                continue
+            check_internal(page, kind, url)
+        if switcher:
+            root, pagename = switcher
+            for version in versions:
+                check_internal(page, "version", f"{root}{version}/{pagename}.html")
+
+    return {
+        "pages": len(pages),
+        "checked": counts,
+        "skipped": skipped,
+        "broken": [
+            {"page": p, "kind": k, "url": u, "reason": r} for p, k, u, r in broken
+        ],
+    }
+
+
+def summarize(report: dict) -> str:
+    by_kind = {}
+    for entry in report["broken"]:
+        by_kind[entry["kind"]] = by_kind.get(entry["kind"], 0) + 1
+    checked = sum(report["checked"].values())
+    details = ", ".join(f"{k} {v}" for k, v in sorted(by_kind.items()))
+    return (
+        f"{report['pages']} pages, {checked} links checked, "
+        f"{len(report['broken'])} broken" + (f" ({details})" if details else "")
+    )
+
+
+def write_report(report: dict, path: Path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=1), encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the links of a built site")
+    parser.add_argument("site_dir", type=Path, help="Site directory (build)")
+    parser.add_argument(
+        "--report", type=Path, default=None, help="Write the JSON report here"
+    )
+    parser.add_argument(
+        "--repo",
+        default=f"{os.environ.get('REPO_OWNER', 'datajuicer')}/"
+        f"{os.environ.get('PROJECT', 'data-juicer')}",
+        help="GitHub OWNER/NAME whose blob links are checked (default: from "
+        "REPO_OWNER and PROJECT)",
+    )
+    parser.add_argument(
+        "--repo-dir",
+        type=Path,
+        default=Path(__file__).resolve().parents[2],
+        help="Local clone of that repository (default: this one)",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    parser.add_argument(
+        "--strict", action="store_true", help="Exit with 1 if any link is broken"
+    )
+    args = parser.parse_args()
+    report = check_site(args.site_dir, args.repo, args.repo_dir, args.jobs)
+    if args.report:
+        write_report(report, args.report)
+    for entry in report["broken"][:50]:
+        print(
+            f"  [{entry['kind']}] {entry['page']}: {entry['url']} ({entry['reason']})"
+        )
+    print(f"[LINKS] {summarize(report)}")
+    return 1 if args.strict and report["broken"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Checkout backends that materialize a git ref for a documentation build
+
+A docs build only reads markdown, reStructuredText under ``docs/``, the
+package sources (for API docs) and the extra asset directories. Besides full
+``git worktree`` checkouts this module offers:
+
+* ``sparse``: a worktree with a non-cone sparse checkout of those paths,
+  sharing the object database of the main repository;
+* ``archive``: a plain directory filled by streaming just the needed blobs
+  through ``git cat-file --batch``, without any worktree bookkeeping.
+
+Each checkout records the commit and paths it was made from in a stamp file,
+so a kept checkout is reused when the ref has not moved and updated in place
+(touching only changed files) when it has.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+CHECKOUT_MODES = ["worktree", "sparse", "archive"]
+STAMP_FILE = ".docs_checkout.json"
+
+# Serializes `git worktree` bookkeeping, which is not safe to run concurrently
+GIT_LOCK = threading.Lock()
+
+
+@dataclass
+class CheckoutSpec:
+    """Paths of a ref that a documentation build needs"""
+
+    package_dir: str | None = None  # Package sources for API docs, if enabled
+    asset_paths: list[str] = field(default_factory=list)
+    exclude_dirs: set[str] = field(default_factory=set)
+
+    def sparse_patterns(self) -> list[str]:
+        """Non-cone sparse-checkout patterns (gitignore syntax)"""
+        patterns = ["*.md", "/docs/**/*.rst"]
+        if self.package_dir:
+            patterns.append(f"/{self.package_dir.strip('/')}/")
+        patterns += [f"/{p.strip('/')}/" for p in self.asset_paths]
+        return patterns
+
+    def wants(self, path: str) -> bool:
+        """Whether a repository path is needed, matching ``sparse_patterns``"""
+        parts = path.split("/")
+        if any(part in self.exclude_dirs for part in parts[:-1]):
+            return False
+        if path.endswith(".md"):
+            return True
+        if parts[0] == "docs" and path.endswith(".rst"):
+            return True
+        prefixes = list(self.asset_paths)
+        if self.package_dir:
+            prefixes.append(self.package_dir)
+        return any(path.startswith(p.strip("/") + "/") for p in prefixes)
+
+    def key(self, mode: str) -> dict:
+        return {
+            "mode": mode,
+            "package_dir": self.package_dir,
+            "asset_paths": sorted(self.asset_paths),
+            "exclude_dirs": sorted(self.exclude_dirs),
+        }
+
+
+def _git(args, cwd=None, log=None, **kwargs):
+    """Run a git command, logging like build_versions.run"""
+    line = f"[RUN] {' '.join(['git', *map(str, args)])}"
+    if log is None:
+        print(line)
+    else:
+        log.write(line + "\n")
+        log.flush()
+        kwargs.setdefault("stdout", log)
+        kwargs.setdefault("stderr", subprocess.STDOUT)
+    subprocess.run(["git", *args], cwd=cwd, check=True, **kwargs)
+
+
+def read_stamp(dest: Path) -> dict | None:
+    try:
+        return json.loads((dest / STAMP_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def write_stamp(dest: Path, stamp: dict):
+    (dest / STAMP_FILE).write_text(json.dumps(stamp), encoding="utf-8")
+
+
+def remove_checkout(dest: Path, log=None):
+    """Remove a checkout of any mode and prune worktree references"""
+    if not dest.exists():
+        return
+    is_worktree = (dest / ".git").is_file()
+    if is_worktree:
+        try:
+            with GIT_LOCK:
+                _git(["worktree", "remove", "--force", str(dest)], log=log)
+        except subprocess.CalledProcessError:
+            pass
+    shutil.rmtree(dest, ignore_errors=True)
+    if is_worktree:
+        with GIT_LOCK:
+            try:
+                _git(["worktree", "prune"], log=log)  # Clean up worktree references
+            except subprocess.CalledProcessError:
+                pass
+
+
+def list_tree(commit: str) -> dict[str, tuple[str, str]]:
+    """Map every path of a commit to its (mode, blob id)"""
+    out = subprocess.check_output(["git", "ls-tree", "-r", "-z", "--full-tree", commit])
+    entries = {}
+    for record in out.split(b"\0"):
+        if not record:
+            continue
+        meta, path = record.split(b"\t", 1)
+        mode, kind, oid = meta.decode().split()
+        if kind == "blob":
+            entries[path.decode("utf-8", "surrogateescape")] = (mode, oid)
+    return entries
+
+
+def write_blobs(dest: Path, files: dict[str, tuple[str, str]]):
+    """Stream blobs through one ``git cat-file --batch`` and write them out"""
+    if not files:
+        return
+    items = list(files.items())
+    proc = subprocess.Popen(
+        ["git", "cat-file", "--batch"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+
+    def feed():
+        for _, (_, oid) in items:
+            proc.stdin.write(f"{oid}\n".encode())
+        proc.stdin.close()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        for path, (mode, oid) in items:
+            header = proc.stdout.readline().split()
+            if len(header) != 3 or header[0].decode() != oid:
+                raise RuntimeError(f"unexpected cat-file output for {path}")
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)  # Trailing newline
+
+            target = dest / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists() or target.is_symlink():
+                target.unlink()
+            if mode == "120000":
+                os.symlink(os.fsdecode(data), target)
+                continue
+            target.write_bytes(data)
+            if mode == "100755":
+                target.chmod(0o755)
+    finally:
+        feeder.join()
+        proc.stdout.close()
+        proc.wait()
+
+
+def checkout_archive(commit: str, dest: Path, spec: CheckoutSpec, previous: dict):
+    """Materialize only the needed blobs of ``commit`` into ``dest``
+
+    With a previous stamp, only blobs whose id changed are rewritten and
+    paths that disappeared are deleted, so unchanged files keep their mtime.
+    """
+    files = {p: e for p, e in list_tree(commit).items() if spec.wants(p)}
+    old_files = previous.get("files", {}) if previous else {}
+    changed = {
+        p: e
+        for p, e in files.items()
+        if tuple(old_files.get(p, ())) != e or not (dest / p).exists()
+    }
+    for path in old_files.keys() - files.keys():
+        (dest / path).unlink(missing_ok=True)
+    dest.mkdir(parents=True, exist_ok=True)
+    write_blobs(dest, changed)
+    return files, len(changed)
+
+
+def materialize(
+    ref: str,
+    commit: str,
+    dest: Path,
+    mode: str = "worktree",
+    spec: CheckoutSpec | None = None,
+    log=None,
+) -> str:
+    """Make ``dest`` a checkout of ``commit``, the SHA ``ref`` resolved to
+
+    Returns ``"reused"`` if an existing checkout already matched,
+    ``"updated"`` if it was moved to the new commit in place and
+    ``"created"`` otherwise.
+    """
+    spec = spec or CheckoutSpec()
+    key = spec.key(mode)
+    stamp = read_stamp(dest) if dest.exists() else None
+    compatible = stamp is not None and stamp.get("spec") == key
+
+    if compatible and stamp.get("commit") == commit:
+        return "reused"
+
+    if mode == "archive":
+        if not compatible and dest.exists():
+            remove_checkout(dest, log)
+        files, count = checkout_archive(
+            commit, dest, spec, stamp if compatible else None
+        )
+        _log(f"[CHECKOUT] {ref}: wrote {count} of {len(files)} needed files", log)
+        write_stamp(dest, {"spec": key, "commit": commit, "files": files})
+        return "updated" if compatible else "created"
+
+    if compatible:
+        # The ref moved: switch the kept worktree instead of re-adding it
+        _git(["checkout", "--force", "--detach", commit], cwd=dest, log=log)
+        write_stamp(dest, {"spec": key, "commit": commit})
+        return "updated"
+
+    remove_checkout(dest, log)
+    with GIT_LOCK:
+        if mode == "sparse":
+            _git(
+                ["worktree", "add", "--no-checkout", "--detach", "--force"]
+                + [str(dest), commit],
+                log=log,
+            )
+        else:
+            # Detached, so kept worktrees never lock the branch being built
+            _git(["worktree", "add", "--detach", "--force", str(dest), commit], log=log)
+    if mode == "sparse":
+        _git(
+            ["sparse-checkout", "set", "--no-cone", *spec.sparse_patterns()],
+            cwd=dest,
+            log=log,
+        )
+        _git(["checkout", "--force", "--detach", commit], cwd=dest, log=log)
+    write_stamp(dest, {"spec": key, "commit": commit})
+    return "created"
+
+
+def _log(message: str, log=None):
+    if log is None:
+        print(message)
+    else:
+        log.write(message + "\n")
+        log.flush()
@@ -0,0 +1,192 @@
+"""File placement strategies for assembling documentation trees
+
+Every version build copies the docs template and the configured extra assets
+into its worktree. ``place_file`` can hardlink or reflink instead of copying,
+and ``ContentStore`` keeps one copy of identical files shared by all built
+versions. ``CopyStats`` counts files and bytes per method so the savings show
+up in the build log.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+COPY_MODES = ["copy", "hardlink", "reflink", "auto"]
+FICLONE = 0x40049409  # Linux ioctl that clones file extents (btrfs, xfs, ...)
+
+
+class CopyStats:
+    """Thread-safe counters of placed files and bytes by method"""
+
+    METHODS = ["copied", "hardlinked", "reflinked", "unchanged"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = dict.fromkeys(self.METHODS, 0)
+        self.bytes = dict.fromkeys(self.METHODS, 0)
+
+    def add(self, method: str, size: int):
+        with self._lock:
+            self.files[method] += 1
+            self.bytes[method] += size
+
+    def merge(self, other: "CopyStats"):
+        for method in self.METHODS:
+            with self._lock:
+                self.files[method] += other.files[method]
+                self.bytes[method] += other.bytes[method]
+
+    def report(self) -> str:
+        """One-line summary, e.g. ``120 files / 3.2 MiB: 4 copied (...)``"""
+        total_files = sum(self.files.values())
+        total_bytes = sum(self.bytes.values())
+        parts = [
+            f"{self.files[m]} {m} ({format_bytes(self.bytes[m])})"
+            for m in self.METHODS
+            if self.files[m]
+        ]
+        saved = total_bytes - self.bytes["copied"]
+        return (
+            f"{total_files} files / {format_bytes(total_bytes)}: "
+            f"{', '.join(parts) or 'nothing to do'}; "
+            f"{format_bytes(saved)} not written"
+        )
+
+
+def format_bytes(size: int) -> str:
+    """Human readable byte count"""
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def reflink(src: Path, dst: Path) -> bool:
+    """Clone ``src`` into ``dst`` sharing its data blocks; False if unsupported"""
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as e:
+        dst.unlink(missing_ok=True)
+        if e.errno in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY):
+            return False
+        raise
+    shutil.copystat(src, dst)
+    return True
+
+
+def place_file(src: Path, dst: Path, mode: str = "copy", stats=None) -> str:
+    """Make ``dst`` a copy of ``src`` using ``mode``, falling back to copying
+
+    ``auto`` tries a reflink, then a hardlink. Hardlinks share the inode with
+    the source, so callers must never write into placed files in place.
+    Returns the method that was used.
+    """
+    src, dst = Path(src), Path(dst)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    method = "copied"
+    if mode in ("reflink", "auto") and reflink(src, dst):
+        method = "reflinked"
+    elif mode in ("hardlink", "auto"):
+        try:
+            os.link(src, dst)
+            method = "hardlinked"
+        except OSError:
+            pass  # e.g. cross-device link, fall back to copying
+    if method == "copied":
+        shutil.copy2(src, dst)
+
+    if stats is not None:
+        stats.add(method, dst.stat().st_size)
+    return method
+
+
+def same_file(src: Path, dst: Path) -> bool:
+    """Cheap check whether ``dst`` already mirrors ``src``"""
+    try:
+        s, d = src.stat(), dst.stat()
+    except FileNotFoundError:
+        return False
+    if (s.st_dev, s.st_ino) == (d.st_dev, d.st_ino):
+        return True
+    return s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns
+
+
+def copy_tree(src: Path, dst: Path, mode: str = "copy", stats=None, ignore=()):
+    """Mirror the files of ``src`` into ``dst`` with ``place_file``
+
+    Directories whose name is in ``ignore`` are skipped, and files that
+    already match by inode or size and mtime are left alone.
+    """
+    src, dst = Path(src), Path(dst)
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = [d for d in dirnames if d not in ignore]
+        rel_dir = Path(dirpath).relative_to(src)
+        for name in filenames:
+            if name in ignore:
+                continue
+            source_file = Path(dirpath) / name
+            target = dst / rel_dir / name
+            if same_file(source_file, target):
+                if stats is not None:
+                    stats.add("unchanged", target.stat().st_size)
+                continue
+            place_file(source_file, target, mode, stats)
+
+
+class ContentStore:
+    """Content-addressed file store shared by all built versions
+
+    ``link_into`` keeps one object per distinct content under
+    ``<root>/objects/<sha256[:2]>/<sha256>`` and hardlinks (or reflinks) it
+    to the destination, so identical assets of different versions occupy
+    the disk once.
+    """
+
+    def __init__(self, root: Path, mode: str = "auto"):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.mode = "auto" if mode == "copy" else mode
+        self._lock = threading.Lock()
+
+    def object_path(self, path: Path) -> Path:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        name = digest.hexdigest()
+        return self.objects / name[:2] / name
+
+    def link_into(self, src: Path, dst: Path, stats=None) -> str:
+        """Place ``src`` at ``dst`` through the store"""
+        obj = self.object_path(src)
+        with self._lock:
+            if not obj.exists():
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                tmp = obj.with_name(f"{obj.name}.tmp{os.getpid()}")
+                shutil.copy2(src, tmp)
+                os.replace(tmp, obj)
+        if dst.exists() and os.path.samefile(obj, dst):
+            if stats is not None:
+                stats.add("unchanged", dst.stat().st_size)
+            return "unchanged"
+        return place_file(obj, dst, self.mode, stats)
+
+    def dedupe_tree(self, root: Path, stats=None):
+        """Replace every file below ``root`` by a link to its store object"""
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = Path(dirpath) / name
+                self.link_into(path, path, stats)
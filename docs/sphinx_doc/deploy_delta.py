@@ -0,0 +1,305 @@
+"""Content manifests of a built site and deltas between deployments
+
+Every (version, language) output gets a manifest, ``MANIFEST``, with the
+SHA-256 and size of each of its files. Each entry also keeps the file's
+mtime, so refreshing the manifest after the next build only hashes the
+files whose size or mtime changed. ``build_versions.py --content-manifest``
+writes them after all post-processing.
+
+Deploying works on the site manifest, ``SITE_MANIFEST``. It has the output
+manifests under their output paths, plus the hashes of the files outside any
+output (``versions.json``, ``_assets``, the redirect pages). It is published
+with the site, so the next deployment can read the previous one:
+
+* ``prepare`` compares the site against the previously published manifest
+  and writes a delta directory. It holds the added and changed files under
+  ``files/`` and ``DELTA_FILE``, which lists them and the deleted paths
+  along with the manifest digests before and after;
+* ``apply`` turns a copy of the published site into the new one;
+* ``verify`` hashes a site and compares it with its manifest. It reports
+  missing, modified and unlisted files.
+
+Files and directories whose name starts with a dot are build state (doctrees,
+build keys, manifests) and are not deployed.
+
+Typical use in CI::
+
+    git show origin/gh-pages:content-manifest.json > published.json
+    python deploy_delta.py prepare build --previous published.json --out delta
+    python deploy_delta.py apply delta published-site
+    python deploy_delta.py verify published-site
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from copy_strategy import place_file
+
+MANIFEST = ".content_manifest.json"  # Per output, next to .buildkey
+SITE_MANIFEST = "content-manifest.json"  # Site root, deployed with the site
+DELTA_FILE = "delta.json"
+FORMAT = 1
+HASH_JOBS = 8  # hashlib releases the GIL, so threads hash in parallel
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def manifest_digest(files: dict) -> str:
+    """Identity of a deployment: the digest of its manifest's file list"""
+    data = json.dumps(files, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def walk_files(root: Path, skip=()):
+    """Relative POSIX paths of the deployable files below ``root``"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = [
+            d for d in dirnames if not d.startswith(".") and rel_dir + d not in skip
+        ]
+        for name in filenames:
+            if not name.startswith("."):
+                yield rel_dir + name
+
+
+def hash_files(root: Path, rels: list[str], previous: dict) -> tuple[dict, int]:
+    """Entries ``[digest, size, mtime_ns]`` of ``rels``; also the count hashed
+
+    Files whose size and mtime match their ``previous`` entry keep its digest.
+    """
+
+    def entry(rel):
+        st = os.stat(root / rel)
+        old = previous.get(rel)
+        if old and old[1] == st.st_size and old[2] == st.st_mtime_ns:
+            return old, False
+        return [file_digest(root / rel), st.st_size, st.st_mtime_ns], True
+
+    with ThreadPoolExecutor(max_workers=HASH_JOBS) as pool:
+        results = list(pool.map(entry, rels))
+    files = {rel: result[0] for rel, result in zip(rels, results)}
+    return files, sum(hashed for _, hashed in results)
+
+
+def read_json(path: Path) -> dict:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path: Path, data: dict, **kwargs):
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, **kwargs), encoding="utf-8")
+    tmp.replace(path)
+
+
+def update_manifest(out_dir: Path) -> dict:
+    """Refresh the manifest of one (version, language) output"""
+    previous = read_json(out_dir / MANIFEST).get("files", {})
+    files, hashed = hash_files(out_dir, sorted(walk_files(out_dir)), previous)
+    if files != previous:
+        write_json(out_dir / MANIFEST, {"format": FORMAT, "files": files})
+    return {"files": len(files), "hashed": hashed}
+
+
+def write_manifests(out_dirs: list[Path]) -> str:
+    """Refresh the manifests of all outputs; returns a one-line report"""
+    results = [update_manifest(out_dir) for out_dir in out_dirs]
+    return (
+        f"{len(results)} outputs, {sum(r['files'] for r in results)} files, "
+        f"{sum(r['hashed'] for r in results)} hashed"
+    )
+
+
+def output_dirs(site_dir: Path) -> list[Path]:
+    """``<lang>/<version>`` directories of a site"""
+    return sorted(
+        out_dir
+        for lang_dir in site_dir.iterdir()
+        if lang_dir.is_dir() and not lang_dir.name.startswith((".", "_"))
+        for out_dir in lang_dir.iterdir()
+        if (out_dir / "_static").is_dir() or (out_dir / MANIFEST).is_file()
+    )
+
+
+def site_manifest(site_dir: Path) -> dict:
+    """Path -> ``[digest, size]`` of every deployable file of a site"""
+    outputs = output_dirs(site_dir)
+    files = {}
+    for out_dir in outputs:
+        update_manifest(out_dir)
+        prefix = out_dir.relative_to(site_dir).as_posix() + "/"
+        for rel, (digest, size, _) in read_json(out_dir / MANIFEST)["files"].items():
+            files[prefix + rel] = [digest, size]
+    skip = {out_dir.relative_to(site_dir).as_posix() for out_dir in outputs}
+    rels = [rel for rel in walk_files(site_dir, skip) if rel != SITE_MANIFEST]
+    rest, _ = hash_files(site_dir, rels, {})
+    files.update({rel: entry[:2] for rel, entry in rest.items()})
+    return dict(sorted(files.items()))
+
+
+def load_published(source: str | None) -> dict:
+    """The published site manifest from a file or URL, empty if unavailable"""
+    if not source:
+        return {}
+    if source.startswith(("http://", "https://")):
+        try:
+            with urllib.request.urlopen(source, timeout=30) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError):
+            return {}
+    return read_json(Path(source))
+
+
+def prepare(site_dir: Path, previous: dict, out: Path) -> dict:
+    """Write the site manifest and the delta against ``previous`` to ``out``"""
+    files = site_manifest(site_dir)
+    old = previous.get("files", {})
+    delta = {
+        "format": FORMAT,
+        "base": manifest_digest(old) if old else None,
+        "target": manifest_digest(files),
+        "added": sorted(rel for rel in files if rel not in old),
+        "changed": sorted(
+            rel for rel in files if rel in old and old[rel] != files[rel]
+        ),
+        "deleted": sorted(rel for rel in old if rel not in files),
+    }
+    write_json(site_dir / SITE_MANIFEST, {"format": FORMAT, "files": files})
+
+    shutil.rmtree(out, ignore_errors=True)
+    (out / "files").mkdir(parents=True)
+    for rel in delta["added"] + delta["changed"] + [SITE_MANIFEST]:
+        place_file(site_dir / rel, out / "files" / rel, "auto")
+    write_json(out / DELTA_FILE, delta, indent=1)
+    return delta
+
+
+def apply(delta_dir: Path, target: Path, force: bool = False) -> dict:
+    """Update ``target``, a copy of the published site, with a delta"""
+    delta = read_json(delta_dir / DELTA_FILE)
+    if delta.get("format") != FORMAT:
+        raise ValueError(f"{delta_dir / DELTA_FILE} is not a delta")
+    current = read_json(target / SITE_MANIFEST).get("files", {})
+    base = manifest_digest(current) if current else None
+    if base != delta["base"] and not force:
+        raise ValueError(
+            f"{target} is not the site the delta was prepared against "
+            f"(manifest {str(base)[:12]}, expected {str(delta['base'])[:12]})"
+        )
+    for rel in delta["deleted"]:
+        path = target / rel
+        path.unlink(missing_ok=True)
+        # Drop directories the deletion left empty
+        for parent in path.parents:
+            if parent == target or any(parent.iterdir()):
+                break
+            parent.rmdir()
+    for rel in delta["added"] + delta["changed"] + [SITE_MANIFEST]:
+        place_file(delta_dir / "files" / rel, target / rel)
+    return delta
+
+
+def verify(site_dir: Path, manifest: dict | None = None) -> dict:
+    """Missing, modified and unlisted files of a site against its manifest"""
+    if manifest is None:
+        manifest = read_json(site_dir / SITE_MANIFEST)
+    expected = manifest.get("files", {})
+    present = {rel for rel in walk_files(site_dir) if rel != SITE_MANIFEST}
+    checked, _ = hash_files(site_dir, sorted(present & expected.keys()), {})
+    return {
+        "files": len(expected),
+        "missing": sorted(expected.keys() - present),
+        "modified": sorted(rel for rel, e in checked.items() if e[:2] != expected[rel]),
+        "unlisted": sorted(present - expected.keys()),
+    }
+
+
+def summarize_delta(delta: dict) -> str:
+    return (
+        f"{len(delta['added'])} added, {len(delta['changed'])} changed, "
+        f"{len(delta['deleted'])} deleted"
+        + ("" if delta["base"] else " (no published manifest, full deploy)")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Content manifests and delta deployments of a built site"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser(
+        "prepare", help="Write the site manifest and the delta to publish"
+    )
+    cmd.add_argument("site_dir", type=Path, help="Site directory (build)")
+    cmd.add_argument(
+        "--previous",
+        default=None,
+        metavar="FILE_OR_URL",
+        help=f"The published {SITE_MANIFEST} (default: none, a full deploy)",
+    )
+    cmd.add_argument("--out", type=Path, required=True, help="Delta directory")
+
+    cmd = commands.add_parser("apply", help="Apply a delta to the published site")
+    cmd.add_argument("delta_dir", type=Path)
+    cmd.add_argument("target", type=Path, help="Copy of the published site")
+    cmd.add_argument(
+        "--force",
+        action="store_true",
+        help="Apply even if the target is not the site the delta was made for",
+    )
+
+    cmd = commands.add_parser("verify", help="Check a site against its manifest")
+    cmd.add_argument("site_dir", type=Path)
+    cmd.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help=f"Manifest to check against (default: the site's {SITE_MANIFEST})",
+    )
+    args = parser.parse_args()
+
+    if args.command == "prepare":
+        delta = prepare(args.site_dir, load_published(args.previous), args.out)
+        print(f"[DEPLOY] {summarize_delta(delta)} -> {args.out}")
+        return 0
+    if args.command == "apply":
+        try:
+            delta = apply(args.delta_dir, args.target, args.force)
+        except ValueError as e:
+            print(f"[DEPLOY] {e}", file=sys.stderr)
+            return 1
+        print(f"[DEPLOY] Applied to {args.target}: {summarize_delta(delta)}")
+        return 0
+
+    manifest = read_json(args.manifest) if args.manifest else None
+    report = verify(args.site_dir, manifest)
+    problems = report["missing"] + report["modified"] + report["unlisted"]
+    for kind in ("missing", "modified", "unlisted"):
+        for rel in report[kind][:50]:
+            print(f"  [{kind}] {rel}")
+    print(
+        f"[VERIFY] {report['files']} files: {len(report['missing'])} missing, "
+        f"{len(report['modified'])} modified, {len(report['unlisted'])} unlisted"
+    )
+    return 1 if problems or not report["files"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Resized and WebP variants of the images of the extra asset trees
+
+The trees listed in ``extra_assets.yaml`` (``docs/imgs`` and the like) are
+published as they are, so readers download full-size PNGs. After they have
+been copied into ``source/extra``, ``process_images``
+
+* hashes every image and looks it up in a cache keyed by that hash (and by
+  ``PIPELINE``, the settings below), so an image is only processed once
+  whatever version, language or worktree it appears in;
+* renders the missing ones in parallel processes: WebP copies ``WIDTHS``
+  wide (never wider than the original), with the full-size WebP dropped if
+  it is not smaller than the original;
+* places the variants next to their image as ``<name>.w<width>.webp`` and
+  writes ``INDEX_FILE`` to the tree root. It maps each image to its size
+  and to its ``srcset`` candidates, which ``custom_myst.ImageAssetsTransform``
+  adds to the pages.
+
+Resizing needs the optional ``Pillow`` package. Without it only the
+dimensions are recorded, read from the file headers, which still lets the
+pages reserve the space of each image.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from copy_strategy import place_file, same_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: only dimensions are recorded
+    Image = None
+
+INDEX_FILE = ".image_assets.json"  # Dot file: not copied to the output
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+RESIZE_SUFFIXES = {".png", ".jpg", ".jpeg"}  # GIFs may be animated
+WIDTHS = (480, 960, 1600)
+WEBP_QUALITY = 80
+# Part of the cache key, so changing the settings renders every image again
+PIPELINE = "size-only"
+if Image is not None:
+    PIPELINE = f"webp{WEBP_QUALITY}-" + "-".join(map(str, WIDTHS))
+VARIANT_RE = re.compile(r"\.w\d+\.webp$")
+
+
+def image_size(path: Path) -> tuple[int, int] | None:
+    """Width and height of a PNG, GIF, JPEG or WebP file from its header"""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            chunk = head[12:16]
+            if chunk == b"VP8X":
+                w, h = head[24:27] + b"\0", head[27:30] + b"\0"
+                return struct.unpack("<I", w)[0] + 1, struct.unpack("<I", h)[0] + 1
+            if chunk == b"VP8 ":
+                w, h = struct.unpack("<HH", head[26:30])
+                return w & 0x3FFF, h & 0x3FFF
+            if chunk == b"VP8L":
+                bits = struct.unpack("<I", head[21:25])[0]
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            return None
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            while True:
+                marker = f.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF:
+                    return None
+                length = struct.unpack(">H", marker[2:4])[0]
+                # Start of frame markers, except DHT, JPG and DAC
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    h, w = struct.unpack(">HH", f.read(5)[1:5])
+                    return w, h
+                f.seek(length - 2, os.SEEK_CUR)
+    return None
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def render_variants(src: Path, out_dir: Path) -> dict:
+    """WebP variants of a PNG or JPEG in ``out_dir``, with Pillow"""
+    info = {"width": None, "height": None, "variants": []}
+    with Image.open(src) as opened:
+        img = ImageOps.exif_transpose(opened)
+        info["width"], info["height"] = img.size
+        alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if alpha else "RGB")
+        for width in sorted({min(w, img.width) for w in WIDTHS}):
+            out = out_dir / f"w{width}.webp"
+            if width == img.width:
+                variant = img
+            else:
+                height = max(1, round(img.height * width / img.width))
+                variant = img.resize((width, height), Image.LANCZOS)
+            variant.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+            if width == img.width and out.stat().st_size >= src.stat().st_size:
+                out.unlink()  # The original is the better full-size image
+                continue
+            info["variants"].append(width)
+    return info
+
+
+def render(src: Path, entry_dir: Path) -> dict:
+    """Write the variants of one image and their ``info.json`` to ``entry_dir``"""
+    tmp = Path(tempfile.mkdtemp(dir=entry_dir.parent))
+    try:
+        info = None
+        if Image is not None and src.suffix.lower() in RESIZE_SUFFIXES:
+            try:
+                info = render_variants(src, tmp)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                for stale in tmp.iterdir():
+                    stale.unlink()
+        if info is None:
+            try:
+                size = image_size(src)
+            except (OSError, struct.error):
+                size = None
+            info = {"width": None, "height": None, "variants": []}
+            if size:
+                info["width"], info["height"] = size
+        (tmp / "info.json").write_text(json.dumps(info), encoding="utf-8")
+        try:
+            tmp.rename(entry_dir)
+        except OSError:
+            pass  # Rendered concurrently by another build
+        return info
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def find_images(root: Path) -> list[Path]:
+    images = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in filenames:
+            suffix = os.path.splitext(name)[1].lower()
+            if suffix in IMAGE_SUFFIXES and not VARIANT_RE.search(name):
+                images.append(Path(dirpath) / name)
+    return sorted(images)
+
+
+def process_images(
+    root: Path,
+    cache_dir: Path,
+    copy_mode: str = "copy",
+    jobs: int | None = None,
+    stats=None,
+) -> dict[str, int]:
+    """Add the variants of every image below ``root`` and write its index"""
+    jobs = jobs or os.cpu_count() or 1
+    cache = Path(cache_dir) / PIPELINE
+    cache.mkdir(parents=True, exist_ok=True)
+    images = find_images(root)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        digests = list(pool.map(file_digest, images))
+
+    # One render per distinct image; identical files share it
+    missing = {}
+    for path, digest in zip(images, digests):
+        if not (cache / digest / "info.json").exists():
+            missing.setdefault(digest, path)
+    if missing:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            list(
+                pool.map(
+                    render, missing.values(), [cache / d for d in missing], chunksize=4
+                )
+            )
+
+    index = {}
+    counts = {"images": len(images), "rendered": len(missing), "variants": 0}
+    for path, digest in zip(images, digests):
+        entry_dir = cache / digest
+        info = json.loads((entry_dir / "info.json").read_text(encoding="utf-8"))
+        if not info["width"]:
+            continue
+        srcset = []
+        for width in info["variants"]:
+            name = f"{path.stem}.w{width}.webp"
+            variant = entry_dir / f"w{width}.webp"
+            if not same_file(variant, path.with_name(name)):
+                place_file(variant, path.with_name(name), copy_mode, stats)
+            srcset.append([name, width])
+            counts["variants"] += 1
+        if srcset and srcset[-1][1] < info["width"]:
+            srcset.append([path.name, info["width"]])
+        index[path.relative_to(root).as_posix()] = {
+            "width": info["width"],
+            "height": info["height"],
+            "srcset": srcset,
+        }
+    (root / INDEX_FILE).write_text(json.dumps(index, indent=1), encoding="utf-8")
+    return counts
+
+
+def summarize(counts: dict[str, int]) -> str:
+    note = "" if Image is not None else " (sizes only: Pillow is not installed)"
+    return (
+        f"{counts['images']} images, {counts['rendered']} rendered, "
+        f"{counts['variants']} variants{note}"
+    )
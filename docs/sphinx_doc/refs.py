@@ -0,0 +1,132 @@
+"""Commit SHAs of all branches and tags, read once per run
+
+``RefIndex.load`` optionally fetches the remote, then lists every local
+branch, tag and remote-tracking branch with its commit in a single
+``git for-each-ref`` call (annotated tags are peeled to their commit). Short
+names resolve like ``git rev-parse`` does: tags, then local branches, then
+remote-tracking branches given with their remote (``origin/main``). A branch
+that only exists on a remote resolves like ``git checkout`` guesses it, to
+``<remote>/<name>`` of the fetched remote first, then of any other remote:
+CI clones often have ``origin/main`` but no local ``main``. Anything else (a
+SHA, ``HEAD~1``) falls back to ``git rev-parse`` and is remembered.
+
+The index of the previous run is kept in a JSON file, so a run can tell
+which refs moved since then.
+"""
+
+import json
+import subprocess
+import time
+from pathlib import Path
+
+FORMAT = "%(refname)%00%(objectname)%00%(*objectname)"
+
+
+class RefIndex:
+    """Commits of the branches and tags of one repository"""
+
+    def __init__(
+        self, refs: dict[str, str], cwd: Path | None = None, remote: str = "origin"
+    ):
+        self.refs = refs  # Full ref name -> commit
+        self.cwd = cwd
+        self.remote = remote  # Tried first for branches only on a remote
+        self.resolved: dict[str, str | None] = {}
+
+    @classmethod
+    def load(cls, remote: str, fetch: bool = True, cwd: Path | None = None, run=None):
+        """Fetch ``remote`` unless ``fetch`` is false, then list every ref
+
+        ``run`` executes the fetch command (``build_versions.run`` logs it).
+        """
+        if fetch:
+            cmd = ["git", "fetch", "--tags", "--force", remote]
+            if run is not None:
+                run(cmd, cwd=cwd)
+            else:
+                subprocess.run(cmd, cwd=cwd, check=True)
+        out = subprocess.check_output(
+            [
+                "git",
+                "for-each-ref",
+                f"--format={FORMAT}",
+                "refs/heads",
+                "refs/tags",
+                "refs/remotes",
+            ],
+            cwd=cwd,
+            text=True,
+        )
+        refs = {}
+        for line in out.splitlines():
+            name, obj, peeled = line.split("\0")
+            refs[name] = peeled or obj
+        return cls(refs, cwd, remote)
+
+    def names(self, prefix: str) -> list[str]:
+        return [name[len(prefix) :] for name in self.refs if name.startswith(prefix)]
+
+    @property
+    def tags(self) -> list[str]:
+        return self.names("refs/tags/")
+
+    @property
+    def branches(self) -> list[str]:
+        return self.names("refs/heads/")
+
+    @property
+    def remotes(self) -> list[str]:
+        """Remotes with remote-tracking branches, ``self.remote`` first"""
+        found = {name.split("/", 1)[0] for name in self.names("refs/remotes/")}
+        return sorted(found, key=lambda name: (name != self.remote, name))
+
+    def resolve(self, ref: str) -> str | None:
+        """Commit of a branch, tag or any other revision, None if unknown"""
+        if ref not in self.resolved:
+            prefixes = ["refs/tags/", "refs/heads/", "refs/remotes/"]
+            if ref != "HEAD":  # Not the remote's default branch
+                prefixes += [f"refs/remotes/{remote}/" for remote in self.remotes]
+            for prefix in prefixes + [""]:
+                if prefix + ref in self.refs:
+                    self.resolved[ref] = self.refs[prefix + ref]
+                    break
+            else:
+                self.resolved[ref] = self.rev_parse(ref)
+        return self.resolved[ref]
+
+    def rev_parse(self, ref: str) -> str | None:
+        try:
+            out = subprocess.check_output(
+                ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+                cwd=self.cwd,
+                text=True,
+                stderr=subprocess.DEVNULL,
+            )
+        except subprocess.CalledProcessError:
+            return None
+        return out.strip() or None
+
+    def moved_since(self, previous: dict) -> list[str]:
+        """Short names of refs whose commit differs from a saved index"""
+        old = previous.get("refs", {})
+        return sorted(
+            name.split("/", 2)[2]
+            for name, commit in self.refs.items()
+            if name in old and old[name] != commit
+        )
+
+    def save(self, path: Path):
+        """Record the commits of this run for the next one"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"time": time.time(), "refs": self.refs}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+        tmp.replace(path)
+
+
+def load_previous(path: Path) -> dict:
+    """The index saved by the previous run, empty if there is none"""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
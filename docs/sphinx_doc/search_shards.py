@@ -0,0 +1,260 @@
+"""Sharded search indexes built from the ``searchindex.js`` of each output
+
+Sphinx writes the whole search index of a version into one ``searchindex.js``
+that the search page downloads and parses before the first query. With the
+operator pages and the API reference that is several megabytes per version
+and language. ``index_site`` runs after the builds and splits it:
+
+* the full-text ``terms`` and ``titleterms`` are partitioned by their first
+  ``PREFIX_LEN`` characters into shard files;
+* everything else (document names, titles, objects, index entries) goes
+  into one core file;
+* ``manifest.json`` names the core and shard files, which carry a hash of
+  their content so they can be cached forever.
+
+``search.html`` is pointed at ``_static/search-shards.js``, which loads the
+core and then, for each query, only the shards of its words. Partial matches
+(a word inside a longer term) are found within the shard of the word.
+
+With ``all_versions`` one combined index per language is written to
+``<lang>/_search`` instead, so a search on any version finds the pages of
+every version; results are labelled with their version.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+INDEX_DIR = "_search"  # In each output, or per language for all versions
+MANIFEST = "manifest.json"
+PREFIX_LEN = 2
+HASH_LEN = 12
+SCRIPT = "_static/search-shards.js"
+SCRIPT_RE = re.compile(r'<script\b[^>]*\bsrc="searchindex\.js"[^>]*>')
+SHARD_SCRIPT_RE = re.compile(r'<script\b[^>]*\bdata-manifest="([^"]*)"[^>]*>')
+
+
+def load_index(path: Path) -> dict:
+    """Parse a ``Search.setIndex({...})`` file"""
+    text = path.read_text(encoding="utf-8").strip()
+    start, end = text.index("("), text.rindex(")")
+    return json.loads(text[start + 1 : end])
+
+
+def shard_key(term: str) -> str:
+    return term[:PREFIX_LEN].lower()
+
+
+def split_index(index: dict) -> tuple[dict, dict[str, dict]]:
+    """Core index without full-text terms, and the terms by shard key"""
+    core = {k: v for k, v in index.items() if k not in ("terms", "titleterms")}
+    shards = {}
+    for section in ("terms", "titleterms"):
+        for term, docs in index.get(section, {}).items():
+            shard = shards.setdefault(shard_key(term), {"terms": {}, "titleterms": {}})
+            shard[section][term] = docs
+    return core, shards
+
+
+def dump(data) -> bytes:
+    return json.dumps(
+        data, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+    ).encode("utf-8")
+
+
+def write_file(target: Path, stem: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    name = f"{stem}.{digest}.json"
+    if not (target / name).exists():
+        (target / name).write_bytes(data)
+    return name
+
+
+def write_index(index: dict, target: Path, **extra) -> dict:
+    """Write the core, shards and manifest of ``index`` into ``target``
+
+    Files of a previous index that are no longer named are removed once the
+    new manifest is in place.
+    """
+    target.mkdir(parents=True, exist_ok=True)
+    core, shards = split_index(index)
+    core_data = dump(core)
+    manifest = {
+        "version": 1,
+        "prefix": PREFIX_LEN,
+        "core": write_file(target, "core", core_data),
+        "shards": {},
+        **extra,
+    }
+    largest = 0
+    for key, shard in sorted(shards.items()):
+        data = dump(shard)
+        largest = max(largest, len(data))
+        # Keys may be any characters: name the file by their code points
+        stem = "terms-" + key.encode("utf-8").hex()
+        manifest["shards"][key] = write_file(target, stem, data)
+    tmp = target / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, target / MANIFEST)
+
+    used = {MANIFEST, manifest["core"], *manifest["shards"].values()}
+    for path in target.iterdir():
+        if path.name not in used and not path.name.endswith((".gz", ".br")):
+            path.unlink()
+        elif path.name.endswith((".gz", ".br")) and path.name[:-3] not in used:
+            path.unlink()
+    return {"shards": len(shards), "core": len(core_data), "largest": largest}
+
+
+def merge_indexes(indexes: list[tuple[str, dict]]) -> dict:
+    """Combine the indexes of several versions of one language
+
+    Document names get a ``../<version>/`` prefix, relative to the content
+    root of any version, and titles a ``[<version>]`` label.
+    """
+    merged = {
+        "docnames": [],
+        "filenames": [],
+        "titles": [],
+        "terms": {},
+        "titleterms": {},
+        "alltitles": {},
+        "indexentries": {},
+        "objects": {},
+        "objtypes": {},
+        "objnames": {},
+    }
+    type_ids: dict[str, int] = {}
+    for version, index in indexes:
+        offset = len(merged["docnames"])
+        if "envversion" not in merged:
+            merged["envversion"] = index.get("envversion")
+        merged["docnames"] += [f"../{version}/{d}" for d in index["docnames"]]
+        merged["filenames"] += [f"../{version}/{f}" for f in index["filenames"]]
+        merged["titles"] += [f"[{version}] {t}" for t in index["titles"]]
+
+        for section in ("terms", "titleterms"):
+            target = merged[section]
+            for term, docs in index.get(section, {}).items():
+                docs = [docs] if isinstance(docs, int) else docs
+                target.setdefault(term, []).extend(d + offset for d in docs)
+
+        for section in ("alltitles", "indexentries"):
+            target = merged[section]
+            for name, entries in index.get(section, {}).items():
+                target.setdefault(name, []).extend(
+                    [e[0] + offset, *e[1:]] for e in entries
+                )
+
+        remap = {}
+        for old_id, objtype in index.get("objtypes", {}).items():
+            if objtype not in type_ids:
+                type_ids[objtype] = len(type_ids)
+                merged["objtypes"][str(type_ids[objtype])] = objtype
+                merged["objnames"][str(type_ids[objtype])] = index["objnames"][old_id]
+            remap[int(old_id)] = type_ids[objtype]
+        for prefix, objects in index.get("objects", {}).items():
+            merged["objects"].setdefault(prefix, []).extend(
+                [o[0] + offset, remap[o[1]], *o[2:]] for o in objects
+            )
+    return merged
+
+
+def point_search_page(out_dir: Path, manifest_url: str) -> bool:
+    """Load ``search-shards.js`` instead of ``searchindex.js`` on the search page
+
+    ``manifest_url`` is relative to the content root of the output.
+    """
+    page = out_dir / "search.html"
+    try:
+        text = page.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return False
+    found = SHARD_SCRIPT_RE.search(text)
+    if found:
+        if found.group(1) == manifest_url:
+            return False
+        # Keep the src: --optimize-static may have pointed it at _assets
+        new_text = text[: found.start(1)] + manifest_url + text[found.end(1) :]
+    else:
+        tag = f'<script src="{SCRIPT}" data-manifest="{manifest_url}">'
+        new_text, count = SCRIPT_RE.subn(tag, text, 1)
+        if not count:
+            return False
+    page.write_text(new_text, encoding="utf-8")
+    return True
+
+
+def is_current(index_dir: Path, sources: list[Path], **extra) -> bool:
+    """Whether the manifest in ``index_dir`` is newer than every source"""
+    try:
+        manifest_path = index_dir / MANIFEST
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        mtime = manifest_path.stat().st_mtime_ns
+    except (OSError, ValueError):
+        return False
+    if any(manifest.get(k) != v for k, v in extra.items()):
+        return False
+    return all(source.stat().st_mtime_ns <= mtime for source in sources)
+
+
+def index_site(site_dir: Path, out_dirs: list[Path], all_versions: bool = False):
+    """Shard the search index of every output; returns a one-line report
+
+    Outputs without ``searchindex.js`` (failed or non-HTML builds) are left
+    as they are.
+    """
+    by_lang: dict[Path, list[Path]] = {}
+    for out_dir in out_dirs:
+        if (out_dir / "searchindex.js").is_file():
+            by_lang.setdefault(out_dir.parent, []).append(out_dir)
+
+    written, unchanged, shards, largest = 0, 0, 0, 0
+    for lang_dir, outputs in by_lang.items():
+        combined_dir = lang_dir / INDEX_DIR
+        if not all_versions:
+            shutil.rmtree(combined_dir, ignore_errors=True)
+            for out_dir in outputs:
+                index_dir = out_dir / INDEX_DIR
+                point_search_page(out_dir, f"{INDEX_DIR}/{MANIFEST}")
+                if is_current(index_dir, [out_dir / "searchindex.js"]):
+                    unchanged += 1
+                    continue
+                stats = write_index(load_index(out_dir / "searchindex.js"), index_dir)
+                written += 1
+                shards += stats["shards"]
+                largest = max(largest, stats["largest"])
+            continue
+
+        versions = [out_dir.name for out_dir in outputs]
+        for out_dir in outputs:
+            shutil.rmtree(out_dir / INDEX_DIR, ignore_errors=True)
+            point_search_page(out_dir, f"../{INDEX_DIR}/{MANIFEST}")
+        sources = [out_dir / "searchindex.js" for out_dir in outputs]
+        if is_current(combined_dir, sources, versions=versions):
+            unchanged += 1
+            continue
+        merged = merge_indexes(
+            [
+                (out_dir.name, load_index(out_dir / "searchindex.js"))
+                for out_dir in outputs
+            ]
+        )
+        stats = write_index(merged, combined_dir, versions=versions)
+        written += 1
+        shards += stats["shards"]
+        largest = max(largest, stats["largest"])
+
+    kind = "combined indexes" if all_versions else "indexes"
+    return (
+        f"{written} {kind} written ({unchanged} unchanged), {shards} shards, "
+        f"largest {largest / 1024:.1f} KiB"
+    )
+
+
+def index_dirs(site_dir: Path) -> list[Path]:
+    """Per-language combined index directories, to post-process with the site"""
+    return sorted(p for p in site_dir.glob(f"*/{INDEX_DIR}") if p.is_dir())
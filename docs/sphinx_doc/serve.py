@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""Live-reloading preview of the current checkout's documentation
+
+Unlike ``build_versions.py`` this builds the working tree itself: the docs
+template and the aggregated sources are staged once in ``.worktrees/_serve``
+and the site is written to ``build/<lang>/local``. The repository is then
+watched (inotify on Linux, polling elsewhere); every change is mirrored into
+the staging tree file by file and followed by an incremental Sphinx build in
+this process, so only the changed documents are read again and the modules
+Sphinx and its extensions import stay loaded. Pages served by the built-in
+HTTP server reload themselves once a build finishes.
+
+    cd docs/sphinx_doc && python serve.py [-l zh_CN] [-A] [--port 8000]
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import http.server
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+from build_versions import (
+    API_MODES,
+    DOCS_REL,
+    DOCS_SOURCE_IGNORE,
+    PACKAGE_DIR,
+    REPO_ROOT,
+    SITE_DIR,
+    WORKTREES_DIR,
+    BuildOptions,
+    copy_docs_source_to,
+    copy_markdown_files,
+    generate_api_docs,
+    is_doc_source,
+    load_extra_assets_config,
+    sphinx_env,
+)
+from copy_strategy import place_file
+from static_assets import release_static
+
+SERVE_ROOT = WORKTREES_DIR / "_serve"  # Staged template and sources
+SERVE_LABEL = "local"  # Version label of the preview, build/<lang>/local
+LIVERELOAD_PATH = "/_livereload"
+LIVERELOAD_SCRIPT = (
+    f'<script>new EventSource("{LIVERELOAD_PATH}")'
+    ".onmessage = () => location.reload();</script>"
+).encode()
+DEBOUNCE = 0.1  # Seconds without further changes before a rebuild starts
+POLL_INTERVAL = 0.5
+# Directories never watched
+WATCH_IGNORE = {".git", WORKTREES_DIR.name, "node_modules", "__pycache__", "outputs"}
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def watched_dirs(root: Path):
+    """Directories below ``root`` that can contain watched files"""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [
+            d
+            for d in dirnames
+            if d not in WATCH_IGNORE and Path(dirpath, d) != SITE_DIR
+        ]
+        yield Path(dirpath)
+
+
+class InotifyWatcher:
+    """Recursive watch of a directory tree through inotify"""
+
+    def __init__(self, root: Path):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: dict[int, Path] = {}
+        for path in watched_dirs(root):
+            self.add(path)
+
+    def add(self, path: Path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def read(self) -> set[Path]:
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if wd not in self.dirs or not name:
+                continue
+            path = self.dirs[wd] / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path.name not in WATCH_IGNORE:
+                    # Files may land in a new directory before it is watched
+                    for sub in watched_dirs(path):
+                        self.add(sub)
+                        changed.update(p for p in sub.iterdir() if p.is_file())
+                continue
+            if mask & IN_CREATE:
+                continue  # Reported again by IN_CLOSE_WRITE once written
+            changed.add(path)
+        return changed
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return self.read() if ready else set()
+
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: compares mtimes periodically"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict[Path, tuple[int, int]]:
+        files = {}
+        for path in watched_dirs(self.root):
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return files
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        time.sleep(POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL))
+        current = self.scan()
+        changed = {
+            p
+            for p in current.keys() | self.snapshot.keys()
+            if current.get(p) != self.snapshot.get(p)
+        }
+        self.snapshot = current
+        return changed
+
+
+def make_watcher(root: Path, poll: bool = False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"[WATCH] inotify unavailable ({e}), polling instead")
+    return PollingWatcher(root)
+
+
+def wait_for_changes(watcher) -> set[Path]:
+    """Block until something changed, then collect until it settles"""
+    changed = watcher.wait()
+    while changed:
+        more = watcher.wait(DEBOUNCE)
+        if not more:
+            break
+        changed |= more
+    return changed
+
+
+class Preview:
+    """Staging tree of the working copy and its incremental builds"""
+
+    def __init__(self, lang: str, options: BuildOptions, jobs: int):
+        self.lang = lang
+        self.options = options
+        self.jobs = jobs
+        self.docs_root = SERVE_ROOT / DOCS_REL
+        self.src = self.docs_root / "source"
+        self.out_dir = SITE_DIR / lang / SERVE_LABEL
+        self.assets = [Path(a) for a in load_extra_assets_config()["assets"]]
+        self.generation = 0  # Finished builds, polled by the live reload streams
+        self.built = threading.Condition()
+
+    def stage(self):
+        """Copy the template and aggregate all sources, unchanged files are kept"""
+        copy_docs_source_to(SERVE_ROOT)
+        copy_markdown_files(REPO_ROOT, docs_root=self.docs_root)
+        if self.options.enable_api_doc:
+            generate_api_docs(REPO_ROOT, self.src, self.options)
+
+    def target(self, rel: Path) -> Path | None:
+        """Where a changed file of the repository goes in the staging tree"""
+        if rel.parts[: len(DOCS_REL.parts)] == DOCS_REL.parts:
+            if any(part in DOCS_SOURCE_IGNORE for part in rel.parts):
+                return None
+            return SERVE_ROOT / rel
+        for asset in self.assets:
+            if rel.parts[: len(asset.parts)] == asset.parts:
+                return self.src / "extra" / rel
+        if is_doc_source(rel):
+            return self.src / rel
+        return None
+
+    def sync(self, changed: set[Path]) -> list[str]:
+        """Mirror changed files into the staging tree; returns what changed"""
+        synced, package_changed = [], False
+        for path in sorted(changed):
+            rel = path.relative_to(REPO_ROOT)
+            if rel.parts[:1] == (PACKAGE_DIR,) and rel.suffix == ".py":
+                package_changed = True
+                synced.append(str(rel))
+                continue
+            target = self.target(rel)
+            if target is None:
+                continue
+            if path.is_file():
+                place_file(path, target)
+            elif target.is_file():
+                target.unlink()
+            else:
+                continue
+            synced.append(str(rel))
+        if package_changed:
+            self.reload_package()
+        return synced
+
+    def reload_package(self):
+        """Let autodoc import the edited package afresh on the next build"""
+        for name in [m for m in sys.modules if m.split(".")[0] == PACKAGE_DIR]:
+            del sys.modules[name]
+        if self.options.enable_api_doc:
+            generate_api_docs(REPO_ROOT, self.src, self.options)
+
+    def build(self) -> bool:
+        """Incremental build in this process: only outdated documents are read"""
+        from sphinx.application import Sphinx
+        from sphinx.util.docutils import docutils_namespace, patch_docutils
+
+        os.environ.update(sphinx_env("HEAD", SERVE_LABEL, REPO_ROOT, self.options))
+        start = time.perf_counter()
+        release_static(self.out_dir)  # In case --optimize-static processed it
+        try:
+            # Like sphinx-build: directives registered by one build don't leak
+            with patch_docutils(str(self.src)), docutils_namespace():
+                app = Sphinx(
+                    str(self.src),
+                    str(self.src),
+                    str(self.out_dir),
+                    str(self.out_dir / ".doctrees"),
+                    "html",
+                    confoverrides={"language": self.lang},
+                    parallel=self.jobs,
+                )
+                app.build()
+            ok = app.statuscode == 0
+        except Exception as e:  # Keep serving the last good build
+            print(f"[SERVE] Build failed: {e}")
+            ok = False
+        print(f"[SERVE] Built in {time.perf_counter() - start:.2f}s")
+        with self.built:
+            self.generation += 1
+            self.built.notify_all()
+        return ok
+
+
+class LiveReloadHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the site and tells open pages when a new build is ready"""
+
+    preview: Preview
+
+    def do_GET(self):
+        if self.path == LIVERELOAD_PATH:
+            return self.stream_reloads()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            return self.send_page(path)
+        return super().do_GET()
+
+    def send_page(self, path: str):
+        with open(path, "rb") as f:
+            body = f.read()
+        head, sep, tail = body.rpartition(b"</body>")
+        body = head + LIVERELOAD_SCRIPT + sep + tail if sep else body
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        preview = self.preview
+        with preview.built:
+            seen = preview.generation
+        try:
+            while True:
+                with preview.built:
+                    preview.built.wait_for(lambda: preview.generation != seen, 15)
+                    current = preview.generation
+                if current == seen:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    seen = current
+                    self.wfile.write(b"data: reload\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for build output
+
+
+def serve(preview: Preview, host: str, port: int):
+    handler = partial(LiveReloadHandler, directory=str(SITE_DIR))
+    LiveReloadHandler.preview = preview
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Build the current checkout's docs and rebuild on changes"
+    )
+    parser.add_argument(
+        "--language",
+        "-l",
+        default="en",
+        help="Language to preview (default: en)",
+    )
+    parser.add_argument(
+        "--no-api-doc",
+        "-A",
+        action="store_true",
+        help="Skip sphinx-apidoc and the API reference",
+    )
+    parser.add_argument(
+        "--api-mode",
+        choices=API_MODES,
+        default="import",
+        help="How autodoc reads the package (see build_versions.py)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Parallel Sphinx workers for a build (default: 1)",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Detect changes by polling even where inotify is available",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    enable_api_doc = not args.no_api_doc
+    if enable_api_doc and not (REPO_ROOT / PACKAGE_DIR).is_dir():
+        print(f"[SERVE] No {PACKAGE_DIR}/ in {REPO_ROOT}, API docs disabled")
+        enable_api_doc = False
+    options = BuildOptions(enable_api_doc=enable_api_doc, api_mode=args.api_mode)
+    preview = Preview(args.language, options, args.jobs)
+    WORKTREES_DIR.mkdir(exist_ok=True)
+
+    watcher = make_watcher(REPO_ROOT, args.poll)
+    preview.stage()
+    preview.build()
+    server = serve(preview, args.host, args.port)
+    index = "index.html" if args.language == "en" else "index_ZH.html"
+    print(
+        f"[SERVE] http://{args.host}:{args.port}/{args.language}/{SERVE_LABEL}/{index}"
+        f" (watching {REPO_ROOT} with {type(watcher).__name__})"
+    )
+    try:
+        while True:
+            changed = wait_for_changes(watcher)
+            synced = preview.sync(changed)
+            if synced:
+                print(f"[WATCH] {', '.join(synced)}")
+                preview.build()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
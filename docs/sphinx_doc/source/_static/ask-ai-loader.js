@@ -0,0 +1,80 @@
+// Ask AI button that loads the chat widget on first use.
+//
+// Only this file and ask-ai-widget.css are part of every page. The widget
+// modules (_static/ask-ai/, built by rollup from ask-ai-modules/) and the
+// markdown renderer are downloaded when the reader points at or focuses the
+// button, and the widget, which then checks the API health and loads the
+// session history, is created when the button is clicked.
+(function() {
+    'use strict';
+
+    const script = document.currentScript;
+    const WIDGET_MODULE = '_static/ask-ai/ask-ai-widget.js';
+    const TITLES = {en: 'Ask Juicer', zh: '询问 Juicer'};
+    let loading = null;
+
+    function loadScript(src) {
+        return new Promise((resolve, reject) => {
+            const element = document.createElement('script');
+            element.src = src;
+            element.onload = resolve;
+            element.onerror = () => reject(new Error(`Failed to load ${src}`));
+            document.head.appendChild(element);
+        });
+    }
+
+    function load() {
+        if (!loading) {
+            const contentRoot = new URL(
+                document.documentElement.dataset.content_root || './',
+                window.location.href
+            );
+            const marked = typeof window.marked === 'undefined'
+                ? loadScript(script.dataset.marked)
+                : Promise.resolve();
+            const widget = import(new URL(WIDGET_MODULE, contentRoot).href);
+            loading = Promise.all([widget, marked]).then(([module]) => module);
+            loading.catch(() => {
+                loading = null; // Retry on the next interaction
+            });
+        }
+        return loading;
+    }
+
+    function init() {
+        const stub = document.createElement('div');
+        stub.className = 'ask-ai-widget';
+        const button = document.createElement('button');
+        button.className = 'ask-ai-button';
+        button.title = TITLES[(document.documentElement.lang || 'en').slice(0, 2)] || TITLES.en;
+        button.innerHTML = '<span class="ask-ai-button-text">Ask AI</span>';
+        stub.appendChild(button);
+        document.body.appendChild(stub);
+
+        ['pointerenter', 'focus', 'touchstart'].forEach((type) => {
+            button.addEventListener(type, () => load().catch(() => {}), {
+                once: true,
+                passive: true,
+            });
+        });
+        button.addEventListener('click', () => {
+            if (button.hasAttribute('aria-busy')) return;
+            button.setAttribute('aria-busy', 'true');
+            load()
+                .then((module) => {
+                    stub.remove();
+                    module.mount({open: true});
+                })
+                .catch((error) => {
+                    button.removeAttribute('aria-busy');
+                    console.error('Ask AI widget unavailable:', error);
+                });
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -2,6 +2,11 @@
  * Ask AI Widget - API Communication Layer
  */
 
+// The health status is kept for the browser session, so opening the chat on
+// another page does not query the service again
+const HEALTH_KEY = 'ask-ai-health';
+const HEALTH_TTL_MS = 5 * 60 * 1000;
+
 export class AskAIApi {
   constructor(sessionId, i18n) {
     this.sessionId = sessionId;
@@ -23,6 +28,12 @@ export class AskAIApi {
   }
 
   async checkApiConnection() {
+    const cached = this.getCachedHealth();
+    if (cached !== null) {
+      this.apiConnected = cached;
+      return this.apiConnected;
+    }
+
     try {
       const response = await fetch(`${this.getApiBaseUrl()}/health`, {
         method: 'GET',
@@ -41,9 +52,43 @@ export class AskAIApi {
       console.warn('Failed to connect to API:', error);
       this.apiConnected = false;
     }
+    this.setCachedHealth(this.apiConnected);
     return this.apiConnected;
   }
 
+  /**
+   * Health status cached in sessionStorage for this API URL
+   * @returns {boolean|null} Cached status, null if missing or expired
+   */
+  getCachedHealth() {
+    try {
+      const cached = JSON.parse(sessionStorage.getItem(HEALTH_KEY));
+      if (cached && cached.url === this.getApiBaseUrl() &&
+          Date.now() - cached.time < HEALTH_TTL_MS) {
+        return cached.connected;
+      }
+    } catch (error) {
+      // Storage unavailable or corrupt entry
+    }
+    return null;
+  }
+
+  /**
+   * Cache the health status in sessionStorage
+   * @param {boolean} connected - Whether the service is healthy
+   */
+  setCachedHealth(connected) {
+    try {
+      sessionStorage.setItem(HEALTH_KEY, JSON.stringify({
+        url: this.getApiBaseUrl(),
+        connected: connected,
+        time: Date.now(),
+      }));
+    } catch (error) {
+      // Storage unavailable (private mode, quota)
+    }
+  }
+
   /**
    * Get the latest messages from server memory
    * @param {number} limit - Number of recent messages to fetch (default: 10)
@@ -0,0 +1,70 @@
+/**
+ * Ask AI Widget - Feedback Module
+ *
+ * Like/dislike and copy actions of assistant messages, loaded on the first
+ * click on one of their buttons.
+ */
+
+/**
+ * Handle feedback submission
+ * @param {AskAIApi} api - API module
+ * @param {HTMLElement} button - Feedback button element
+ * @param {string} messageId - Message ID
+ * @param {string} feedbackType - Feedback type ('like' or 'dislike')
+ */
+export async function handleFeedback(api, button, messageId, feedbackType) {
+  // Get all feedback buttons for this message
+  const feedbackDiv = button.closest('.ask-ai-feedback-actions');
+  const allButtons = feedbackDiv.querySelectorAll('.ask-ai-feedback-btn[data-feedback]');
+
+  // Check if clicking the same button again (toggle off)
+  if (button.classList.contains('active')) {
+    button.classList.remove('active');
+    return;
+  }
+
+  // Remove active state from all feedback buttons
+  allButtons.forEach(btn => btn.classList.remove('active'));
+
+  // Add active state to clicked button
+  button.classList.add('active');
+
+  // Submit feedback to backend
+  const success = await api.submitFeedback(messageId, feedbackType);
+
+  if (success) {
+    console.log(`Feedback "${feedbackType}" submitted for message ${messageId}`);
+  } else {
+    console.error('Failed to submit feedback');
+    // Remove active state on failure
+    button.classList.remove('active');
+  }
+}
+
+/**
+ * Copy content to clipboard
+ * @param {string} content - Content to copy
+ */
+export async function copyToClipboard(content) {
+  try {
+    await navigator.clipboard.writeText(content);
+    console.log('Content copied to clipboard');
+  } catch (error) {
+    console.error('Failed to copy to clipboard:', error);
+
+    // Fallback for older browsers
+    const textArea = document.createElement('textarea');
+    textArea.value = content;
+    textArea.style.position = 'fixed';
+    textArea.style.left = '-999999px';
+    document.body.appendChild(textArea);
+    textArea.select();
+    try {
+      document.execCommand('copy');
+      console.log('Content copied to clipboard (fallback)');
+    } catch (err) {
+      console.error('Fallback copy failed:', err);
+    }
+    document.body.removeChild(textArea);
+  }
+}
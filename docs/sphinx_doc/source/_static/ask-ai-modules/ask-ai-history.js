@@ -0,0 +1,66 @@
+/**
+ * Ask AI Widget - Conversation History Module
+ *
+ * Loaded on demand when the server returns earlier messages of the session.
+ */
+
+/**
+ * Render the conversation history returned by the server
+ * Merges consecutive assistant messages into single messages
+ * @param {AskAIUI} ui - UI module
+ * @param {Array} messages - Messages from the server memory
+ * @param {string} helpSuffix - Suffix appended to assistant messages
+ */
+export function renderHistory(ui, messages, helpSuffix) {
+  // Group messages by conversation turn
+  const turns = [];
+  let currentTurn = null;
+
+  for (let i = 0; i < messages.length; i++) {
+    const msg = messages[i];
+
+    if (!msg.content || typeof msg.content !== 'string') continue;
+
+    const content = msg.content.trim();
+    if (!content) continue;
+
+    // Skip JSON array messages (tool calls - not rendered in history)
+    let isJsonArray = false;
+    try {
+      const parsed = JSON.parse(content);
+      isJsonArray = Array.isArray(parsed);
+    } catch (e) {
+      // Not valid JSON
+    }
+    if (isJsonArray) continue;
+
+    if (msg.role === 'user') {
+      currentTurn = {
+        user: { content: content, id: msg.id },
+        assistantTexts: []
+      };
+      turns.push(currentTurn);
+    } else if (msg.role === 'assistant' && currentTurn) {
+      currentTurn.assistantTexts.push(content);
+    }
+  }
+
+  // Render each turn
+  turns.forEach(turn => {
+    // Render user message
+    const userMessageId = turn.user.id || 'history_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+    ui.addMessage(turn.user.content, 'user', userMessageId);
+
+    // Render merged assistant message
+    if (turn.assistantTexts.length > 0) {
+      const mergedText = turn.assistantTexts.join('\n\n');
+      const assistantMessageId = 'history_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+      const contentWithSuffix = mergedText + (helpSuffix || '');
+      ui.addMessage(contentWithSuffix, 'assistant', assistantMessageId);
+    }
+  });
+
+  if (turns.length > 0) {
+    ui.scrollToBottom();
+  }
+}
@@ -5,6 +5,12 @@
  * - I18N: Internationalization
  * - API: Communication with backend
  * - UI: User interface management
+ *
+ * It is not loaded with the page: ask-ai-loader.js shows the Ask AI button
+ * and imports this module (and marked) when the reader first uses it.
+ * Optional features are split into modules imported when needed:
+ * - History: rendering of earlier messages of the session
+ * - Feedback: like/dislike and copy actions
  */
 
 import { I18N, detectLanguage } from './ask-ai-i18n.js';
@@ -12,11 +18,11 @@ import { AskAIApi } from './ask-ai-api.js';
 import { AskAIUI } from './ask-ai-ui.js';
 
 class AskAIWidget {
-  constructor() {
+  constructor(options = {}) {
     // Check if marked library is loaded
     if (typeof marked === 'undefined') {
       console.error('Marked library not loaded!');
-      console.info('Add this to your HTML: <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>');
+      console.info('Load the widget through ask-ai-loader.js, which loads marked first.');
       return;
     }
 
@@ -37,7 +43,7 @@ class AskAIWidget {
       mangle: false,
     });
 
-    this.init();
+    this.init(options);
   }
 
   /**
@@ -60,8 +66,9 @@ class AskAIWidget {
 
   /**
    * Initialize the widget
+   * @param {Object} options - { open: open the chat right away }
    */
-  async init() {
+  async init(options = {}) {
     // Create UI
     this.ui.createWidget();
     
@@ -81,6 +88,10 @@ class AskAIWidget {
     // Observe theme changes
     this.ui.observeThemeChanges();
 
+    if (options.open) {
+      this.ui.openModal();
+    }
+
     // Check API connection
     await this.api.checkApiConnection();
 
@@ -114,143 +125,30 @@ class AskAIWidget {
       if (target.classList.contains('copy')) {
         const feedbackDiv = target.closest('.ask-ai-feedback-actions');
         const content = feedbackDiv?.getAttribute('data-content') || '';
-        await this.copyToClipboard(content);
+        const { copyToClipboard } = await import('./ask-ai-feedback.js');
+        await copyToClipboard(content);
         return;
       }
 
       // Handle like/dislike buttons
       if (feedbackType && messageId) {
-        await this.handleFeedback(target, messageId, feedbackType);
+        const { handleFeedback } = await import('./ask-ai-feedback.js');
+        await handleFeedback(this.api, target, messageId, feedbackType);
         console.log('Submitting feedback with message ID:', messageId);
       }
     });
   }
 
-  /**
-   * Handle feedback submission
-   * @param {HTMLElement} button - Feedback button element
-   * @param {string} messageId - Message ID
-   * @param {string} feedbackType - Feedback type ('like' or 'dislike')
-   */
-  async handleFeedback(button, messageId, feedbackType) {
-    // Get all feedback buttons for this message
-    const feedbackDiv = button.closest('.ask-ai-feedback-actions');
-    const allButtons = feedbackDiv.querySelectorAll('.ask-ai-feedback-btn[data-feedback]');
-
-    // Check if clicking the same button again (toggle off)
-    if (button.classList.contains('active')) {
-      button.classList.remove('active');
-      return;
-    }
-
-    // Remove active state from all feedback buttons
-    allButtons.forEach(btn => btn.classList.remove('active'));
-
-    // Add active state to clicked button
-    button.classList.add('active');
-
-    // Submit feedback to backend
-    const success = await this.api.submitFeedback(messageId, feedbackType);
-
-    if (success) {
-      console.log(`Feedback "${feedbackType}" submitted for message ${messageId}`);
-    } else {
-      console.error('Failed to submit feedback');
-      // Remove active state on failure
-      button.classList.remove('active');
-    }
-  }
-
-  /**
-   * Copy content to clipboard
-   * @param {string} content - Content to copy
-   */
-  async copyToClipboard(content) {
-    try {
-      await navigator.clipboard.writeText(content);
-      console.log('Content copied to clipboard');
-      
-      // Show a brief success message (optional)
-      // You could add a toast notification here if desired
-    } catch (error) {
-      console.error('Failed to copy to clipboard:', error);
-      
-      // Fallback for older browsers
-      const textArea = document.createElement('textarea');
-      textArea.value = content;
-      textArea.style.position = 'fixed';
-      textArea.style.left = '-999999px';
-      document.body.appendChild(textArea);
-      textArea.select();
-      try {
-        document.execCommand('copy');
-        console.log('Content copied to clipboard (fallback)');
-      } catch (err) {
-        console.error('Fallback copy failed:', err);
-      }
-      document.body.removeChild(textArea);
-    }
-  }
-
   /**
    * Load conversation history from API
-   * Merges consecutive assistant messages into single messages
+   * The rendering module is only downloaded when there is history
    */
   async loadConversationHistory() {
     const messages = await this.api.loadConversationHistory();
 
     if (messages && messages.length > 0) {
-      // Group messages by conversation turn
-      const turns = [];
-      let currentTurn = null;
-      
-      for (let i = 0; i < messages.length; i++) {
-        const msg = messages[i];
-        
-        if (!msg.content || typeof msg.content !== 'string') continue;
-        
-        const content = msg.content.trim();
-        if (!content) continue;
-        
-        // Skip JSON array messages (tool calls - not rendered in history)
-        let isJsonArray = false;
-        try {
-          const parsed = JSON.parse(content);
-          isJsonArray = Array.isArray(parsed);
-        } catch (e) {
-          // Not valid JSON
-        }
-        if (isJsonArray) continue;
-        
-        if (msg.role === 'user') {
-          currentTurn = {
-            user: { content: content, id: msg.id },
-            assistantTexts: []
-          };
-          turns.push(currentTurn);
-        } else if (msg.role === 'assistant' && currentTurn) {
-          currentTurn.assistantTexts.push(content);
-        }
-      }
-      
-      // Render each turn
-      turns.forEach(turn => {
-        // Render user message
-        const userMessageId = turn.user.id || 'history_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
-        this.ui.addMessage(turn.user.content, 'user', userMessageId);
-        
-        // Render merged assistant message
-        if (turn.assistantTexts.length > 0) {
-          const mergedText = turn.assistantTexts.join('\n\n');
-          const assistantMessageId = 'history_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
-          const contentWithSuffix = mergedText + (this.i18n.helpSuffix || '');
-          this.ui.addMessage(contentWithSuffix, 'assistant', assistantMessageId);
-        }
-      });
-
-      if (turns.length > 0) {
-        this.ui.scrollToBottom();
-      }
+      const { renderHistory } = await import('./ask-ai-history.js');
+      renderHistory(this.ui, messages, this.i18n.helpSuffix);
     }
   }
 
@@ -465,22 +363,13 @@ class AskAIWidget {
   }
 }
 
-// Initialize the widget when DOM is loaded
-document.addEventListener('DOMContentLoaded', async () => {
-  // Check if we're in a Sphinx documentation page
-  if (document.body.classList.contains('furo') || document.querySelector('.furo')) {
-    new AskAIWidget();
-  } else {
-    // Fallback for other themes
-    setTimeout(() => {
-      new AskAIWidget();
-    }, 1000);
-  }
-});
-
-// Export for potential external usage
-if (typeof module !== 'undefined' && module.exports) {
-  module.exports = AskAIWidget;
+/**
+ * Create the widget; called by ask-ai-loader.js on the first interaction
+ * @param {Object} options - { open: open the chat right away }
+ * @returns {AskAIWidget} The widget
+ */
+export function mount(options = {}) {
+  return new AskAIWidget(options);
 }
 
-export default AskAIWidget;
\ No newline at end of file
+export default AskAIWidget;
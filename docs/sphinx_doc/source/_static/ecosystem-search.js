@@ -0,0 +1,74 @@
+// Results from the sibling projects on the search page.
+//
+// The ecosystem extension writes ecosystem-search.json at build time: the
+// page, section and object titles of the other projects with their URLs.
+// Titles containing every query word are listed below the local results.
+(function() {
+    'use strict';
+
+    const MAX_RESULTS = 30;
+    const script = document.currentScript;
+
+    function matches(entries, words) {
+        const results = [];
+        for (const entry of entries) {
+            const title = entry[2].toLowerCase();
+            if (words.every((word) => title.includes(word))) {
+                results.push(entry);
+                if (results.length >= MAX_RESULTS) break;
+            }
+        }
+        return results;
+    }
+
+    function render(index, results) {
+        const section = document.createElement('div');
+        section.className = 'ecosystem-search-results';
+        const heading = document.createElement('h2');
+        heading.textContent = 'Other projects';
+        section.appendChild(heading);
+        const list = document.createElement('ul');
+        list.className = 'search';
+        results.forEach(([project, url, title]) => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = url;
+            link.textContent = title;
+            const info = index.projects[project];
+            const label = document.createElement('span');
+            label.textContent = ` (${info.name} ${info.version})`;
+            item.appendChild(link);
+            item.appendChild(label);
+            list.appendChild(item);
+        });
+        section.appendChild(list);
+        return section;
+    }
+
+    function init() {
+        const query = new URLSearchParams(window.location.search).get('q');
+        const words = (query || '').toLowerCase().split(/\s+/).filter(Boolean);
+        const container = document.getElementById('search-results');
+        if (!words.length || !container) return;
+
+        const contentRoot = new URL(
+            document.documentElement.dataset.content_root || './',
+            window.location.href
+        );
+        fetch(new URL(script.dataset.index, contentRoot))
+            .then((response) => response.json())
+            .then((index) => {
+                const results = matches(index.entries, words);
+                if (results.length) {
+                    container.after(render(index, results));
+                }
+            })
+            .catch((error) => console.warn('Ecosystem search unavailable:', error));
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
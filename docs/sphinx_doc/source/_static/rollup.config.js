@@ -1,8 +1,10 @@
 /**
  * Rollup Configuration for Ask AI Widget
- * 
- * This configuration bundles the modular JavaScript files into a single file
- * that can be used directly in Sphinx documentation without module system support.
+ *
+ * This configuration bundles the modular JavaScript files into ES modules in
+ * ask-ai/: the core chat UI (ask-ai-widget.js) and one chunk per optional
+ * feature it imports dynamically. Pages only include ask-ai-loader.js, which
+ * imports the core module when the reader first uses the Ask AI button.
  */
 
 import resolve from '@rollup/plugin-node-resolve';
@@ -10,15 +12,12 @@ import resolve from '@rollup/plugin-node-resolve';
 export default {
   input: 'ask-ai-modules/ask-ai-widget.js',
   output: {
-    file: 'ask-ai-widget.js',
-    format: 'iife',
-    name: 'AskAIWidget',
+    dir: 'ask-ai',
+    format: 'es',
+    entryFileNames: '[name].js',
+    chunkFileNames: '[name].js',
     banner: '/**\n * Ask AI Widget - Bundled Version\n * Generated from modular source files\n */',
-    globals: {
-      marked: 'marked'
-    }
   },
-  external: ['marked'],
   plugins: [
     resolve()
   ]
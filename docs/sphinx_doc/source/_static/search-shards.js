@@ -0,0 +1,73 @@
+// Sharded search index loader for the search page.
+//
+// search_shards.py replaces searchindex.js by a core index and term shards
+// partitioned by prefix. This script loads the core, then fetches the shards
+// needed by each query before handing it to Sphinx's searchtools.js.
+(function() {
+    'use strict';
+
+    const script = document.currentScript;
+    const contentRoot = new URL(
+        document.documentElement.dataset.content_root || './',
+        window.location.href
+    );
+    const manifestUrl = new URL(script.dataset.manifest, contentRoot);
+
+    let manifest = null;
+    const loaded = new Map();  // shard key -> Promise
+
+    function fetchJson(url) {
+        return fetch(url).then((response) => {
+            if (!response.ok) {
+                throw new Error(`${response.status} ${url}`);
+            }
+            return response.json();
+        });
+    }
+
+    // Shards holding the terms a word can match: its own prefix, or every
+    // prefix starting with a word shorter than the prefix length
+    function shardKeys(word) {
+        const key = word.slice(0, manifest.prefix).toLowerCase();
+        if (key.length === manifest.prefix) {
+            return key in manifest.shards ? [key] : [];
+        }
+        return Object.keys(manifest.shards).filter((k) => k.startsWith(key));
+    }
+
+    function loadShard(key) {
+        if (!loaded.has(key)) {
+            const url = new URL(manifest.shards[key], manifestUrl);
+            loaded.set(key, fetchJson(url).then((shard) => {
+                Object.assign(Search._index.terms, shard.terms);
+                Object.assign(Search._index.titleterms, shard.titleterms);
+            }));
+        }
+        return loaded.get(key);
+    }
+
+    function init(core) {
+        core.terms = {};
+        core.titleterms = {};
+        const query = Search.query;
+        Search.query = (text) => {
+            const [, searchTerms, excludedTerms] = Search._parseQuery(text);
+            const keys = new Set();
+            [...searchTerms, ...excludedTerms].forEach((word) => {
+                shardKeys(word).forEach((key) => keys.add(key));
+            });
+            Promise.all([...keys].map(loadShard))
+                .catch((error) => console.error('Search shard failed:', error))
+                .then(() => query(text));
+        };
+        Search.setIndex(core);
+    }
+
+    fetchJson(manifestUrl)
+        .then((data) => {
+            manifest = data;
+            return fetchJson(new URL(manifest.core, manifestUrl));
+        })
+        .then(init)
+        .catch((error) => console.error('Search index failed:', error));
+})();
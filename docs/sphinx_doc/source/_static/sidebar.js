@@ -91,10 +91,87 @@
         console.log('Sidebar collapse initialized');
     }
     
+    // Section navigation from nav.json (sidebar-nav-json.html, nav_json.py).
+    // Tree entries are [title, uri, children?] with uris relative to the
+    // output root; the page gives the indices of its entry in the tree.
+    function createNavList(entries, level, options) {
+        const list = document.createElement('ul');
+        entries.forEach((entry, index) => {
+            const [title, uri, children] = entry;
+            const onPath = options.path[level] === index;
+            const current = onPath && level === options.path.length - 1;
+            const item = document.createElement('li');
+            item.className = `toctree-l${level}`;
+            if (onPath) item.classList.add('current', 'active');
+
+            const link = document.createElement('a');
+            link.textContent = title;
+            if (uri.includes('://')) {
+                link.className = 'reference external';
+                link.href = uri;
+            } else {
+                link.className = current ? 'current reference internal' : 'reference internal';
+                link.href = current ? '#' : new URL(uri, options.root).href;
+            }
+            item.appendChild(link);
+
+            // Like the theme: nothing beyond navigation_depth, and with
+            // collapse_navigation only the branch of the current page
+            const expand = children && level < options.depth && (onPath || !options.collapse);
+            if (expand) {
+                item.classList.add('has-children');
+                const details = document.createElement('details');
+                details.open = onPath || level < options.showLevel;
+                details.innerHTML = '<summary><span class="toctree-toggle" role="presentation">'
+                    + '<i class="fa-solid fa-chevron-down"></i></span></summary>';
+                details.appendChild(createNavList(children, level + 1, options));
+                item.appendChild(details);
+            }
+            list.appendChild(item);
+        });
+        return list;
+    }
+
+    function initNavTree() {
+        const container = document.querySelector('.bd-toc-item[data-nav-tree]');
+        if (!container || !container.dataset.navPath) return;
+
+        const path = container.dataset.navPath.split('.').map(Number);
+        const root = new URL(
+            document.documentElement.dataset.content_root || './',
+            window.location.href
+        );
+        fetch(container.dataset.navTree)
+            .then((response) => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then((data) => {
+                const section = data.tree[path[0]];
+                if (!section || !section[2]) return;
+                // Levels are counted from the section, as toctree-l1 upwards
+                const list = createNavList(section[2], 1, {
+                    path: [null].concat(path.slice(1)),
+                    root: root,
+                    depth: Number(container.dataset.navigationDepth) || 4,
+                    showLevel: Number(container.dataset.showNavLevel) || 1,
+                    collapse: container.dataset.collapse === 'true',
+                });
+                list.className = 'nav bd-sidenav';
+                container.appendChild(list);
+            })
+            .catch((error) => console.warn('Section navigation unavailable:', error));
+    }
+
+    function init() {
+        initNavTree();
+        initSidebarCollapse();
+    }
+
     // Initialize when DOM is ready
     if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', initSidebarCollapse);
+        document.addEventListener('DOMContentLoaded', init);
     } else {
-        initSidebarCollapse();
+        init();
     }
 })();
@@ -79,10 +79,69 @@
         console.log('Switcher interactions initialized (hasHover:', hasHover, ', isDesktop:', isDesktop, ')');
     }
     
+    // Fill the version dropdown from the site-wide versions.json manifest,
+    // which build_versions.py rewrites whenever the version list changes
+    function loadVersionManifest() {
+        const dropdown = document.querySelector('.version-dropdown[data-versions-manifest]');
+        if (!dropdown) {
+            return;
+        }
+        
+        fetch(dropdown.dataset.versionsManifest, { cache: 'no-cache' })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(manifest => {
+                renderVersions(dropdown, manifest.versions || []);
+                filterLanguages(manifest.languages || []);
+            })
+            .catch(error => {
+                console.log('Version manifest not available:', error);
+            });
+    }
+    
+    function renderVersions(dropdown, versions) {
+        const content = dropdown.querySelector('.dropdown-content');
+        if (!content || versions.length === 0) {
+            return;
+        }
+        
+        const current = dropdown.dataset.currentVersion;
+        const root = dropdown.dataset.versionRoot;
+        const pagename = dropdown.dataset.pagename;
+        
+        content.textContent = '';
+        versions.forEach(version => {
+            const item = document.createElement('a');
+            item.href = root + version + '/' + pagename + '.html';
+            item.className = 'dropdown-item' + (version === current ? ' active' : '');
+            item.setAttribute('role', 'menuitem');
+            if (version === current) {
+                item.setAttribute('aria-current', 'true');
+            }
+            item.textContent = version;
+            content.appendChild(item);
+        });
+        dropdown.hidden = false;
+    }
+    
+    // Hide languages that were not built for this site
+    function filterLanguages(languages) {
+        if (languages.length === 0) {
+            return;
+        }
+        document.querySelectorAll('.language-dropdown .dropdown-item[data-lang]').forEach(item => {
+            item.hidden = !languages.includes(item.dataset.lang);
+        });
+    }
+    
+    function init() {
+        loadVersionManifest();
+        initSwitchers();
+    }
+    
     // Initialize when DOM is ready
     if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', initSwitchers);
+        document.addEventListener('DOMContentLoaded', init);
     } else {
-        initSwitchers();
+        init();
     }
 })();
@@ -0,0 +1,371 @@
+"""Persistent cache of autodoc output keyed by module source
+
+Every ``auto*`` directive imports the documented module and introspects it,
+which dominates the build time of a large package. This extension wraps the
+registered autodoc directives: the reST they generate is stored on disk under
+a key made of the directive, its options, the autodoc configuration and the
+hash of the module's source together with every module of the same package
+it imports. When none of that changed (e.g. the same module in another
+language or another version), the cached reST is parsed directly and the
+module is never imported. ``viewcode`` is served from the source files too.
+
+Enabled from ``conf.py`` when ``AUTODOC_CACHE_DIR`` is set.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import sphinx
+from docutils import nodes
+from docutils.parsers.rst import directives
+from docutils.statemachine import StringList
+from sphinx.pycode import ModuleAnalyzer
+from sphinx.util import logging
+from sphinx.util.docutils import switch_source_input
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+# Config values whose prefix marks them as influencing autodoc output
+AUTOMODULE_RE = re.compile(r"^\s*\.\. automodule::\s*(\S+)", re.MULTILINE)
+CONFIG_PREFIXES = ("autodoc_", "autoclass_", "napoleon_", "python_", "add_module_")
+
+_stats = {"hits": 0, "misses": 0, "uncached": 0}
+_cache: "AutodocCache | None" = None
+_config_fingerprint = ""
+_source_roots: list[str] = []
+_imports_memo: dict[str, tuple[int, list[str]]] = {}
+
+
+def set_source_roots():
+    """Snapshot the ``sys.path`` directories that modules are looked up in"""
+    _source_roots[:] = [
+        os.path.abspath(p or os.curdir) for p in sys.path if os.path.isdir(p or ".")
+    ]
+
+
+def find_module_file(modname: str) -> str | None:
+    """Locate the source file of a module without importing anything"""
+    if not _source_roots:
+        set_source_roots()
+    parts = modname.split(".")
+    for root in _source_roots:
+        base = os.path.join(root, *parts)
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+def split_target(name: str) -> tuple[str, str] | None:
+    """Split a documented name into its module and the module's file"""
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        modname = ".".join(parts[:i])
+        path = find_module_file(modname)
+        if path is not None:
+            return modname, path
+    return None
+
+
+def module_imports(modname: str, path: str) -> list[str]:
+    """Modules of the same top-level package imported by a module (via AST)"""
+    mtime = os.stat(path).st_mtime_ns
+    memo = _imports_memo.get(path)
+    if memo is not None and memo[0] == mtime:
+        return memo[1]
+
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    package = modname if path.endswith("__init__.py") else modname.rpartition(".")[0]
+    top = modname.split(".")[0]
+    found = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package.split(".")
+                base = base[: len(base) - node.level + 1]
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            found.add(prefix)
+            # ``from pkg import submodule`` imports the submodule as well
+            found.update(f"{prefix}.{alias.name}" for alias in node.names)
+    imports = sorted(m for m in found if m.split(".")[0] == top)
+    _imports_memo[path] = (mtime, imports)
+    return imports
+
+
+def source_fingerprint(modname: str, path: str) -> str:
+    """Hash a module's source and that of its intra-package import closure"""
+    seen = {}
+    stack = [(modname, path)]
+    while stack:
+        name, file = stack.pop()
+        if file in seen:
+            continue
+        seen[file] = name
+        # Importing a.b.c runs the __init__ of a and a.b first
+        parents = [".".join(name.split(".")[:i]) for i in range(1, name.count(".") + 1)]
+        for dep in parents + module_imports(name, file):
+            dep_file = find_module_file(dep)
+            if dep_file is not None and dep_file not in seen:
+                stack.append((dep, dep_file))
+
+    digest = hashlib.sha256()
+    for file in sorted(seen):
+        digest.update(seen[file].encode() + b"\0")
+        with open(file, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def config_fingerprint(app) -> str:
+    """Hash the settings that change generated autodoc content"""
+    values = {
+        name: repr(app.config[name])
+        for name in sorted(app.config._options)
+        if name.startswith(CONFIG_PREFIXES)
+    }
+    digest = hashlib.sha256()
+    digest.update(json.dumps(values, sort_keys=True).encode())
+    # autodoc-* event handlers (e.g. autodoc-skip-member) live in conf.py
+    conf_py = os.path.join(app.confdir, "conf.py")
+    if os.path.isfile(conf_py):
+        with open(conf_py, "rb") as f:
+            digest.update(f.read())
+    digest.update(f"{sphinx.__version__}:{CACHE_VERSION}".encode())
+    return digest.hexdigest()
+
+
+class AutodocCache:
+    """On-disk store of generated content: ``<dir>/<key[:2]>/<key>.json``"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, entry: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+
+def parse_cached(state, content: StringList, titles_allowed: bool):
+    """Parse cached reST like autodoc parses freshly generated content"""
+    with switch_source_input(state, content):
+        node = nodes.section() if titles_allowed else nodes.paragraph()
+        node.document = state.document
+        state.nested_parse(content, 0, node, match_titles=titles_allowed)
+    return node.children
+
+
+@contextmanager
+def capture_generated(directive_cls, captured: dict):
+    """Record the content an autodoc directive hands to its parser
+
+    Both the legacy and the current autodoc directive end their ``run`` with
+    a module-level ``parse_generated_content(state, content, ...)`` call, so
+    wrapping that function for the duration of one ``run`` is enough to see
+    the generated reST without re-implementing autodoc.
+    """
+    module = sys.modules[directive_cls.run.__module__]
+    original = module.parse_generated_content
+
+    def wrapper(state, content, third, *args, **kwargs):
+        captured["content"] = content
+        captured["titles_allowed"] = bool(getattr(third, "titles_allowed", third))
+        return original(state, content, third, *args, **kwargs)
+
+    module.parse_generated_content = wrapper
+    try:
+        yield
+    finally:
+        module.parse_generated_content = original
+
+
+def cached_directive(base):
+    """Subclass an autodoc directive class with the result cache"""
+
+    class CachedAutodocDirective(base):
+        def cache_key(self, env) -> str | None:
+            target = split_target(self.arguments[0].strip().split("(")[0])
+            if target is None:
+                return None
+            modname, path = target
+            payload = {
+                "directive": self.name,
+                "arguments": self.arguments,
+                "options": sorted((k, repr(v)) for k, v in self.options.items()),
+                "content": list(self.content),
+                "ref_context": sorted(env.ref_context.items()),
+                "config": _config_fingerprint,
+                "source": source_fingerprint(modname, path),
+            }
+            return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+        def run(self):
+            env = self.state.document.settings.env
+            try:
+                key = self.cache_key(env)
+            except (OSError, SyntaxError, ValueError):
+                key = None
+            if key is None:
+                _stats["uncached"] += 1
+                return super().run()
+
+            record_dependencies = self.state.document.settings.record_dependencies
+            entry = _cache.load(key)
+            if entry is not None:
+                _stats["hits"] += 1
+                for dependency in entry["dependencies"]:
+                    record_dependencies.add(dependency)
+                content = StringList(
+                    entry["lines"], items=[tuple(item) for item in entry["items"]]
+                )
+                return parse_cached(self.state, content, entry["titles_allowed"])
+
+            _stats["misses"] += 1
+            captured = {}
+            deps_before = set(record_dependencies.list)
+            with capture_generated(base, captured):
+                result = super().run()
+            content = captured.get("content")
+            # Import failures mark the document for re-reading; never cache them
+            failed = env.docname in env.reread_always or any(
+                isinstance(n, nodes.system_message) for n in result
+            )
+            if content is not None and not failed:
+                deps = set(record_dependencies.list) - deps_before
+                _cache.save(
+                    key,
+                    {
+                        "lines": list(content.data),
+                        "items": [list(item) for item in content.items],
+                        "titles_allowed": captured["titles_allowed"],
+                        "dependencies": sorted(map(str, deps)),
+                    },
+                )
+            return result
+
+    CachedAutodocDirective.__name__ = f"Cached{base.__name__}"
+    return CachedAutodocDirective
+
+
+def module_tags(modname: str):
+    """Source code and tags of a module, read from its file without importing"""
+    path = find_module_file(modname)
+    if path is None:
+        return None
+    try:
+        analyzer = ModuleAnalyzer.for_file(path, modname)
+        analyzer.find_tags()
+    except Exception:
+        return None
+    return analyzer.code, analyzer.tags
+
+
+def find_source(app, modname):
+    """``viewcode-find-source`` handler that reads sources without importing"""
+    return module_tags(modname)
+
+
+def follow_imported(app, modname, fullname):
+    """``viewcode-follow-imported`` handler for objects defined in ``modname``
+
+    Returning None for anything else lets viewcode import the module as usual.
+    """
+    found = module_tags(modname) if modname and fullname else None
+    if found is not None and fullname in found[1]:
+        return modname
+    return None
+
+
+def wrap_directives(app, config):
+    """Replace every registered autodoc directive by its cached subclass"""
+    for name, directive in list(directives._directives.items()):
+        if name.startswith("auto") and getattr(directive, "__module__", "").startswith(
+            "sphinx.ext.autodoc"
+        ):
+            app.add_directive(name, cached_directive(directive), override=True)
+
+
+def limit_autosummary(app):
+    """Keep ``autosummary_generate = True`` from importing every module
+
+    autosummary imports each ``automodule`` target to look for autosummary
+    directives in its docstring. Restrict generation to the documents that
+    can contain one, judged from the document and module sources.
+    """
+    if getattr(app.config, "autosummary_generate", None) is not True:
+        return
+    genfiles = []
+    for docname in sorted(app.env.found_docs):
+        path = app.env.doc2path(docname)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        if "autosummary" not in text:
+            targets = AUTOMODULE_RE.findall(text)
+            files = filter(None, map(find_module_file, targets))
+            if not any(
+                "autosummary" in open(f, encoding="utf-8").read() for f in files
+            ):
+                continue
+        genfiles.append(str(app.env.doc2path(docname, base=False)))
+    app.config.autosummary_generate = genfiles
+
+
+def init_cache(app):
+    global _config_fingerprint
+    _config_fingerprint = config_fingerprint(app)
+    set_source_roots()
+
+
+def report_stats(app, exception):
+    if any(_stats.values()):
+        logger.info(
+            "[autodoc-cache] %(hits)d hits, %(misses)d misses, "
+            "%(uncached)d not cacheable",
+            _stats,
+        )
+
+
+def setup(app):
+    app.setup_extension("sphinx.ext.autodoc")
+    cache_dir = os.environ.get("AUTODOC_CACHE_DIR")
+    if not cache_dir:
+        return {"version": "1.0", "parallel_read_safe": True}
+
+    global _cache
+    _cache = AutodocCache(cache_dir)
+    # autodoc registers its directives at config-inited, so wrap them after it
+    app.connect("config-inited", wrap_directives, priority=900)
+    app.connect("builder-inited", init_cache, priority=400)
+    app.connect("builder-inited", limit_autosummary, priority=450)
+    app.connect("build-finished", report_stats)
+    if "sphinx.ext.viewcode" in app.config.extensions:
+        app.connect("viewcode-find-source", find_source)
+        app.connect("viewcode-follow-imported", follow_imported)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -0,0 +1,255 @@
+"""Timing of the phases, documents and imports of one Sphinx build
+
+Enabled from ``conf.py`` when ``BUILD_PROFILE`` names the JSON file to write
+(``build_versions.py --profile`` sets it, see ``build_profile.py``). Records:
+
+* phases: ``init`` (until the builder is ready), ``discover``, ``read`` and
+  ``write`` (consistency checks, resolving, writing pages, search index);
+* per-document read time, from ``source-read`` to ``doctree-read``;
+* per-document write time, for pages written in the main process;
+* cumulative and self time of the modules imported once the builder is
+  set up, which for API docs are the autosummary and autodoc imports, and
+  of those imported at startup after this extension was loaded (other
+  extensions, the theme);
+* peak RSS of the build process and of its parallel workers.
+
+Data of parallel readers is merged through the environment.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from sphinx.util import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 30  # Entries kept for each "slowest" table
+
+_setup_time = time.time()
+_marks: dict[str, float] = {}
+_phases: dict[str, float] = {}
+_writes: dict[str, float] = {}
+_events: list[dict] = []
+_startup_imports: set[str] = set()
+
+
+class ImportTimer:
+    """Meta path finder timing ``exec_module`` of the modules it sees found
+
+    It asks the finders after it for the spec and wraps the loader's
+    ``exec_module``, so the import system itself is left as it is.
+    """
+
+    def __init__(self):
+        self.times: dict[str, list[float]] = {}  # name -> [cumulative, self]
+        self._stack: list[float] = []  # Time spent in nested imports
+        self._local = threading.local()
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                find_spec = getattr(finder, "find_spec", None)
+                if finder is self or find_spec is None:
+                    continue
+                spec = find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+
+        loader = spec.loader
+        exec_module = getattr(loader, "exec_module", None)
+        # Loader classes (builtins, frozen) are shared: leave them alone
+        if exec_module is None or isinstance(loader, type):
+            return spec
+        if not getattr(exec_module, "_timed", False):
+            try:
+                loader.exec_module = self.timed(exec_module)
+            except AttributeError:
+                pass
+        return spec
+
+    def timed(self, exec_module):
+        def wrapper(module):
+            self._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                self.times[module.__name__] = [elapsed, elapsed - nested]
+
+        wrapper._timed = True
+        return wrapper
+
+
+_import_timer = ImportTimer()
+
+
+def mark(name: str):
+    _marks[name] = time.time()
+
+
+def phase(name: str, start: str, end: str):
+    if start in _marks and end in _marks:
+        _phases[name] = _marks[end] - _marks[start]
+        _events.append(
+            {
+                "name": name,
+                "track": "phases",
+                "start": _marks[start],
+                "duration": _phases[name],
+            }
+        )
+
+
+def timing_data(env, reset: bool = False) -> dict:
+    data = getattr(env, "build_timing", None)
+    if data is None or reset:
+        data = env.build_timing = {"read": {}, "read_start": {}, "imports": {}}
+    return data
+
+
+def on_builder_inited(app):
+    mark("builder-inited")
+    _startup_imports.update(_import_timer.times)
+    _marks["setup"] = _setup_time
+    phase("init", "setup", "builder-inited")
+    timing_data(app.env, reset=True)  # Drop the data pickled by a previous run
+    builder = app.builder
+    write_doc = builder.write_doc
+
+    def timed_write_doc(docname, doctree):
+        start = time.time()
+        try:
+            return write_doc(docname, doctree)
+        finally:
+            _writes[docname] = time.time() - start
+
+    builder.write_doc = timed_write_doc
+
+
+def on_before_read(app, env, docnames):
+    mark("before-read")
+    phase("discover", "builder-inited", "before-read")
+
+
+def on_source_read(app, docname, source):
+    timing_data(app.env)["read_start"][docname] = time.time()
+
+
+def on_doctree_read(app, doctree):
+    data = timing_data(app.env)
+    docname = app.env.docname
+    start = data["read_start"].pop(docname, None)
+    if start is not None:
+        data["read"][docname] = [start, time.time() - start]
+    data["imports"] = {
+        name: times
+        for name, times in _import_timer.times.items()
+        if name not in _startup_imports
+    }
+
+
+def on_merge_info(app, env, docnames, other):
+    data, theirs = timing_data(env), getattr(other, "build_timing", None)
+    if theirs is None:
+        return
+    data["read"].update(theirs["read"])
+    for name, times in theirs["imports"].items():
+        data["imports"].setdefault(name, times)
+
+
+def on_env_updated(app, env):
+    mark("env-updated")
+    phase("read", "before-read", "env-updated")
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peaks = [
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    ]
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # bytes vs KiB
+    return max(peaks) / scale
+
+
+def slowest_imports(times: dict[str, list[float]]) -> list[dict]:
+    ranked = sorted(times.items(), key=lambda i: -i[1][0])[:TOP_N]
+    return [{"name": m, "cumulative": c, "self": s} for m, (c, s) in ranked]
+
+
+def on_build_finished(app, exception):
+    path = os.environ.get("BUILD_PROFILE")
+    if not path:
+        return
+    mark("finished")
+    phase("write", "env-updated", "finished")
+    data = timing_data(app.env)
+    imports, startup = dict(data["imports"]), {}
+    for name, times in _import_timer.times.items():
+        (startup if name in _startup_imports else imports)[name] = times
+
+    reads = data["read"]
+    for docname, (start, seconds) in reads.items():
+        _events.append(
+            {"name": docname, "track": "read", "start": start, "duration": seconds}
+        )
+    report = {
+        "phases": _phases,
+        "documents_read": len(reads),
+        "documents_written": len(_writes),
+        "read": [
+            {"name": d, "seconds": s}
+            for d, (_, s) in sorted(reads.items(), key=lambda i: -i[1][1])[:TOP_N]
+        ],
+        "write": [
+            {"name": d, "seconds": s}
+            for d, s in sorted(_writes.items(), key=lambda i: -i[1])[:TOP_N]
+        ],
+        "imports": slowest_imports(imports),
+        "startup_imports": slowest_imports(startup),
+        "peak_rss_mb": peak_rss_mb(),
+        "failed": exception is not None,
+        "events": _events,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    logger.info(
+        "[build-timing] %s; peak RSS %.0f MB -> %s",
+        ", ".join(f"{k} {v:.1f}s" for k, v in _phases.items()),
+        report["peak_rss_mb"] or 0,
+        path,
+    )
+
+
+def setup(app):
+    if _import_timer not in sys.meta_path:
+        sys.meta_path.insert(0, _import_timer)
+    # Before autosummary, which imports the documented modules at this event
+    app.connect("builder-inited", on_builder_inited, priority=0)
+    app.connect("env-before-read-docs", on_before_read)
+    app.connect("source-read", on_source_read, priority=0)
+    app.connect("doctree-read", on_doctree_read, priority=900)
+    app.connect("env-merge-info", on_merge_info)
+    app.connect("env-updated", on_env_updated)
+    app.connect("build-finished", on_build_finished, priority=900)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -17,10 +17,37 @@ HTML_TITLE = os.environ.get(
 
 CURRENT_VERSION = os.environ.get("DOCS_VERSION", "")
 GIT_REF_FOR_LINKS = os.environ.get("GIT_REF_FOR_LINKS", "main")
+# Static fallback only; the switcher reads VERSIONS_MANIFEST at runtime
 AVAILABLE_VERSIONS = [
     v for v in os.environ.get("AVAILABLE_VERSIONS", "").split(",") if v
 ]
+# Path of the version manifest relative to the site root (SITE_DIR)
+VERSIONS_MANIFEST = os.environ.get("VERSIONS_MANIFEST", "versions.json")
 REPO_ROOT = os.environ.get("REPO_ROOT")
+# Directory of the autodoc result cache shared across builds (optional)
+AUTODOC_CACHE_DIR = os.environ.get("AUTODOC_CACHE_DIR")
+# "import" (autodoc imports the package) or "static" (parsed from source)
+API_DOC_MODE = os.environ.get("API_DOC_MODE", "import")
+# Modules (fnmatch patterns) that static mode still documents by importing
+API_IMPORT_MODULES = [
+    m for m in os.environ.get("API_IMPORT_MODULES", "").split(",") if m
+]
+# JSON file the build_timing extension writes phase/document timings to
+BUILD_PROFILE = os.environ.get("BUILD_PROFILE")
+# Reuse doctrees parsed for another language of the same ref (see shared_doctrees)
+SHARE_DOCTREES = os.environ.get("SHARE_DOCTREES", "") == "1"
+# Documents re-read anyway, as their generated labels are language-specific
+SHARED_DOCTREES_REREAD = [
+    p for p in os.environ.get("SHARED_DOCTREES_REREAD", "api/*").split(",") if p
+]
+# Memory budget of this build in MiB; parallel workers adapt to it (memory_budget)
+MAX_MEMORY_MB = int(os.environ.get("MAX_MEMORY_MB", "0") or 0)
+# Local copies of sibling sites whose ecosystem.json resolve cross-project links
+ECOSYSTEM_MANIFESTS = [
+    p for p in os.environ.get("ECOSYSTEM_MANIFESTS", "").split(os.pathsep) if p
+]
+# Render the section navigation from one nav.json per build (see nav_json)
+NAV_JSON = os.environ.get("NAV_JSON", "") == "1"
 
 # QA Copilot configuration
 JUICER_API_URL = os.environ.get("JUICER_API_URL", "https://datajuicer.online:443")
@@ -33,7 +60,12 @@ else:
     sys.path.insert(0, os.path.abspath("../../"))
 sys.path.insert(0, current_dir)
 
-from custom_myst import ReplaceVideoLinksTransform
+from custom_myst import ImageAssetsTransform, ReplaceVideoLinksTransform
+from language_index import (
+    LanguageIndex,
+    exclude_translated,
+    supports_translated_project,
+)
 
 # -- Project information -----------------------------------------------------
 project = PROJECT
@@ -52,7 +84,21 @@ extensions = [
     "sphinx.ext.autosectionlabel",
     "myst_parser",
     "sphinx_copybutton",
+    "source_rewrite",
+    "ecosystem",
 ]
+if BUILD_PROFILE:
+    extensions.insert(0, "build_timing")  # First, to time the other imports too
+if SHARE_DOCTREES:
+    extensions.append("shared_doctrees")
+if AUTODOC_CACHE_DIR:
+    extensions.append("autodoc_cache")
+if API_DOC_MODE == "static":
+    extensions.append("static_api")
+if MAX_MEMORY_MB:
+    extensions.append("memory_budget")
+if NAV_JSON:
+    extensions.append("nav_json")
 
 # -- Extension configuration ------------------------------------------------
 myst_heading_anchors = 4
@@ -66,6 +112,11 @@ autosectionlabel_prefix_document = True
 autosummary_generate = True
 autosummary_ignore_module_all = False
 autodoc_member_order = "bysource"
+static_api_import_modules = API_IMPORT_MODULES
+memory_budget_mb = MAX_MEMORY_MB
+# Documents the zh_CN build re-reads even when shared_doctrees could reuse them:
+# the API pages, whose field names and index entries Sphinx translates
+shared_doctrees_reread = SHARED_DOCTREES_REREAD
 
 # -- Templates and patterns -------------------------------------------------
 templates_path = ["_templates"]
@@ -112,7 +163,7 @@ html_theme_options = {
 
 html_sidebars = {
     "**": [
-        "sidebar-nav-bs",
+        "sidebar-nav-json" if NAV_JSON else "sidebar-nav-bs",
     ],
 }
 
@@ -121,11 +172,16 @@ html_css_files = ["custom.css"]
 html_js_files = [
     "sidebar.js",
     "switcher-mobile.js",
-    "https://cdn.jsdelivr.net/npm/marked/marked.min.js",
 ]
 if JUICER_API_URL:
+    # The widget modules and marked are loaded when the button is first used
     html_css_files.append("ask-ai-widget.css")
-    html_js_files.append("ask-ai-widget.js")
+    html_js_files.append(
+        (
+            "ask-ai-loader.js",
+            {"data-marked": "https://cdn.jsdelivr.net/npm/marked/marked.min.js"},
+        )
+    )
 
 
 html_static_path = ["_static"]
@@ -143,6 +199,71 @@ supported_languages = {
 }
 
 
+# ========== SOURCE REWRITE RULES ==========
+def load_rewrite_rules_config():
+    config_path = os.path.join(os.path.dirname(__file__), "rewrite_rules.yaml")
+    if not os.path.exists(config_path):
+        return {"rules": []}
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {"rules": []}
+
+
+# Compiled once and applied to every document by the source_rewrite extension
+source_rewrite_rules = [
+    # Drop the overview entry of tutorials, which links outside the docs
+    {
+        "name": "overview-placeholder",
+        "pattern": re.escape("- [Overview of DJ](../../README.md)"),
+        "replace": "",
+        "languages": ["en"],
+    },
+    {
+        "name": "overview-placeholder-zh",
+        "pattern": re.escape("- [DJ概览](../../README_ZH.md)"),
+        "replace": "",
+        "languages": ["zh_CN"],
+    },
+    # Drop the "English | 中文" switch line at the top of bilingual pages
+    {
+        "name": "language-switch-line",
+        "pattern": r"\nen[A-Za-z\s]{0,12}\|\s*\[\u4e2d\u6587[\u4e00-\u9fa5\s]{0,12}\]\([^)]+\.md\)"
+        r"|\n\u4e2d\u6587[\u4e00-\u9fa5\s]{0,12}\|\s*\[en[A-Za-z\s]{0,12}\]\([^)]+\.md\)",
+        "replace": "",
+        "flags": "i",
+    },
+    # Chinese pages link to the Chinese version of a page, written by hand or
+    # by translate_pages.py, since the zh_CN build leaves the English one out
+    {
+        "name": "zh-page-link",
+        "pattern": r"\]\((?!http|#)(?P<path>[^)#\s]+?)(?<!_ZH)\.md(?P<fragment>#[^)\s]*)?\)",
+        "handler": "zh_link",
+        "srcdir": current_dir,
+        "anchors": os.path.join(current_dir, ".translation_anchors.json"),
+        "languages": ["zh_CN"],
+    },
+    # Images of the extra asset trees are published next to the pages (see
+    # ImageAssetsTransform); other relative images are loaded from GitHub
+    {
+        "name": "image-link",
+        "pattern": r"!\[(?P<text>[^\]]*)\]\((?!http|#)(?P<path>[^)\s]+)"
+        r"(?P<title>\s+\"[^\"]*\")?\)",
+        "handler": "image_link",
+        "extra": os.path.join(current_dir, "extra"),
+        "base": f"https://raw.githubusercontent.com/{REPO_OWNER}/{PROJECT}/"
+        f"{GIT_REF_FOR_LINKS}/",
+    },
+    # Relative links to non-doc files point at the file on GitHub
+    {
+        "name": "repo-link",
+        "pattern": r"(?<!!)\[(?P<text>[^\]]+)\]\((?!http|#)(?![^)]*\.(?:md|rst)#)"
+        r"(?P<path>[^)]*(?<!\.md)(?<!\.rst))\)",
+        "handler": "repo_link",
+        "base": f"https://github.com/{REPO_OWNER}/{PROJECT}/blob/{GIT_REF_FOR_LINKS}/",
+    },
+] + load_rewrite_rules_config().get("rules", [])
+
+
 # ========== LOAD EXTERNAL LINKS CONFIG ==========
 def load_external_links_config():
     config_path = os.path.join(os.path.dirname(__file__), "external_links.yaml")
@@ -206,17 +327,48 @@ def build_external_links(current_project, language, version):
     return external_links
 
 
-def get_lang_link(language, pagename, lang_code, non_zh_pages=[], current_version=""):
-    def norm_pagename(p):
-        return os.path.normpath(p)
+# ========== ECOSYSTEM MANIFEST ==========
+def project_base_url(project, version):
+    """Root URL of one version of a project, "{language}" left as placeholder"""
+    config = load_external_links_config()
+    project_info = config.get("projects", {}).get(project, {})
+    url = config.get(
+        "url_template",
+        "https://{repo_owner}.github.io/{project}/{language}/{version}/index.html",
+    ).format(
+        repo_owner=REPO_OWNER,
+        project=project_info.get("repo_name", project),
+        language="{language}",
+        version=version,
+    )
+    return url.removesuffix("index.html")
+
+
+ecosystem_project = PROJECT
+ecosystem_display_name = (
+    load_external_links_config()
+    .get("projects", {})
+    .get(PROJECT, {})
+    .get("display_name", HTML_TITLE)
+)
+ecosystem_version_label = CURRENT_VERSION or "main"
+ecosystem_base_url = project_base_url(PROJECT, ecosystem_version_label)
+ecosystem_manifests = ECOSYSTEM_MANIFESTS
+
+
+# Pages Sphinx generates without a source document, the same in every language
+GENERATED_PAGES = ("genindex", "search", "py-modindex")
 
-    norm_non_zh_pages = set(map(norm_pagename, non_zh_pages))
+
+def get_lang_link(language, pagename, lang_code, non_zh_pages=(), current_version=""):
     target_page = pagename
+    generated = pagename in GENERATED_PAGES or pagename.startswith("_modules/")
 
     if "CN" in language and pagename.endswith("_ZH") and "CN" not in lang_code:
         target_page = pagename[:-3]
-    if "CN" in lang_code and not pagename.endswith("_ZH"):
-        if norm_pagename(pagename) not in norm_non_zh_pages:
+    if "CN" in lang_code and not pagename.endswith("_ZH") and not generated:
+        # non_zh_pages is the frozenset of normalized paths from the language index
+        if os.path.normpath(pagename) not in non_zh_pages:
             target_page += "_ZH"
 
     return f"{lang_code}/{current_version}/{target_page}.html"
@@ -227,6 +379,7 @@ html_context = {
     "get_lang_link": get_lang_link,
     "current_version": CURRENT_VERSION,
     "available_versions": AVAILABLE_VERSIONS,
+    "versions_manifest": VERSIONS_MANIFEST,
     "github_user": REPO_OWNER,
     "github_repo": PROJECT,
     "github_version": GIT_REF_FOR_LINKS,
@@ -238,34 +391,17 @@ html_context = {
 # -- setup configuration ------------------------------------------------
 def find_zh_exclusions(app, config):
     """Find Chinese translation files to exclude when building English documentation"""
-    non_zh_pages = set()
-    zh_exclusions = []
-
-    for root, dirs, files in os.walk(app.srcdir):
-        for file in files:
-            if not file.endswith(("_ZH.md", "_ZH.rst")):
-                base_name, ext = os.path.splitext(file)
-                zh_file = f"{base_name}_ZH{ext}"
-                zh_file_path = os.path.join(root, zh_file)
-                rel_path = os.path.normpath(
-                    os.path.relpath(os.path.join(root, file), app.srcdir)
-                )
-
-                if os.path.exists(zh_file_path):
-                    zh_exclusions.append(rel_path)
-                else:
-                    non_zh_pages.add(
-                        os.path.normpath(
-                            os.path.relpath(os.path.join(root, base_name), app.srcdir)
-                        )
-                    )
-
-    if config.language == "zh_CN":
-        config.exclude_patterns.extend(zh_exclusions)
-    else:
+    index = LanguageIndex.load(str(app.srcdir))
+    if config.language != "zh_CN":
         config.exclude_patterns.extend(["*_ZH*", "**/*_ZH*"])
+    elif supports_translated_project(str(app.srcdir), config.source_suffix):
+        # English sources with a translation are dropped at discovery time
+        app.connect("builder-inited", lambda app: exclude_translated(app, index))
+    else:
+        # Unknown Sphinx internals: one exclude pattern per translated page
+        config.exclude_patterns.extend(sorted(index.paired))
 
-    app.config.html_context.setdefault("non_zh_pages", set()).update(non_zh_pages)
+    app.config.html_context["non_zh_pages"] = index.unpaired
 
 
 def rebuild_source_dir(app, config):
@@ -280,42 +416,10 @@ def skip(app, what, name, obj, would_skip, options):
     return would_skip
 
 
-def process_doc_links(app, docname, source):
-    """Process and update documentation links"""
-    repo_base = f"https://github.com/{REPO_OWNER}/{PROJECT}/blob/{GIT_REF_FOR_LINKS}/"
-
-    def link_replacer(match):
-        text, path = match.group(1), match.group(2)
-        abs_path = os.path.normpath(os.path.join(os.path.dirname(docname), path))
-        return f"[{text}]({repo_base}{abs_path})"
-
-    pattern = r"\[([^\]]+)\]\((?!http|#)([^)]*(?<!\.md)(?<!\.rst))\)"
-    source[0] = re.sub(pattern, link_replacer, source[0])
-    return source[0]
-
-
-def process_tutorial(app, docname, source):
-    """Process tutorial during reading"""
-    overview_placeholder = ""
-    if app.config.language == "zh_CN":
-        overview_placeholder = "- [DJ概览](../../README_ZH.md)"
-    else:
-        overview_placeholder = "- [Overview of DJ](../../README.md)"
-    source[0] = source[0].replace(overview_placeholder, "")
-    pattern = r"(?i)\nen[A-Za-z\s]{0,12}\|\s*\[\u4e2d\u6587[\u4e00-\u9fa5\s]{0,12}\]\([^)]+\.md\)|\n\u4e2d\u6587[\u4e00-\u9fa5\s]{0,12}\|\s*\[en[A-Za-z\s]{0,12}\]\([^)]+\.md\)"
-    source[0] = re.sub(pattern, "", source[0])
-    return source[0]
-
-
-def process_read(app, docname, source):
-    """Process document during reading"""
-    source[0] = process_tutorial(app, docname, source)
-    source[0] = process_doc_links(app, docname, source)
-
-
 def setup(app):
     """Setup Sphinx application hooks"""
     app.add_transform(ReplaceVideoLinksTransform)
+    app.add_transform(ImageAssetsTransform)
     app.connect("config-inited", rebuild_source_dir)
     external_links = build_external_links(
         current_project=PROJECT, language=app.config.language, version=CURRENT_VERSION
@@ -328,5 +432,4 @@ def setup(app):
         qa_config_js = f"window.JUICER_API_URL = '{JUICER_API_URL}';"
         app.add_js_file(None, body=qa_config_js, priority=100)
 
-    app.connect("source-read", process_read)
     app.connect("autodoc-skip-member", skip)
@@ -1,8 +1,21 @@
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+from html import escape
+
 from docutils import nodes
 from sphinx.transforms import SphinxTransform
 
 VIDEO_LINK_PREFIX = "https://github.com/user-attachments/assets/"
 
+EXTRA_DIR = "extra"  # html_extra_path: the asset trees, published next to the pages
+IMAGE_INDEX = ".image_assets.json"  # Sizes and variants, see image_assets.py
+IMAGE_SIZES = "(min-width: 60em) 60em, 100vw"  # At most the article width
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+
+
 class ReplaceVideoLinksTransform(SphinxTransform):
     default_priority = 900
 
@@ -11,8 +24,10 @@ class ReplaceVideoLinksTransform(SphinxTransform):
         for node in self.document.findall(nodes.reference):
             uri = node.get("refuri", "")
             if uri.startswith(VIDEO_LINK_PREFIX):
+                # The video is only downloaded once the reader plays it
                 video_html = "\n".join([
-                    '<video controls width="100%" height="auto" playsinline>',
+                    '<video controls preload="none" width="100%" height="auto"'
+                    ' playsinline>',
                     f'  <source src="{uri}" type="video/mp4">',
                     '  Your browser does not support the video tag.',
                     '</video>',
@@ -22,3 +37,98 @@ class ReplaceVideoLinksTransform(SphinxTransform):
                 parent = node.parent
                 index = parent.index(node)
                 parent.replace(node, raw_node)
+
+
+@lru_cache(maxsize=None)
+def load_image_index(path: str, mtime_ns: int) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def tag_attr(tag: str, name: str) -> str | None:
+    pattern = rf"""\s{name}\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))"""
+    match = re.search(pattern, tag, re.IGNORECASE)
+    if match is None:
+        return None
+    return next(group for group in match.groups() if group is not None)
+
+
+def local_image(docdir: str, src: str) -> str | None:
+    """Path of an image relative to the source root, None if it is remote"""
+    if not src or src.startswith(("/", "#", "data:")) or "://" in src:
+        return None
+    path = posixpath.normpath(posixpath.join(docdir, src))
+    return None if path.startswith("..") else path
+
+
+def enhance_img(tag: str, docdir: str, index: dict) -> str:
+    """Add lazy loading, and size and srcset if known, to an ``<img>`` tag"""
+    src = tag_attr(tag, "src") or ""
+    entry = index.get(local_image(docdir, src))
+    attrs = {"loading": "lazy", "decoding": "async"}
+    if entry:
+        # Author sizes such as width="70%" win; then the space is not reserved
+        if tag_attr(tag, "width") is None and tag_attr(tag, "height") is None:
+            attrs["width"], attrs["height"] = entry["width"], entry["height"]
+        if entry["srcset"]:
+            base = posixpath.dirname(src)
+            attrs["srcset"] = ", ".join(
+                f"{posixpath.join(base, name)} {width}w"
+                for name, width in entry["srcset"]
+            )
+            attrs["sizes"] = IMAGE_SIZES
+    added = "".join(
+        f' {name}="{escape(str(value))}"'
+        for name, value in attrs.items()
+        if tag_attr(tag, name) is None
+    )
+    end = -2 if tag.endswith("/>") else -1
+    return tag[:end].rstrip() + added + tag[end:]
+
+
+class ImageAssetsTransform(SphinxTransform):
+    """Lazy images with their size and srcset, for images of the extra trees
+
+    Images of the extra asset trees are published by ``html_extra_path``
+    rather than collected by Sphinx, so Markdown images pointing at them
+    become ``<img>`` tags here. Those and the ``<img>`` tags of raw HTML load
+    lazily. Sizes and variants come from the index that
+    ``build_versions.py --optimize-images`` writes.
+    """
+
+    # Before DoctreeReadEvent (880), where Sphinx collects the images
+    default_priority = 870
+
+    def apply(self):
+        extra = os.path.join(self.env.srcdir, EXTRA_DIR)
+        index_path = os.path.join(extra, IMAGE_INDEX)
+        try:
+            index = load_image_index(index_path, os.stat(index_path).st_mtime_ns)
+        except (OSError, ValueError):
+            index = {}
+        docdir = posixpath.dirname(self.env.docname)
+
+        for node in list(self.document.findall(nodes.image)):
+            uri = node.get("original_uri", node["uri"])
+            path = local_image(docdir, uri)
+            if path is None or not os.path.isfile(os.path.join(extra, path)):
+                continue
+            if any(node.get(key) for key in ("width", "height", "scale", "align")):
+                continue  # Directive options only Sphinx's writer handles
+            tag = f'<img src="{escape(uri)}"'
+            tag += f' alt="{escape(node.get("alt", ""))}"'
+            if node.get("classes"):
+                tag += f' class="{escape(" ".join(node["classes"]))}"'
+            node.replace_self(nodes.raw("", tag + " />", format="html"))
+
+        for node in list(self.document.findall(nodes.raw)):
+            if "html" not in node.get("format", "").split():
+                continue
+            text = node.astext()
+            if "<img" not in text.lower():
+                continue
+            html = IMG_TAG_RE.sub(
+                lambda match: enhance_img(match.group(0), docdir, index), text
+            )
+            if html != text:
+                node.replace_self(nodes.raw("", html, format=node["format"]))
@@ -0,0 +1,249 @@
+"""Cross-project link manifests, reference resolution and search
+
+Every HTML build writes ``ecosystem.json`` to its output directory: the
+pages, labels and objects of this (project, version, language) with their
+URLs, and a search shard of page, section and object titles. Sibling
+projects (``external_links.yaml``) publish the same file, so nothing is
+queried at runtime.
+
+When ``ecosystem_manifests`` lists local copies of sibling sites (a site
+root, an output directory or the manifest itself), their manifests for the
+current language are loaded at startup and
+
+* references that do not resolve locally are looked up in them, like
+  intersphinx; ``:ref:`data-juicer-hub:some-label``` restricts the lookup
+  to one project;
+* the search page also lists matching titles of the sibling projects, from
+  ``ecosystem-search.json`` written next to this build's manifest.
+"""
+
+import hashlib
+import json
+import os
+
+from docutils import nodes
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "ecosystem.json"
+SEARCH_FILE = "ecosystem-search.json"
+FORMAT = 1
+
+_siblings: list[dict] = []
+
+
+def find_manifest(path: str, language: str, version: str) -> str | None:
+    """The manifest of ``language`` in a sibling site, output dir or file"""
+    candidates = [
+        path,
+        os.path.join(path, MANIFEST),
+        os.path.join(path, language, version, MANIFEST),
+        os.path.join(path, "en", version, MANIFEST),
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def load_siblings(app) -> list[dict]:
+    """Manifests of the other projects, in ``ecosystem_manifests`` order"""
+    config = app.config
+    siblings = []
+    for path in config.ecosystem_manifests:
+        found = find_manifest(path, config.language, config.ecosystem_version)
+        if found is None:
+            logger.warning("[ecosystem] no %s found in %s", MANIFEST, path)
+            continue
+        with open(found, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT:
+            logger.warning("[ecosystem] unsupported manifest format: %s", found)
+            continue
+        if manifest["project"] != config.ecosystem_project:
+            siblings.append(manifest)
+    return siblings
+
+
+def on_config_inited(app, config):
+    paths = sorted(
+        filter(
+            None,
+            (
+                find_manifest(p, config.language, config.ecosystem_version)
+                for p in config.ecosystem_manifests
+            ),
+        )
+    )
+    # Pages linking to a sibling are rewritten when one of its manifests changes
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    config.ecosystem_digest = digest.hexdigest() if paths else ""
+
+
+def on_builder_inited(app):
+    _siblings[:] = load_siblings(app) if app.builder.format == "html" else []
+    if _siblings:
+        logger.info(
+            "[ecosystem] siblings: %s",
+            ", ".join(f"{m['project']} {m['version']}" for m in _siblings),
+        )
+
+
+def split_target(target: str, siblings: list[dict]) -> tuple[list[dict], str]:
+    """Siblings to search and the target without a ``project:`` prefix"""
+    project, sep, rest = target.partition(":")
+    if sep:
+        named = [m for m in siblings if m["project"] == project]
+        if named:
+            return named, rest
+    return siblings, target
+
+
+def lookup(app, manifest: dict, node, target: str) -> tuple[int, str, str] | None:
+    """(page, anchor, title) of a reference target in one manifest"""
+    domain, role = node.get("refdomain"), node["reftype"]
+    if domain == "std" and role in ("ref", "numref"):
+        entry = manifest["labels"].get(target.lower())
+        return tuple(entry) if entry else None
+    if domain == "std" and role == "doc":
+        for page_id, (docname, _, title) in enumerate(manifest["pages"]):
+            if docname == target.lstrip("/"):
+                return page_id, "", title
+        return None
+    if not domain or domain == "std":
+        return None
+    objtypes = app.env.domains[domain].objtypes_for_role(role) or []
+    for objtype in objtypes:
+        entry = manifest["objects"].get(f"{domain}:{objtype}", {}).get(target)
+        if entry:
+            return entry[0], entry[1], target
+    return None
+
+
+def on_missing_reference(app, env, node, contnode):
+    if not _siblings or "reftarget" not in node:
+        return None
+    candidates, target = split_target(node["reftarget"], _siblings)
+    for manifest in candidates:
+        found = lookup(app, manifest, node, target)
+        if found is None:
+            continue
+        page_id, anchor, title = found
+        uri = manifest["base"] + manifest["pages"][page_id][1]
+        if anchor:
+            uri += "#" + anchor
+        reference = nodes.reference(
+            "",
+            "",
+            internal=False,
+            refuri=uri,
+            reftitle=f"{manifest['display_name']} ({manifest['version']})",
+        )
+        if node.get("refexplicit") or node.get("refdomain") != "std":
+            reference.append(contnode)
+        else:
+            reference.append(contnode.__class__(title, title))
+        return reference
+    return None
+
+
+def build_manifest(app) -> dict:
+    env, builder = app.env, app.builder
+    docnames = sorted(env.found_docs & set(env.titles))
+    page_ids = {docname: i for i, docname in enumerate(docnames)}
+    pages = [[d, builder.get_target_uri(d), env.titles[d].astext()] for d in docnames]
+    titles = [[i, "", title] for i, (_, _, title) in enumerate(pages)]
+
+    labels = {}
+    for name, (docname, anchor, title) in env.domains["std"].labels.items():
+        if docname in page_ids and title:
+            labels[name] = [page_ids[docname], anchor, title]
+            if anchor:
+                titles.append([page_ids[docname], anchor, title])
+
+    objects = {}
+    for domain in sorted(env.domains.values(), key=lambda d: d.name):
+        if domain.name == "std":
+            continue
+        for name, _, objtype, docname, anchor, priority in domain.get_objects():
+            if priority < 0 or docname not in page_ids:
+                continue
+            objects.setdefault(f"{domain.name}:{objtype}", {})[name] = [
+                page_ids[docname],
+                anchor,
+            ]
+            titles.append([page_ids[docname], anchor, name])
+
+    config = app.config
+    return {
+        "format": FORMAT,
+        "project": config.ecosystem_project,
+        "display_name": config.ecosystem_display_name or config.ecosystem_project,
+        "version": config.ecosystem_version_label,
+        "language": config.language,
+        "base": config.ecosystem_base_url.format(language=config.language),
+        "pages": pages,
+        "labels": labels,
+        "objects": objects,
+        "titles": titles,
+    }
+
+
+def search_entries(siblings: list[dict]) -> dict:
+    """Title search shard of all siblings with absolute URLs"""
+    projects, entries = [], []
+    for i, manifest in enumerate(siblings):
+        projects.append(
+            {"name": manifest["display_name"], "version": manifest["version"]}
+        )
+        seen = set()
+        for page_id, anchor, title in manifest["titles"]:
+            uri = manifest["base"] + manifest["pages"][page_id][1]
+            uri += "#" + anchor if anchor else ""
+            if uri not in seen:
+                seen.add(uri)
+                entries.append([i, uri, title])
+    return {"projects": projects, "entries": entries}
+
+
+def dump(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def on_build_finished(app, exception):
+    if exception is not None or app.builder.format != "html":
+        return
+    dump(os.path.join(app.outdir, MANIFEST), build_manifest(app))
+    search_path = os.path.join(app.outdir, SEARCH_FILE)
+    if _siblings:
+        dump(search_path, search_entries(_siblings))
+    elif os.path.exists(search_path):
+        os.remove(search_path)
+
+
+def on_html_page_context(app, pagename, templatename, context, doctree):
+    if pagename == "search" and _siblings:
+        app.add_js_file("ecosystem-search.js", **{"data-index": SEARCH_FILE})
+
+
+def setup(app):
+    app.add_config_value("ecosystem_project", "", "html")
+    app.add_config_value("ecosystem_display_name", "", "html")
+    app.add_config_value("ecosystem_version_label", "", "html")
+    # URL of this output; "{language}" is replaced by the build language
+    app.add_config_value("ecosystem_base_url", "", "html")
+    # Local copies of sibling sites, and which of their versions to link to
+    app.add_config_value("ecosystem_manifests", [], "html")
+    app.add_config_value("ecosystem_version", "main", "html")
+    app.add_config_value("ecosystem_digest", "", "html")
+    app.connect("config-inited", on_config_inited)
+    app.connect("builder-inited", on_builder_inited)
+    app.connect("missing-reference", on_missing_reference)
+    app.connect("html-page-context", on_html_page_context)
+    app.connect("build-finished", on_build_finished)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -0,0 +1,145 @@
+"""Index of which source files have a ``_ZH`` translation
+
+A file ``a/b.md`` is paired when ``a/b_ZH.md`` sits next to it. The index is
+built in one walk over the directory listings (no ``stat`` per file) and
+saved in the source directory, which the English and Chinese builds of a ref
+share, so the second build only checks the mtime of each directory: adding,
+removing or renaming a file changes the mtime of its directory. The source
+directory itself, where the index is written, is compared by its listing.
+"""
+
+import json
+import os
+
+from sphinx.project import Project
+
+INDEX_FILE = ".language_index.json"
+INDEX_VERSION = 1
+ZH_SUFFIXES = ("_ZH.md", "_ZH.rst")
+# Sphinx internals TranslatedProject updates; sphinx is not pinned
+PROJECT_INTERNALS = ("discover", "doc2path", "_docname_to_path", "_path_to_docname")
+
+
+class LanguageIndex:
+    """Source files with a translation, and pages without one"""
+
+    def __init__(self, paired, unpaired, dirs: dict[str, int], root: list[str]):
+        self.paired = frozenset(paired)  # e.g. "docs/a.md" when docs/a_ZH.md exists
+        self.unpaired = frozenset(unpaired)  # e.g. "docs/b", without extension
+        self.dirs = dirs  # Relative subdirectory -> mtime_ns when it was listed
+        self.root = root  # Sorted names in the source directory
+
+    @classmethod
+    def scan(cls, srcdir: str) -> "LanguageIndex":
+        paired, unpaired, dirs = [], [], {}
+        stack = [("", None)]
+        while stack:
+            rel_dir, mtime = stack.pop()
+            if rel_dir:
+                dirs[rel_dir] = mtime
+            names = set()
+            with os.scandir(os.path.join(srcdir, rel_dir)) as entries:
+                for entry in entries:
+                    rel = os.path.join(rel_dir, entry.name)
+                    if not entry.is_dir():
+                        names.add(entry.name)
+                    elif not entry.is_symlink():  # Like os.walk(followlinks=False)
+                        stack.append((rel, entry.stat().st_mtime_ns))
+            for name in names:
+                if name.endswith(ZH_SUFFIXES):
+                    continue
+                base, ext = os.path.splitext(name)
+                if f"{base}_ZH{ext}" in names:
+                    paired.append(os.path.join(rel_dir, name))
+                else:
+                    unpaired.append(os.path.join(rel_dir, base))
+        return cls(paired, unpaired, dirs, root_listing(srcdir))
+
+    def is_current(self, srcdir: str) -> bool:
+        """Whether no directory changed since the index was built"""
+        try:
+            return root_listing(srcdir) == self.root and all(
+                os.stat(os.path.join(srcdir, rel)).st_mtime_ns == mtime
+                for rel, mtime in self.dirs.items()
+            )
+        except OSError:
+            return False
+
+    @classmethod
+    def load(cls, srcdir: str) -> "LanguageIndex":
+        """The saved index of ``srcdir`` if still current, else a fresh one"""
+        path = os.path.join(srcdir, INDEX_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index = cls(
+                    data["paired"], data["unpaired"], data["dirs"], data["root"]
+                )
+                if index.is_current(srcdir):
+                    return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.scan(srcdir)
+        tmp = f"{path}.tmp{os.getpid()}"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": INDEX_VERSION,
+                        "paired": sorted(index.paired),
+                        "unpaired": sorted(index.unpaired),
+                        "dirs": index.dirs,
+                        "root": index.root,
+                    },
+                    f,
+                )
+            os.replace(tmp, path)
+        except OSError:
+            pass  # Read-only source tree: the index is just not reused
+        return index
+
+
+def root_listing(srcdir: str) -> list[str]:
+    """Names in the source directory, leaving out the index and its temp files"""
+    return sorted(n for n in os.listdir(srcdir) if not n.startswith(INDEX_FILE))
+
+
+class TranslatedProject(Project):
+    """Sphinx project leaving out the documents listed in ``excluded``
+
+    Used by the Chinese build to drop English pages that have a translation
+    with one set lookup per document instead of one exclude pattern each.
+    """
+
+    excluded: frozenset = frozenset()
+
+    def discover(self, exclude_paths=(), include_paths=("**",)):
+        docnames = super().discover(exclude_paths, include_paths)
+        for docname in list(docnames):
+            path = self.doc2path(docname, absolute=False)
+            if os.path.normpath(path) in self.excluded:
+                docnames.discard(docname)
+                self._docname_to_path.pop(docname, None)
+                self._path_to_docname.pop(path, None)
+        return docnames
+
+
+def supports_translated_project(srcdir: str, source_suffix) -> bool:
+    """Whether this Sphinx's ``Project`` has what ``TranslatedProject`` uses
+
+    Checked on a project like the one Sphinx creates, before it does, so that
+    callers can fall back to ``exclude_patterns`` while the config is read.
+    """
+    try:
+        probe = Project(srcdir, source_suffix)
+    except TypeError:  # Constructor changed
+        return False
+    return all(hasattr(probe, name) for name in PROJECT_INTERNALS)
+
+
+def exclude_translated(app, index: LanguageIndex):
+    """Make ``app.project`` skip the English sources of translated pages"""
+    app.project.__class__ = TranslatedProject
+    app.project.excluded = index.paired
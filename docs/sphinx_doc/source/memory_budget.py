@@ -0,0 +1,163 @@
+"""Adapt the parallel workers of a build to a memory budget
+
+Enabled from ``conf.py`` when ``MAX_MEMORY_MB`` is set (``build_versions.py
+--max-memory``), which becomes ``memory_budget_mb``. Sphinx forks one worker
+per chunk of documents, and with autodoc every worker imports the documented
+package on top of what it shares with the main process, so ``-j N``
+multiplies that memory by N.
+
+Sphinx's ``ParallelTasks`` is replaced by a subclass that starts with a
+single worker. Each worker reports its private memory when its chunk is
+done; from then on the number of concurrent workers is
+
+    (budget - main process RSS) // (largest worker seen * SAFETY)
+
+capped at the ``-j`` value and at least 1, and re-evaluated after every
+chunk, in the read and the write phase. The budget, the worker counts used
+and the peaks observed are logged and written to ``REPORT`` in the doctree
+directory.
+"""
+
+import json
+import os
+import sys
+
+import sphinx.builders
+from sphinx.util import logging
+from sphinx.util.parallel import ParallelTasks
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+REPORT = "memory_budget.json"
+SAFETY = 1.2  # Headroom on the largest worker seen
+
+_budget_mb = 0.0
+_state = {"requested": 0, "worker_peak_mb": 0.0, "main_peak_mb": 0.0, "workers": []}
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # bytes vs KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def rss_mb() -> float:
+    """Current resident memory of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def private_mb() -> float:
+    """Memory of this process not shared with its parent (Linux), else its RSS"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            kib = sum(
+                int(line.split()[1])
+                for line in f
+                if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+        return kib / 1024
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def workers_for(requested: int) -> int:
+    main = rss_mb()
+    _state["main_peak_mb"] = max(_state["main_peak_mb"], main)
+    per_worker = _state["worker_peak_mb"] * SAFETY
+    if per_worker <= 0:
+        return 1  # Measure one worker first
+    return max(1, min(requested, int((_budget_mb - main) // per_worker)))
+
+
+class BudgetedTasks(ParallelTasks):
+    """``ParallelTasks`` whose worker count follows the measured memory"""
+
+    def __init__(self, nproc: int):
+        super().__init__(nproc)
+        self.requested = nproc
+        _state["requested"] = max(_state["requested"], nproc)
+        self.nproc = workers_for(nproc)
+        self.used = self.nproc
+
+    def add_task(self, task_func, arg=None, result_func=None):
+        def measured_task(*args):
+            return task_func(*args), private_mb()
+
+        def measured_result(task_arg, result):
+            result, memory = result
+            _state["worker_peak_mb"] = max(_state["worker_peak_mb"], memory)
+            nproc = workers_for(self.requested)
+            if nproc != self.nproc:
+                logger.info(
+                    "[memory-budget] %d workers (worker %.0f MiB, main %.0f MiB, "
+                    "budget %.0f MiB)",
+                    nproc,
+                    _state["worker_peak_mb"],
+                    rss_mb(),
+                    _budget_mb,
+                )
+                self.nproc = nproc
+                self.used = max(self.used, nproc)
+            if result_func is not None:
+                result_func(task_arg, result)
+
+        super().add_task(measured_task, arg, measured_result)
+
+    def join(self):
+        try:
+            super().join()
+        finally:
+            _state["workers"].append(self.used)
+
+
+def on_builder_inited(app):
+    global _budget_mb
+    _budget_mb = float(app.config.memory_budget_mb)
+
+
+def on_build_finished(app, exception):
+    _state["main_peak_mb"] = max(_state["main_peak_mb"], peak_rss_mb())
+    workers = max(_state["workers"], default=1)
+    report = {
+        "budget_mb": _budget_mb,
+        "requested": _state["requested"] or 1,
+        "workers": workers,
+        "worker_peak_mb": round(_state["worker_peak_mb"], 1),
+        "main_peak_mb": round(_state["main_peak_mb"], 1),
+        # Main process plus the most workers run at once, each at the peak
+        "estimated_peak_mb": round(
+            _state["main_peak_mb"]
+            + (workers if _state["workers"] else 0) * _state["worker_peak_mb"],
+            1,
+        ),
+    }
+    with open(os.path.join(app.doctreedir, REPORT), "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    logger.info(
+        "[memory-budget] peak ~%.0f MiB of %.0f MiB (main %.0f MiB, up to %d "
+        "workers of %.0f MiB)",
+        report["estimated_peak_mb"],
+        _budget_mb,
+        report["main_peak_mb"],
+        workers,
+        report["worker_peak_mb"],
+    )
+
+
+def setup(app):
+    app.add_config_value("memory_budget_mb", 0, "")
+    sphinx.builders.ParallelTasks = BudgetedTasks
+    app.connect("builder-inited", on_builder_inited)
+    app.connect("build-finished", on_build_finished)
+    return {"version": "1.0", "parallel_read_safe": True, "parallel_write_safe": True}
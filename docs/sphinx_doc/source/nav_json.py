@@ -0,0 +1,129 @@
+"""Sidebar navigation loaded from one JSON file per build
+
+With ``sidebar-nav-bs`` every page embeds the rendered toctree of its section,
+``navigation_depth`` levels deep, which for large operator folders is most
+of the HTML of a page and costs a toctree resolution per page.
+
+Enabled from ``conf.py`` when ``NAV_JSON`` is set (``build_versions.py
+--nav-json``), which also switches the sidebar to ``sidebar-nav-json.html``.
+The toctree of the whole project is walked once from the toctrees in ``env.tocs``
+and written to ``NAV_FILE`` in the output directory as nested
+``[title, uri, children]`` lists, uris relative to the output root. A page
+only carries the position of its entry in that tree (``nav_path``, the
+indices from the root down to the page); ``sidebar.js`` fetches the file and
+renders the subtree of the page's top-level section with the same markup as
+the theme: collapsible ``<details>``, the path to the page open and marked
+``current active``.
+"""
+
+import json
+import os
+
+from sphinx import addnodes
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+NAV_FILE = "nav.json"
+
+_tree: dict | None = None  # Built once per process: {"tree": ..., "paths": ...}
+
+
+def entry_title(env, title: str | None, docname: str) -> str:
+    if title:
+        return title
+    if docname in env.titles:
+        return env.titles[docname].astext()
+    return docname
+
+
+def toctree_entries(env, docname: str) -> list[tuple[str | None, str]]:
+    """(explicit title, docname or URL) of the toctrees of a document"""
+    entries = []
+    toc = env.tocs.get(docname)
+    if toc is None:
+        return entries
+    for toctree in toc.findall(addnodes.toctree):
+        for title, ref in toctree["entries"]:
+            entries.append((title, docname if ref == "self" else ref))
+    return entries
+
+
+def build_tree(app) -> dict:
+    """The navigation tree, and the path of each document in it"""
+    env, builder = app.env, app.builder
+    # The sidebar shows a top-level section navigation_depth levels deep
+    max_depth = int(app.config.html_theme_options.get("navigation_depth", 4)) + 1
+    paths: dict[str, list[int]] = {}
+
+    def walk(docname: str, path: list[int], depth: int, seen: set) -> list:
+        children = []
+        for title, ref in toctree_entries(env, docname):
+            if ref in seen or (ref not in env.all_docs and "://" not in ref):
+                continue
+            child_path = path + [len(children)]
+            if "://" in ref:
+                children.append([title or ref, ref])
+                continue
+            paths.setdefault(ref, child_path)
+            node = [entry_title(env, title, ref), builder.get_target_uri(ref)]
+            if depth < max_depth:
+                grandchildren = walk(ref, child_path, depth + 1, seen | {ref})
+                if grandchildren:
+                    node.append(grandchildren)
+            children.append(node)
+        return children
+
+    root = app.config.root_doc
+    return {"tree": walk(root, [], 1, {root}), "paths": paths}
+
+
+def get_tree(app) -> dict:
+    global _tree
+    if _tree is None:
+        _tree = build_tree(app)
+    return _tree
+
+
+def on_builder_inited(app):
+    global _tree
+    _tree = None
+
+
+def on_html_page_context(app, pagename, templatename, context, doctree):
+    nav = get_tree(app)
+    path = nav["paths"].get(pagename)
+    # Like sidebar-nav-bs, the template renders nothing (and the theme drops
+    # it) when the page is not in a section that has pages
+    if path and len(nav["tree"][path[0]]) > 2:
+        context["nav_path"] = ".".join(map(str, path))
+    else:
+        context["nav_path"] = ""
+    context["nav_json_file"] = NAV_FILE
+
+
+def on_build_finished(app, exception):
+    if exception is not None or app.builder.format != "html":
+        return
+    nav = get_tree(app)
+    data = {"format": 1, "tree": nav["tree"]}
+    path = os.path.join(app.outdir, NAV_FILE)
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == text:
+                return
+    except OSError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    logger.info(
+        "[nav-json] %s: %d pages, %d bytes", NAV_FILE, len(nav["paths"]), len(text)
+    )
+
+
+def setup(app):
+    app.connect("builder-inited", on_builder_inited)
+    app.connect("html-page-context", on_html_page_context)
+    app.connect("build-finished", on_build_finished)
+    return {"version": "1.0", "parallel_read_safe": True, "parallel_write_safe": True}
@@ -0,0 +1,150 @@
+"""Reuse the parsed documents of one language's build for the next language
+
+The English and Chinese builds of a ref read the same source tree, and most
+documents (every page without a ``_ZH`` translation, the API reference) are
+parsed identically for both. With ``SHARE_DOCTREES`` set, each build writes
+a small manifest next to its environment pickle; ``build_versions.py`` then
+copies the doctree directory of the first language into the second one's
+before running it. Sphinx sees a language change and would re-read
+everything, so at ``env-before-read-docs`` the documents that are unchanged
+since the first build are dropped from the read list and keep their doctree
+and environment data. Re-read are:
+
+* new documents (the ``_ZH`` pages) and documents changed on disk;
+* the root document and documents with globbed toctrees;
+* documents matched by a language-restricted ``source_rewrite_rules`` entry;
+* documents matching a pattern of ``shared_doctrees_reread``.
+
+Labels that Sphinx generates while reading (field list names such as
+"Parameters", index entries like "(class in ...)") stay in the first
+language in reused documents. ``conf.py`` therefore sets
+``shared_doctrees_reread`` to ``["api/*"]``, or to the patterns of
+``build_versions.py --share-doctrees-reread``.
+"""
+
+import hashlib
+import json
+import os
+import re
+from fnmatch import fnmatch
+
+from sphinx.util import logging
+
+from source_rewrite import FLAGS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "shared_doctrees.json"
+# "env" config values that legitimately differ between the language builds;
+# numfig_format defaults to translated captions
+LANGUAGE_KEYS = {
+    "language",
+    "root_doc",
+    "master_doc",
+    "exclude_patterns",
+    "numfig_format",
+}
+
+
+def stable_repr(value) -> str:
+    """``repr`` that does not depend on the hash seed of the process"""
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(map(stable_repr, value))) + "}"
+    if isinstance(value, dict):
+        items = (f"{stable_repr(k)}: {stable_repr(v)}" for k, v in value.items())
+        return "{" + ", ".join(sorted(items)) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(map(stable_repr, value)) + "]"
+    return repr(value)
+
+
+def config_fingerprint(app) -> dict[str, str]:
+    """Hash each config value that affects reading, except the language ones"""
+    return {
+        item.name: hashlib.sha256(stable_repr(item.value).encode()).hexdigest()[:16]
+        for item in app.config.filter(frozenset({"env"}))
+        if item.name not in LANGUAGE_KEYS
+    }
+
+
+def read_manifest(app) -> dict | None:
+    try:
+        with open(os.path.join(app.doctreedir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(app, exception):
+    if exception is not None:
+        return
+    manifest = {"language": app.config.language, "config": config_fingerprint(app)}
+    with open(os.path.join(app.doctreedir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def language_rules(app) -> list[re.Pattern]:
+    """Rewrite rules whose output depends on the language being built"""
+    patterns = []
+    for rule in getattr(app.config, "source_rewrite_rules", []):
+        if rule.get("languages"):
+            combined = 0
+            for flag in rule.get("flags", ""):
+                combined |= FLAGS[flag]
+            patterns.append(re.compile(rule["pattern"], combined))
+    return patterns
+
+
+def is_language_specific(env, docname: str, rules: list[re.Pattern]) -> bool:
+    if not rules:
+        return False
+    try:
+        text = env.doc2path(docname).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return True
+    return any(rule.search(text) for rule in rules)
+
+
+def skip_shared_docs(app, env, docnames):
+    """Keep the documents parsed for another language out of the read list"""
+    manifest = read_manifest(app)
+    if manifest is None or manifest.get("language") == app.config.language:
+        return
+    config = config_fingerprint(app)
+    previous = manifest.get("config", {})
+    differs = sorted(
+        k for k in config.keys() | previous.keys() if config.get(k) != previous.get(k)
+    )
+    if differs:
+        logger.info(
+            "[shared-doctrees] configuration differs (%s), reading everything",
+            ", ".join(differs),
+        )
+        return
+
+    # What would be outdated if the language had not changed
+    added, changed, _ = env.get_outdated_files(False)
+    reread = added | changed | env.glob_toctrees | {app.config.root_doc}
+    rules = language_rules(app)
+    total = len(docnames)
+    patterns = app.config.shared_doctrees_reread
+    docnames[:] = [
+        docname
+        for docname in docnames
+        if docname in reread
+        or any(fnmatch(docname, p) for p in patterns)
+        or is_language_specific(env, docname, rules)
+    ]
+    logger.info(
+        "[shared-doctrees] reusing %d of %d documents parsed for %s",
+        total - len(docnames),
+        total,
+        manifest["language"],
+    )
+
+
+def setup(app):
+    app.add_config_value("shared_doctrees_reread", [], "env")
+    app.connect("env-before-read-docs", skip_shared_docs)
+    app.connect("build-finished", write_manifest)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -0,0 +1,196 @@
+"""Precompiled rewriting of document sources at ``source-read``
+
+Rules are declared in ``conf.py`` (``source_rewrite_rules``) as dicts::
+
+    {
+        "name": "drop-overview",        # Shown in the statistics
+        "pattern": r"- \\[Overview\\]\\(README\\.md\\)",
+        "replace": "",                  # re template, e.g. r"[\\g<text>](...)"
+        "flags": "i",                   # Optional re flags: i, m, s, x
+        "languages": ["en"],            # Optional: only for these languages
+        "handler": "repo_link",         # Optional: function from HANDLERS
+    }
+
+When the builder starts, the rules for the current language are compiled
+once; every document then goes through them in declaration order, a rule
+seeing the output of the previous ones. Each rule is its own ``re.subn``
+pass rather than one branch of a combined alternation: with CPython's regex
+engine a pattern starting with a literal is located with a fast substring
+search, which an alternation of unrelated rules loses, so separate passes
+are the faster option for a handful of rules. Hit counts and the time spent
+per rule are reported at the end of the build.
+"""
+
+import json
+import os
+import re
+import time
+from functools import lru_cache, partial
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+
+def repo_link(match, docname: str, rule: dict) -> str:
+    """Point a relative link at the file in the repository (``rule["base"]``)
+
+    Expects ``text`` and ``path`` groups; the path is resolved against the
+    directory of the document.
+    """
+    text, path = match.group("text"), match.group("path")
+    return f"[{text}]({rule['base']}{resolve_path(docname, path)})"
+
+
+def image_link(match, docname: str, rule: dict) -> str:
+    """Keep an image of an extra asset tree local, else load it from ``rule["base"]``
+
+    Expects ``text``, ``path`` and ``title`` groups. The extra trees are
+    copied to ``rule["extra"]`` under their repository paths and published
+    at the same place relative to the pages, so the relative path still works.
+    """
+    path = resolve_path(docname, match.group("path"))
+    if os.path.isfile(os.path.join(rule["extra"], path)):
+        return match.group(0)
+    title = match.group("title") or ""
+    return f"![{match.group('text')}]({rule['base']}{path}{title})"
+
+
+@lru_cache(maxsize=4096)
+def resolve_path(docname: str, path: str) -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(docname), path))
+
+
+def zh_link(match, docname: str, rule: dict) -> str:
+    """Point a link to an English page at its ``_ZH`` page if there is one
+
+    Expects ``path`` (without ``.md``) and ``fragment`` groups; the page is
+    looked up in ``rule["srcdir"]``. Anchors of machine-translated pages are
+    mapped with the JSON file ``rule["anchors"]`` (see translate_pages.py).
+    """
+    path = match.group("path")
+    target = resolve_path(docname, path)
+    if not has_zh_page(rule["srcdir"], target):
+        return match.group(0)
+    fragment = match.group("fragment") or ""
+    if fragment and rule.get("anchors"):
+        anchors = load_anchors(rule["anchors"]).get(f"{target}.md", {})
+        fragment = "#" + anchors.get(fragment[1:], fragment[1:])
+    return f"]({path}_ZH.md{fragment})"
+
+
+@lru_cache(maxsize=4096)
+def has_zh_page(srcdir: str, path: str) -> bool:
+    return os.path.isfile(os.path.join(srcdir, f"{path}_ZH.md"))
+
+
+@lru_cache(maxsize=None)
+def load_anchors(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+HANDLERS = {"repo_link": repo_link, "zh_link": zh_link, "image_link": image_link}
+
+
+class SourceRewriter:
+    """The rewrite rules of one language, compiled once"""
+
+    def __init__(self, rules: list[dict], language: str | None = None):
+        self.rules = []
+        for rule in rules:
+            languages = rule.get("languages")
+            if languages and language not in languages:
+                continue
+            unsupported = set(rule.get("flags", "")) - set(FLAGS)
+            if unsupported:
+                raise ValueError(
+                    f"source rewrite rule {rule['name']!r}: unsupported flags "
+                    f"{''.join(sorted(unsupported))}"
+                )
+            handler = rule.get("handler")
+            if handler is not None and handler not in HANDLERS:
+                raise ValueError(
+                    f"source rewrite rule {rule['name']!r}: unknown handler {handler!r}"
+                )
+            flags = 0
+            for flag in rule.get("flags", ""):
+                flags |= FLAGS[flag]
+            try:
+                regex = re.compile(rule["pattern"], flags)
+            except re.error as e:
+                raise ValueError(f"source rewrite rule {rule['name']!r}: {e}") from e
+            self.rules.append((rule, regex))
+
+    def apply(self, docname: str, text: str, stats: dict | None = None) -> str:
+        """Run every rule over ``text``, adding hits and seconds to ``stats``"""
+        for rule, regex in self.rules:
+            start = time.perf_counter()
+            handler = rule.get("handler")
+            if handler is not None:
+                text, hits = regex.subn(
+                    partial(HANDLERS[handler], docname=docname, rule=rule), text
+                )
+            else:
+                text, hits = regex.subn(rule.get("replace", ""), text)
+            if stats is not None:
+                entry = stats.setdefault(rule["name"], [0, 0.0])
+                entry[0] += hits
+                entry[1] += time.perf_counter() - start
+        if stats is not None:
+            stats.setdefault("(documents)", [0, 0.0])[0] += 1
+        return text
+
+
+_rewriter: SourceRewriter | None = None
+
+
+def init_rewriter(app):
+    global _rewriter
+    _rewriter = SourceRewriter(app.config.source_rewrite_rules, app.config.language)
+    app.env.source_rewrite_stats = {}
+
+
+def rewrite_source(app, docname, source):
+    if _rewriter is None:
+        return
+    stats = getattr(app.env, "source_rewrite_stats", None)
+    if stats is None:
+        stats = app.env.source_rewrite_stats = {}
+    source[0] = _rewriter.apply(docname, source[0], stats)
+
+
+def merge_stats(app, env, docnames, other):
+    """Add the statistics of a parallel reader process to the main env"""
+    stats = getattr(env, "source_rewrite_stats", None)
+    if stats is None:
+        stats = env.source_rewrite_stats = {}
+    for name, (hits, seconds) in getattr(other, "source_rewrite_stats", {}).items():
+        entry = stats.setdefault(name, [0, 0.0])
+        entry[0] += hits
+        entry[1] += seconds
+
+
+def report_stats(app, exception):
+    stats = dict(getattr(app.env, "source_rewrite_stats", None) or {})
+    if not stats:
+        return
+    documents = stats.pop("(documents)", [0, 0.0])[0]
+    seconds = sum(entry[1] for entry in stats.values())
+    logger.info("[source-rewrite] %d documents rewritten in %.3fs", documents, seconds)
+    for name, (hits, seconds) in sorted(stats.items()):
+        logger.info("[source-rewrite]   %-28s %6d hits %8.3fs", name, hits, seconds)
+
+
+def setup(app):
+    app.add_config_value("source_rewrite_rules", [], "env")
+    app.connect("builder-inited", init_rewriter)
+    app.connect("source-read", rewrite_source)
+    app.connect("env-merge-info", merge_stats)
+    app.connect("build-finished", report_stats)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -0,0 +1,680 @@
+"""Static API documentation extracted from source with ``ast``
+
+Import-based autodoc needs the documented package and all of its runtime
+dependencies (torch, transformers, ...) to be importable, which makes API
+builds slow, memory hungry and tied to a full runtime install. With
+``API_DOC_MODE=static`` this extension serves the ``automodule``,
+``autoclass``, ``autoexception`` and ``autofunction`` directives from the
+parsed source instead. The rst pages stay those sphinx-apidoc renders from
+``_templates/package.rst_t`` (``APIDOC_TEMPLATES`` in ``build_versions.py``);
+for their directives, modules, classes, functions, signatures, attributes
+and docstrings are read with ``ast`` and rendered as the same ``py:``
+directives autodoc would emit. Docstrings still go through
+``autodoc-process-docstring`` (napoleon) and members through
+``autodoc-skip-member``.
+
+All modules referenced by the sources are parsed in parallel when the builder
+starts. Modules matching ``static_api_import_modules`` (fnmatch patterns) and
+anything static extraction cannot express (``inherited-members``,
+``imported-members``, other directives) fall back to regular autodoc.
+"""
+
+import ast
+import builtins
+import fnmatch
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from docutils.parsers.rst import directives
+from docutils.statemachine import StringList
+from sphinx.ext.autodoc import Options
+from sphinx.pycode.parser import Parser
+from sphinx.util import logging
+from sphinx.util.docstrings import prepare_docstring
+
+from autodoc_cache import (
+    AUTOMODULE_RE,
+    find_module_file,
+    find_source,
+    follow_imported,
+    limit_autosummary,
+    parse_cached,
+    split_target,
+)
+
+logger = logging.getLogger(__name__)
+
+# Directives rendered statically and the object type they document
+STATIC_DIRECTIVES = {
+    "automodule": "module",
+    "autoclass": "class",
+    "autoexception": "exception",
+    "autofunction": "function",
+}
+# Options that need the imported objects; such directives use autodoc
+IMPORT_ONLY_OPTIONS = {"inherited-members", "imported-members"}
+# autodoc's member_order values, used for ``autodoc_member_order = "groupwise"``
+GROUP_ORDER = {
+    "exception": 10,
+    "class": 20,
+    "function": 30,
+    "data": 40,
+    "method": 50,
+    "property": 60,
+    "attribute": 60,
+}
+PROPERTY_DECORATORS = {"property", "cached_property", "functools.cached_property"}
+METHOD_FLAGS = {"staticmethod": "staticmethod", "classmethod": "classmethod"}
+MAX_VALUE_LENGTH = 80  # Longer ``:value:`` expressions are left out
+
+_modules: dict[str, tuple[str, int, "ObjectInfo"]] = {}
+_stats = {"static": 0, "imported": 0}
+
+
+@dataclass
+class ObjectInfo:
+    """A documented object as found in the source"""
+
+    kind: str  # module, class, exception, function, method, property, attribute, data
+    name: str  # Qualified name below the module, e.g. ``OP.run``
+    signature: str = ""  # With annotations, e.g. ``(x: int = 1) -> None``
+    plain_signature: str = ""  # Without annotations
+    docstring: str | None = None
+    bases: list[str] = field(default_factory=list)  # Resolved dotted names
+    flags: list[str] = field(default_factory=list)  # async, staticmethod, ...
+    annotation: str | None = None
+    value: str | None = None
+    members: list["ObjectInfo"] = field(default_factory=list)
+    all_names: list[str] | None = None  # Module ``__all__``, if a literal
+
+    @property
+    def short_name(self) -> str:
+        return self.name.rpartition(".")[2]
+
+    def find(self, qualname: str) -> "ObjectInfo | None":
+        node = self
+        for part in qualname.split("."):
+            node = next((m for m in node.members if m.short_name == part), None)
+            if node is None:
+                return None
+        return node
+
+
+def format_param(arg: ast.arg, default, annotated: bool) -> str:
+    text = arg.arg
+    if annotated and arg.annotation is not None:
+        text += f": {ast.unparse(arg.annotation)}"
+        if default is not None:
+            text += f" = {ast.unparse(default)}"
+    elif default is not None:
+        text += f"={ast.unparse(default)}"
+    return text
+
+
+def format_signature(node, skip_first: bool, annotated: bool) -> str:
+    """Render a function's parameters and return annotation like autodoc"""
+    args = node.args
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    n_posonly = len(args.posonlyargs)
+    params = []
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        if not (skip_first and i == 0):
+            params.append(format_param(arg, default, annotated))
+        if n_posonly and i == n_posonly - 1 and params:
+            params.append("/")
+    if args.vararg is not None:
+        params.append("*" + format_param(args.vararg, None, annotated))
+    elif args.kwonlyargs:
+        params.append("*")
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(format_param(arg, default, annotated))
+    if args.kwarg is not None:
+        params.append("**" + format_param(args.kwarg, None, annotated))
+    signature = f"({', '.join(params)})"
+    if annotated and node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def decorator_name(node) -> str:
+    if isinstance(node, ast.Call):
+        node = node.func
+    try:
+        return ast.unparse(node)
+    except ValueError:
+        return ""
+
+
+def imported_names(tree: ast.Module, package: str) -> dict[str, str]:
+    """Map top-level names bound by imports to the dotted names they refer to"""
+    names = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    names[alias.asname] = alias.name
+                else:
+                    top = alias.name.split(".")[0]
+                    names[top] = top
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package.split(".")
+                base = base[: len(base) - node.level + 1]
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module or ""
+            for alias in node.names:
+                if alias.name != "*":
+                    names[alias.asname or alias.name] = f"{module}.{alias.name}"
+    return names
+
+
+class Extractor:
+    """Walks one module's AST and collects ``ObjectInfo`` records"""
+
+    def __init__(self, modname: str, source: str, is_package: bool):
+        self.modname = modname
+        self.tree = ast.parse(source)
+        package = modname if is_package else modname.rpartition(".")[0]
+        self.imports = imported_names(self.tree, package)
+        self.local_names = {
+            node.name
+            for node in self.tree.body
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+        # Attribute docs from docstrings after assignments and ``#:`` comments
+        parser = Parser(source)
+        parser.parse()
+        self.attr_docs = parser.comments
+
+    def resolve(self, expr) -> str:
+        """Dotted name of a base class expression, as autodoc would show it"""
+        text = ast.unparse(expr)
+        head, _, rest = text.partition(".")
+        if head in self.imports:
+            return self.imports[head] + (f".{rest}" if rest else "")
+        if head in self.local_names:
+            return f"{self.modname}.{text}"
+        return text
+
+    def module(self) -> ObjectInfo:
+        info = ObjectInfo("module", "", docstring=ast.get_docstring(self.tree))
+        info.members = self.body(self.tree.body, scope=[])
+        for node in self.tree.body:
+            if (
+                isinstance(node, ast.Assign)
+                and any(
+                    isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets
+                )
+                and isinstance(node.value, (ast.List, ast.Tuple))
+            ):
+                info.all_names = [
+                    e.value
+                    for e in node.value.elts
+                    if isinstance(e, ast.Constant) and isinstance(e.value, str)
+                ]
+        return info
+
+    def body(self, nodes, scope: list[str]) -> list[ObjectInfo]:
+        members = []
+        seen = set()
+        in_class = bool(scope)
+        for node in nodes:
+            if isinstance(node, ast.ClassDef):
+                info = self.class_info(node, scope)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                info = self.function_info(node, scope, in_class)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                for info in self.assignment_infos(node, scope, in_class):
+                    if info.short_name not in seen:
+                        seen.add(info.short_name)
+                        members.append(info)
+                continue
+            else:
+                continue
+            if info.short_name in seen:  # Redefinitions (e.g. property setters)
+                continue
+            seen.add(info.short_name)
+            members.append(info)
+        return members
+
+    def class_info(self, node: ast.ClassDef, scope: list[str]) -> ObjectInfo:
+        qualname = ".".join(scope + [node.name])
+        bases = [self.resolve(b) for b in node.bases]
+        is_exception = any(
+            isinstance(getattr(builtins, b, None), type)
+            and issubclass(getattr(builtins, b), BaseException)
+            for b in bases
+        ) or any(b.endswith(("Error", "Exception")) for b in bases)
+        info = ObjectInfo(
+            "exception" if is_exception else "class",
+            qualname,
+            docstring=ast.get_docstring(node),
+            bases=bases or ["object"],
+        )
+        info.members = self.body(node.body, scope + [node.name])
+        for name in ("__init__", "__new__"):
+            ctor = info.find(name)
+            if ctor is not None and ctor.kind == "method":
+                info.signature, info.plain_signature = (
+                    ctor.signature,
+                    ctor.plain_signature,
+                )
+                break
+        return info
+
+    def function_info(self, node, scope: list[str], in_class: bool) -> ObjectInfo:
+        decorators = [decorator_name(d) for d in node.decorator_list]
+        flags = ["async"] if isinstance(node, ast.AsyncFunctionDef) else []
+        flags += [METHOD_FLAGS[d] for d in decorators if d in METHOD_FLAGS]
+        if any(d.rpartition(".")[2] == "abstractmethod" for d in decorators):
+            flags.append("abstractmethod")
+        kind = "method" if in_class else "function"
+        if in_class and (
+            PROPERTY_DECORATORS.intersection(decorators)
+            or any(d.endswith(".setter") or d.endswith(".getter") for d in decorators)
+        ):
+            kind = "property"
+        skip_first = in_class and "staticmethod" not in flags
+        info = ObjectInfo(
+            kind,
+            ".".join(scope + [node.name]),
+            signature=format_signature(node, skip_first, annotated=True),
+            plain_signature=format_signature(node, skip_first, annotated=False),
+            docstring=ast.get_docstring(node),
+            flags=flags,
+        )
+        if kind == "property" and node.returns is not None:
+            info.annotation = ast.unparse(node.returns)
+        return info
+
+    def assignment_infos(self, node, scope: list[str], in_class: bool):
+        if isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+            annotation = ast.unparse(node.annotation)
+        else:
+            targets = node.targets
+            annotation = None
+        value = None
+        if node.value is not None:
+            value = ast.unparse(node.value)
+            if len(value) > MAX_VALUE_LENGTH or "\n" in value:
+                value = None
+        for target in targets:
+            if not isinstance(target, ast.Name) or target.id == "__all__":
+                continue
+            doc = self.attr_docs.get((".".join(scope), target.id))
+            yield ObjectInfo(
+                "attribute" if in_class else "data",
+                ".".join(scope + [target.id]),
+                docstring=doc,
+                annotation=annotation,
+                value=value,
+            )
+
+
+def extract_module(modname: str, path: str) -> ObjectInfo:
+    """Parse one module file into an ``ObjectInfo`` tree (runs in workers)"""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    return Extractor(modname, source, path.endswith("__init__.py")).module()
+
+
+def load_module(modname: str, path: str) -> ObjectInfo | None:
+    """Parsed module from the prefetched table, re-parsing stale entries"""
+    mtime = os.stat(path).st_mtime_ns
+    entry = _modules.get(modname)
+    if entry is not None and entry[0] == path and entry[1] == mtime:
+        return entry[2]
+    try:
+        info = extract_module(modname, path)
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+        logger.warning("[static-api] cannot parse %s: %s", path, e)
+        return None
+    _modules[modname] = (path, mtime, info)
+    return info
+
+
+def uses_import(app, modname: str) -> bool:
+    """Whether ``modname`` is configured to be documented by importing it"""
+    return any(
+        fnmatch.fnmatchcase(modname, pattern)
+        for pattern in app.config.static_api_import_modules
+    )
+
+
+def prefetch_modules(app):
+    """Parse every module named by an ``automodule`` in the sources in parallel"""
+    targets = {}
+    for docname in app.env.found_docs:
+        try:
+            text = app.env.doc2path(docname).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        for modname in AUTOMODULE_RE.findall(text):
+            path = find_module_file(modname)
+            if path is not None and not uses_import(app, modname):
+                targets[modname] = path
+    if not targets:
+        return
+
+    names = sorted(targets)
+    paths = [targets[n] for n in names]
+    workers = min(len(names), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(safe_extract, names, paths, chunksize=8))
+    else:
+        results = list(map(safe_extract, names, paths))
+    for name, path, info in zip(names, paths, results):
+        if info is not None:
+            _modules[name] = (path, os.stat(path).st_mtime_ns, info)
+    logger.info("[static-api] parsed %d modules with %d workers", len(names), workers)
+
+
+def safe_extract(modname: str, path: str) -> ObjectInfo | None:
+    try:
+        return extract_module(modname, path)
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+        return None  # Reported when the directive parses it again
+
+
+def group_order(info: ObjectInfo) -> int:
+    """autodoc's groupwise rank; class, then static methods precede methods"""
+    if info.kind == "method" and "classmethod" in info.flags:
+        return 48
+    if info.kind == "method" and "staticmethod" in info.flags:
+        return 49
+    return GROUP_ORDER.get(info.kind, 99)
+
+
+def member_filter(value) -> set[str] | None:
+    """``None`` for "all members", otherwise the explicitly listed names"""
+    if value is None or value is True or str(value).strip() == "":
+        return None
+    return {name.strip() for name in str(value).split(",") if name.strip()}
+
+
+class Renderer:
+    """Turns ``ObjectInfo`` trees into the reST autodoc would generate"""
+
+    def __init__(self, app, modname: str, options: dict):
+        self.app = app
+        self.config = app.config
+        self.modname = modname
+        self.options = options
+        self.autodoc_options = Options(options)
+        self.exclude = member_filter(options.get("exclude-members")) or set()
+        self.no_index = "no-index" in options or "noindex" in options
+
+    def docstring_lines(self, info: ObjectInfo, what: str) -> list[str]:
+        doc = info.docstring
+        if info.kind in ("class", "exception"):
+            init = info.find("__init__")
+            init_doc = init.docstring if init is not None else None
+            content = self.config.autoclass_content
+            if content == "both" and init_doc:
+                doc = f"{doc or ''}\n\n{init_doc}"
+            elif content == "init":
+                doc = init_doc or doc
+        if not doc:
+            return []
+        lines = prepare_docstring(doc)
+        fullname = f"{self.modname}.{info.name}" if info.name else self.modname
+        self.app.events.emit(
+            "autodoc-process-docstring",
+            what,
+            fullname,
+            None,
+            self.autodoc_options,
+            lines,
+        )
+        return lines
+
+    def skip(self, parent_kind: str, info: ObjectInfo) -> bool:
+        name = info.short_name
+        if name in self.exclude:
+            return True
+        has_doc = bool(info.docstring)
+        undoc = "undoc-members" in self.options
+        if name.startswith("__") and name.endswith("__"):
+            wanted = member_filter(self.options.get("special-members", ""))
+            included = "special-members" in self.options and (
+                wanted is None or name in wanted
+            )
+            would_skip = not included or not (has_doc or undoc)
+        elif name.startswith("_"):
+            wanted = member_filter(self.options.get("private-members", ""))
+            included = "private-members" in self.options and (
+                wanted is None or name in wanted
+            )
+            would_skip = not included or not (has_doc or undoc)
+        else:
+            would_skip = not (has_doc or undoc)
+        result = self.app.events.emit_firstresult(
+            "autodoc-skip-member",
+            parent_kind,
+            name,
+            None,
+            would_skip,
+            self.autodoc_options,
+        )
+        return would_skip if result is None else bool(result)
+
+    def ordered(self, members: list[ObjectInfo], all_names=None) -> list[ObjectInfo]:
+        order = self.config.autodoc_member_order
+        if order == "alphabetical":
+            return sorted(members, key=lambda m: m.short_name)
+        if order == "groupwise":
+            return sorted(members, key=lambda m: (group_order(m), m.short_name))
+        if all_names and "ignore-module-all" not in self.options:
+            position = {name: i for i, name in enumerate(all_names)}
+            return sorted(members, key=lambda m: position.get(m.short_name, 1 << 30))
+        return members
+
+    def select(self, parent: ObjectInfo) -> list[ObjectInfo]:
+        if "members" not in self.options:
+            return []
+        wanted = member_filter(self.options.get("members"))
+        members = parent.members
+        if wanted is not None:
+            members = [m for m in members if m.short_name in wanted]
+        elif parent.kind == "module" and parent.all_names is not None:
+            if "ignore-module-all" not in self.options:
+                members = [m for m in members if m.short_name in parent.all_names]
+        members = [m for m in members if not self.skip(parent.kind, m)]
+        return self.ordered(members, parent.all_names)
+
+    def signature(self, info: ObjectInfo) -> str:
+        if self.config.autodoc_typehints in ("none", "description"):
+            return info.plain_signature
+        return info.signature
+
+    def class_signature(self, info: ObjectInfo, depth: int = 0) -> str:
+        """Constructor signature, looked up through statically known bases"""
+        signature = self.signature(info)
+        if signature or depth > 5:
+            return signature
+        for base in info.bases:
+            target = split_target(base)
+            if target is None:
+                continue
+            module = load_module(*target)
+            base_info = module.find(base[len(target[0]) + 1 :]) if module else None
+            if base_info is not None and base_info.kind in ("class", "exception"):
+                signature = self.class_signature(base_info, depth + 1)
+                if signature:
+                    return signature
+        return ""
+
+    def bases_line(self, info: ObjectInfo) -> str:
+        refs = []
+        for base in info.bases:
+            if "." in base:
+                refs.append(f":py:class:`~{base}`")
+            else:
+                refs.append(f":py:class:`{base}`")
+        return "Bases: " + ", ".join(refs)
+
+    def render_object(self, info: ObjectInfo, indent: str = "") -> list[str]:
+        kind = info.kind
+        if kind in ("class", "exception"):
+            header = info.name + self.class_signature(info)
+        elif kind in ("function", "method"):
+            header = info.name + self.signature(info)
+        else:
+            header = info.name
+        lines = ["", f"{indent}.. py:{kind}:: {header}"]
+        body = indent + "   "
+        lines.append(f"{body}:module: {self.modname}")
+        if self.no_index:
+            lines.append(f"{body}:no-index:")
+        for flag in info.flags:
+            lines.append(f"{body}:{flag}:")
+        if kind in ("attribute", "data", "property") and info.annotation:
+            if self.config.autodoc_typehints not in ("none", "description"):
+                lines.append(f"{body}:type: {info.annotation}")
+        if kind in ("attribute", "data") and info.value is not None:
+            lines.append(f"{body}:value: {info.value}")
+        lines.append("")
+
+        if kind in ("class", "exception") and "show-inheritance" in self.options:
+            lines += [f"{body}{self.bases_line(info)}", ""]
+        what = "method" if kind == "property" else kind
+        lines += [
+            f"{body}{line}" if line else "" for line in self.docstring_lines(info, what)
+        ]
+
+        if kind in ("class", "exception"):
+            for member in self.select(info):
+                lines += self.render_object(member, body)
+        lines.append("")
+        return lines
+
+    def render_module(self, info: ObjectInfo) -> list[str]:
+        lines = ["", f".. py:module:: {self.modname}", ""]
+        for opt in ("platform", "synopsis"):
+            if self.options.get(opt):
+                lines.insert(2, f"   :{opt}: {self.options[opt]}")
+        if "deprecated" in self.options:
+            lines.insert(2, "   :deprecated:")
+        if self.no_index:
+            lines.insert(2, "   :no-index:")
+        lines += [
+            f"   {line}" if line else ""
+            for line in self.docstring_lines(info, "module")
+        ]
+        for member in self.select(info):
+            lines += self.render_object(member)
+        return lines
+
+
+def default_options(config, options: dict) -> dict:
+    """Merge ``autodoc_default_options`` into a directive's options"""
+    merged = dict(options)
+    for name, value in (config.autodoc_default_options or {}).items():
+        if name in merged or value is False or value is None:
+            continue
+        merged[name] = "" if value is True else value
+    return merged
+
+
+def static_directive(base):
+    """Subclass an autodoc directive so it renders from the parsed source"""
+
+    class StaticAutodocDirective(base):
+        def static_content(self) -> StringList | None:
+            objtype = STATIC_DIRECTIVES.get(self.name)
+            env = self.state.document.settings.env
+            options = default_options(env.config, dict(self.options))
+            if objtype is None or IMPORT_ONLY_OPTIONS.intersection(options):
+                return None
+
+            name = self.arguments[0].strip().split("(")[0]
+            candidates = [name]
+            current = env.ref_context.get("py:module")
+            if objtype != "module" and current:
+                candidates.append(f"{current}.{name}")
+            target = None
+            for candidate in candidates:
+                found = split_target(candidate)
+                # A module directive names the module, anything else an object in it
+                if found is not None and (found[0] == candidate) == (
+                    objtype == "module"
+                ):
+                    name, target = candidate, found
+                    break
+            if target is None:
+                return None
+            modname, path = target
+            if uses_import(env.app, modname):
+                return None
+            module = load_module(modname, path)
+            if module is None:
+                return None
+
+            renderer = Renderer(env.app, modname, options)
+            if objtype == "module":
+                if modname != name:
+                    return None
+                lines = renderer.render_module(module)
+            else:
+                info = module.find(name[len(modname) + 1 :])
+                if info is None or not (
+                    info.kind == objtype
+                    or (objtype == "class" and info.kind == "exception")
+                    or (objtype == "function" and info.kind == "method")
+                ):
+                    return None
+                lines = renderer.render_object(info)
+
+            self.state.document.settings.record_dependencies.add(path)
+            return StringList(lines, source=path)
+
+        def run(self):
+            try:
+                content = self.static_content()
+            except (OSError, SyntaxError, ValueError) as e:
+                logger.warning("[static-api] %s: %s", self.arguments[0], e)
+                content = None
+            if content is None:
+                _stats["imported"] += 1
+                return super().run()
+            _stats["static"] += 1
+            return parse_cached(self.state, content, titles_allowed=True)
+
+    StaticAutodocDirective.__name__ = f"Static{base.__name__}"
+    return StaticAutodocDirective
+
+
+def wrap_directives(app, config):
+    """Wrap the autodoc directives (or their cached variants) registered so far"""
+    for name in STATIC_DIRECTIVES:
+        directive = directives._directives.get(name)
+        if directive is not None:
+            app.add_directive(name, static_directive(directive), override=True)
+
+
+def report_stats(app, exception):
+    if any(_stats.values()):
+        logger.info(
+            "[static-api] %(static)d directives rendered from source, "
+            "%(imported)d through autodoc imports",
+            _stats,
+        )
+
+
+def setup(app):
+    app.setup_extension("sphinx.ext.autodoc")
+    app.add_config_value("static_api_import_modules", [], "env")
+    # After autodoc (500) and autodoc_cache (900) registered their directives
+    app.connect("config-inited", wrap_directives, priority=950)
+    app.connect("builder-inited", prefetch_modules)
+    app.connect("builder-inited", limit_autosummary, priority=450)
+    app.connect("build-finished", report_stats)
+    if "sphinx.ext.viewcode" in app.config.extensions:
+        app.connect("viewcode-find-source", find_source)
+        app.connect("viewcode-follow-imported", follow_imported)
+    return {"version": "1.0", "parallel_read_safe": True}
@@ -0,0 +1,389 @@
+"""Post-processing of built sites: fingerprinted, shared, precompressed statics
+
+Every (version, language) output ships its own ``_static`` directory, mostly
+identical across versions. ``optimize_site`` runs after all builds and
+
+* copies each ``_static`` file once into ``<site>/_assets`` under a name
+  carrying a hash of its content (``styles/theme.css`` becomes
+  ``styles/theme.<hash>.css``), so identical files of all versions are
+  stored once and can be cached forever;
+* rewrites the ``src``/``href`` references of the HTML pages, and the
+  ``url()`` references inside stylesheets, to those shared files;
+* removes the ``_static`` files the pages no longer use, so the deployed
+  site holds each of them once. Only ``RUNTIME_STATIC`` stays, and keeps
+  its references: scripts use those files by their ``_static/...`` URL or
+  name (the ask-ai modules import each other by name), which fingerprinting
+  would break. They become hardlinks to the shared files, which only saves
+  disk space locally, as deployments copy them;
+* writes ``.gz`` (and ``.br`` when the ``brotli`` package is installed)
+  siblings of HTML, CSS, JS and JSON files.
+
+Each output records in ``STATIC_MANIFEST`` the shared file of each of its
+``_static`` files, which lets it be processed again after its ``_static`` is
+gone; shared files no output uses any more are removed. An output is
+processed again whenever it was rebuilt; ``release_static`` must be called
+before Sphinx writes into a processed output so it never writes through the
+hardlinks.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip siblings are written
+    brotli = None
+
+SHARED_DIR = "_assets"  # Below the site root, next to the language dirs
+STATIC_MANIFEST = ".static_manifest.json"
+HASH_LEN = 12
+COMPRESS_SUFFIXES = {".html", ".css", ".js", ".json"}
+MIN_COMPRESS_SIZE = 1024  # Smaller files gain nothing from compression
+# Used by scripts through their _static URL (ask-ai-loader.js, and the index
+# toggles of doctools.js, which swap plus.png and minus.png), so kept there
+RUNTIME_STATIC = ("ask-ai/", "minus.png", "plus.png")
+
+FINGERPRINT_RE = re.compile(rf"^(.*)\.[0-9a-f]{{{HASH_LEN}}}((?:\.[^./]+)?)$")
+HTML_REF_RE = re.compile(
+    r"""(?P<attr>\b(?:src|href)=)(?P<quote>["'])(?P<url>[^"'?#]+)(?P<query>\?[^"'#]*)?"""
+)
+CSS_URL_RE = re.compile(
+    r"""url\(\s*(?P<quote>["']?)(?P<url>[^"')?#]+)(?P<query>[?#][^"')]*)?(?P=quote)\s*\)"""
+)
+
+
+def fingerprinted(rel: str, digest: str) -> str:
+    """``styles/theme.css`` -> ``styles/theme.<hash>.css``"""
+    head, name = posixpath.split(rel)
+    stem, ext = posixpath.splitext(name)
+    return posixpath.join(head, f"{stem}.{digest[:HASH_LEN]}{ext}")
+
+
+def original_name(rel: str) -> str:
+    """Inverse of ``fingerprinted``"""
+    match = FINGERPRINT_RE.match(rel)
+    return match.group(1) + match.group(2) if match else rel
+
+
+def is_local(url: str) -> bool:
+    return not (url.startswith(("/", "data:")) or "//" in url or ":" in url)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def temp_sibling(path: Path) -> Path:
+    """A new, unique file next to ``path``: outputs are processed in threads"""
+    fd, name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    return Path(name)
+
+
+def replace_file(path: Path, data: bytes):
+    """Write through a new inode: ``path`` may be a hardlink or cache copy"""
+    tmp = temp_sibling(path)
+    tmp.write_bytes(data)
+    shutil.copystat(path, tmp)
+    os.replace(tmp, path)
+
+
+def link_original(shared: Path, original: Path):
+    """Make ``original`` a hardlink of ``shared``, or leave it if linking fails"""
+    if os.path.samefile(shared, original):
+        return
+    tmp = temp_sibling(original)
+    tmp.unlink()
+    try:
+        os.link(shared, tmp)
+    except OSError:
+        return  # e.g. another filesystem: the copy stays
+    os.replace(tmp, original)
+
+
+def publish(shared: Path, data: bytes | None = None, source: Path | None = None):
+    """Store a shared file once; concurrent writers of the same name agree"""
+    if shared.exists():
+        return
+    shared.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_sibling(shared)
+    try:
+        if data is not None:
+            tmp.write_bytes(data)
+        else:
+            shutil.copy2(source, tmp)
+        os.replace(tmp, shared)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        # The name carries the content hash: another writer stored the same file
+        if not shared.exists():
+            raise
+
+
+def rewrite_css(text: str, rel: str, mapping: dict[str, str]) -> str:
+    """Point ``url()`` references of a stylesheet at fingerprinted files
+
+    The shared tree mirrors ``_static``, so only file names change.
+    """
+    base = posixpath.dirname(rel)
+
+    def replace(match):
+        url = match.group("url").strip()
+        if not is_local(url):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(base, url))
+        if target not in mapping:
+            return match.group(0)
+        new = posixpath.relpath(mapping[target], base or ".")
+        quote = match.group("quote")
+        return f"url({quote}{new}{quote})"
+
+    return CSS_URL_RE.sub(replace, text)
+
+
+def css_dependencies(text: str, rel: str) -> set[str]:
+    base = posixpath.dirname(rel)
+    return {
+        posixpath.normpath(posixpath.join(base, m.group("url").strip()))
+        for m in CSS_URL_RE.finditer(text)
+        if m.group("url").strip().endswith(".css") and is_local(m.group("url"))
+    }
+
+
+def fingerprint_static(static: Path, shared_root: Path) -> dict[str, str]:
+    """Publish the files of one ``_static`` dir; returns rel -> shared rel"""
+    mapping, stylesheets = {}, {}
+    for dirpath, _, filenames in os.walk(static):
+        for name in filenames:
+            path = Path(dirpath) / name
+            rel = path.relative_to(static).as_posix()
+            if name.endswith(".css"):
+                stylesheets[rel] = path.read_text(encoding="utf-8", errors="ignore")
+                continue
+            mapping[rel] = fingerprinted(rel, file_hash(path))
+            shared = shared_root / mapping[rel]
+            publish(shared, source=path)
+            if rel.startswith(RUNTIME_STATIC):
+                link_original(shared, path)
+
+    # Stylesheets last, and those importing others after their imports
+    while stylesheets:
+        ready = [
+            rel
+            for rel, text in stylesheets.items()
+            if not (css_dependencies(text, rel) & stylesheets.keys())
+        ] or list(
+            stylesheets
+        )  # Import cycle: leave the remaining refs as they are
+        for rel in ready:
+            data = rewrite_css(stylesheets.pop(rel), rel, mapping).encode("utf-8")
+            mapping[rel] = fingerprinted(rel, hashlib.sha256(data).hexdigest())
+            publish(shared_root / mapping[rel], data=data)
+    return mapping
+
+
+def rewrite_html(
+    page: Path, static: Path, shared_root: Path, mapping: dict[str, str]
+) -> bool:
+    """Point references to ``_static`` (or older shared files) at the shared files"""
+    text = page.read_text(encoding="utf-8")
+    page_dir = page.parent
+
+    def replace(match):
+        url = match.group("url")
+        if not is_local(url):
+            return match.group(0)
+        target = Path(os.path.normpath(page_dir / url))
+        if target.is_relative_to(static):
+            rel = target.relative_to(static).as_posix()
+        elif target.is_relative_to(shared_root):
+            rel = original_name(target.relative_to(shared_root).as_posix())
+        else:
+            return match.group(0)
+        if rel not in mapping or rel.startswith(RUNTIME_STATIC):
+            return match.group(0)
+        new = os.path.relpath(shared_root / mapping[rel], page_dir)
+        return match.group("attr") + match.group("quote") + Path(new).as_posix()
+
+    new_text = HTML_REF_RE.sub(replace, text)
+    if new_text == text:
+        return False
+    replace_file(page, new_text.encode("utf-8"))
+    return True
+
+
+def compress(path: str) -> int:
+    """Write ``.gz``/``.br`` siblings unless current; returns bytes saved"""
+    data = Path(path).read_bytes()
+    saved = 0
+    variants = [(".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+    mtime = os.stat(path).st_mtime_ns
+    for suffix, compressor in variants:
+        target = path + suffix
+        try:
+            if os.stat(target).st_mtime_ns >= mtime:
+                continue
+        except FileNotFoundError:
+            pass
+        packed = compressor(data)
+        if len(packed) >= len(data):
+            continue
+        Path(target).write_bytes(packed)
+        saved += len(data) - len(packed)
+    return saved
+
+
+def compressible(root: Path, skip: set[str] = frozenset()):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in skip]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if (
+                os.path.splitext(name)[1] in COMPRESS_SUFFIXES
+                and os.path.getsize(path) >= MIN_COMPRESS_SIZE
+            ):
+                yield path
+
+
+def read_manifest(out_dir: Path) -> dict:
+    try:
+        return json.loads((out_dir / STATIC_MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def drop_static(static: Path):
+    """Remove the ``_static`` files the rewritten pages no longer load"""
+    for dirpath, _, filenames in os.walk(static, topdown=False):
+        for name in filenames:
+            path = Path(dirpath) / name
+            if not path.relative_to(static).as_posix().startswith(RUNTIME_STATIC):
+                path.unlink()
+        if dirpath != str(static) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def process_output(out_dir: Path, site_dir: Path, build_key: str | None) -> dict:
+    """Fingerprint, share and rewrite one (version, language) output"""
+    static, shared_root = out_dir / "_static", site_dir / SHARED_DIR
+    previous = read_manifest(out_dir)
+    if build_key is not None and previous.get("build_key") == build_key:
+        return {"pages": 0, "files": 0, "skipped": True}
+    # Files dropped by an earlier run keep their shared file
+    mapping = dict(previous.get("mapping", {}))
+    if static.is_dir():
+        mapping.update(fingerprint_static(static, shared_root))
+    pages = 0
+    for dirpath, dirnames, filenames in os.walk(out_dir):
+        dirnames[:] = [d for d in dirnames if not d.startswith(("_static", "."))]
+        for name in filenames:
+            if name.endswith(".html"):
+                pages += rewrite_html(
+                    Path(dirpath) / name, static, shared_root, mapping
+                )
+    manifest = {
+        "build_key": build_key,
+        "assets": sorted(set(mapping.values())),
+        "mapping": mapping,
+    }
+    (out_dir / STATIC_MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+    if static.is_dir():
+        drop_static(static)
+    return {"pages": pages, "files": len(mapping), "skipped": False}
+
+
+def release_static(out_dir: Path):
+    """Drop the ``_static`` of a processed output before Sphinx rebuilds it
+
+    Sphinx copies every static file again on each build and would otherwise
+    write into the shared files through the hardlinks of ``RUNTIME_STATIC``.
+    """
+    if (out_dir / STATIC_MANIFEST).exists():
+        shutil.rmtree(out_dir / "_static", ignore_errors=True)
+        (out_dir / STATIC_MANIFEST).unlink()
+
+
+def prune_shared(site_dir: Path, out_dirs: list[Path]) -> int:
+    """Remove shared files (and their compressed siblings) no output uses"""
+    shared_root = site_dir / SHARED_DIR
+    used = set()
+    for out_dir in out_dirs:
+        used.update(read_manifest(out_dir).get("assets", []))
+    removed = 0
+    for dirpath, _, filenames in os.walk(shared_root):
+        for name in filenames:
+            path = Path(dirpath) / name
+            rel = path.relative_to(shared_root).as_posix()
+            if rel.endswith((".gz", ".br")):
+                rel = rel[:-3]
+            if rel not in used:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def count_shared(site_dir: Path) -> int:
+    return sum(
+        1
+        for _, _, filenames in os.walk(site_dir / SHARED_DIR)
+        for name in filenames
+        if not name.endswith((".gz", ".br"))
+    )
+
+
+def optimize_site(
+    site_dir: Path,
+    out_dirs: list[tuple[Path, str | None]],
+    jobs: int | None = None,
+    precompress: bool = True,
+    extra_roots: list[Path] = (),
+) -> str:
+    """Post-process every (output dir, build key); returns a one-line report
+
+    ``extra_roots`` are other directories of the site whose files are only
+    precompressed, such as the combined search indexes.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(
+            pool.map(lambda o: process_output(o[0], site_dir, o[1]), out_dirs)
+        )
+    removed = prune_shared(site_dir, [out_dir for out_dir, _ in out_dirs])
+
+    processed = [r for r in results if not r["skipped"]]
+    report = (
+        f"{len(processed)} outputs processed ({len(results) - len(processed)} "
+        f"unchanged), {sum(r['files'] for r in processed)} static files -> "
+        f"{count_shared(site_dir)} shared ({removed} pruned), "
+        f"{sum(r['pages'] for r in processed)} pages rewritten"
+    )
+    if not precompress:
+        return report
+    paths = [
+        path
+        for (out_dir, _), result in zip(out_dirs, results)
+        if not result["skipped"]
+        for path in compressible(out_dir, skip={"_static"})
+    ]
+    paths += list(compressible(site_dir / SHARED_DIR))
+    for root in extra_roots:
+        paths += list(compressible(root))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        saved = sum(pool.map(compress, paths, chunksize=16))
+
+    formats = "gzip+brotli" if brotli is not None else "gzip"
+    return f"{report}; {formats}: {len(paths)} files, {saved / (1 << 20):.1f} MiB saved"
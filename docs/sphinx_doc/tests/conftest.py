@@ -0,0 +1,71 @@
+"""Small git repositories shaped like the ones the docs build runs on"""
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+def git(cwd: Path, *args: str) -> str:
+    """Run git in ``cwd`` and return its stripped output"""
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit_files(repo: Path, files: dict[str, str], message: str) -> str:
+    """Write ``files`` (path -> text), commit them and return the commit"""
+    for rel, text in files.items():
+        path = repo / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    """Commit without depending on the user's git configuration"""
+    for kind in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{kind}_NAME", "docs")
+        monkeypatch.setenv(f"GIT_{kind}_EMAIL", "docs@example.com")
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+
+
+@pytest.fixture
+def origin(tmp_path) -> dict:
+    """A repository with two commits on ``main``, the first tagged ``v1.0.0``
+
+    Returns its path and the commits as ``{"path", "v1", "v2"}``.
+    """
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    v1 = commit_files(
+        repo,
+        {
+            "README.md": "# Project\n",
+            "docs/guide.md": "# Guide\n",
+            "docs/sphinx_doc/source/index.rst": "Index\n=====\n",
+            "data_juicer/__init__.py": '"""Package"""\n',
+            "data_juicer/core/base.py": "VALUE = 1\n",
+            "tools/run.py": "print('not needed by the docs')\n",
+        },
+        "v1",
+    )
+    git(repo, "tag", "-a", "v1.0.0", "-m", "v1.0.0")
+    v2 = commit_files(
+        repo, {"docs/guide.md": "# Guide\n\nMore.\n", "docs/new.md": "# New\n"}, "v2"
+    )
+    return {"path": repo, "v1": v1, "v2": v2}
+
+
+@pytest.fixture
+def ci_clone(tmp_path, origin) -> Path:
+    """A clone with ``origin/main`` but no local branch, as in CI checkouts"""
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", str(origin["path"]), str(clone))
+    git(clone, "checkout", "-q", "--detach")
+    git(clone, "branch", "-q", "-D", "main")
+    return clone
@@ -0,0 +1,87 @@
+import pytest
+from conftest import git
+
+import build_versions
+from refs import RefIndex
+
+
+@pytest.fixture
+def refs_of(monkeypatch):
+    """Make build_versions resolve refs in the given repository"""
+
+    def use(repo):
+        index = RefIndex.load("origin", fetch=False, cwd=repo)
+        monkeypatch.setattr(build_versions, "_ref_index", index)
+        return index
+
+    return use
+
+
+def test_unresolved_ref_is_reported_before_checkout(
+    refs_of, ci_clone, tmp_path, monkeypatch
+):
+    refs_of(ci_clone)
+    monkeypatch.setattr(build_versions, "WORKTREES_DIR", tmp_path / "worktrees")
+    with pytest.raises(ValueError, match="'mian'"):
+        build_versions.prepare_worktree("mian", "mian")
+    assert not (tmp_path / "worktrees").exists()
+
+
+def test_remote_only_branch_resolves_to_its_commit(refs_of, ci_clone, origin):
+    refs_of(ci_clone)
+    assert build_versions.resolve_commit("main") == origin["v2"]
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    """A docs template of its own, so its hash only changes when a test edits it"""
+    root = tmp_path / "template_repo"
+    docs = root / build_versions.DOCS_REL
+    docs.mkdir(parents=True)
+    (docs / "conf.py").write_text("project = 'x'\n", encoding="utf-8")
+    monkeypatch.setattr(build_versions, "REPO_ROOT", root)
+    return docs
+
+
+def keys(refs, langs=("en", "zh_CN"), read_options=None):
+    return build_versions.compute_build_keys(refs, list(langs), True, read_options)
+
+
+def test_build_keys_of_resolved_refs(refs_of, ci_clone, template):
+    refs_of(ci_clone)
+    result = keys([("main", "latest"), ("v1.0.0", "v1.0.0"), ("gone", "gone")])
+    assert set(result) == {
+        ("latest", "en"),
+        ("latest", "zh_CN"),
+        ("v1.0.0", "en"),
+        ("v1.0.0", "zh_CN"),
+    }
+    assert len(set(result.values())) == 4
+    assert keys([("main", "latest")]) == {
+        k: v for k, v in result.items() if k[0] == "latest"
+    }
+
+
+def test_build_keys_follow_their_inputs(
+    refs_of, ci_clone, origin, template, monkeypatch
+):
+    monkeypatch.setenv("PROJECT", "data-juicer")
+    refs_of(ci_clone)
+
+    def key(**read_options):
+        return keys([("main", "latest")], read_options=read_options)[("latest", "en")]
+
+    before = key()
+    assert key() == before
+    git(ci_clone, "update-ref", "refs/remotes/origin/main", origin["v1"])
+    refs_of(ci_clone)
+    moved = key()
+    assert moved != before
+
+    assert key(mode="static") != moved
+    monkeypatch.setenv("PROJECT", "other-project")
+    assert key() != moved
+    monkeypatch.setenv("PROJECT", "data-juicer")
+    assert key() == moved
+    (template / "conf.py").write_text("project = 'y'\n", encoding="utf-8")
+    assert key() != moved
@@ -0,0 +1,72 @@
+import pytest
+from conftest import git
+
+from checkout import CHECKOUT_MODES, STAMP_FILE, CheckoutSpec, materialize, read_stamp
+
+SPEC = CheckoutSpec(package_dir="data_juicer", exclude_dirs={"node_modules"})
+NEEDED = [
+    "README.md",
+    "docs/guide.md",
+    "docs/sphinx_doc/source/index.rst",
+    "data_juicer/core/base.py",
+]
+
+
+@pytest.fixture
+def in_clone(ci_clone, monkeypatch):
+    """Checkouts run git in the current directory, the repository's root"""
+    monkeypatch.chdir(ci_clone)
+    return ci_clone
+
+
+def files_below(root):
+    return sorted(
+        p.relative_to(root).as_posix()
+        for p in root.rglob("*")
+        if p.is_file() and ".git" not in p.parts and p.name != STAMP_FILE
+    )
+
+
+@pytest.mark.parametrize("mode", CHECKOUT_MODES)
+def test_created_with_the_needed_files(in_clone, origin, tmp_path, mode):
+    dest = tmp_path / "wt"
+    assert materialize("main", origin["v2"], dest, mode, SPEC) == "created"
+    files = files_below(dest)
+    assert set(NEEDED) | {"docs/new.md"} <= set(files)
+    # Only a full worktree holds what the docs build does not read
+    assert ("tools/run.py" in files) == (mode == "worktree")
+    assert read_stamp(dest)["commit"] == origin["v2"]
+
+
+@pytest.mark.parametrize("mode", CHECKOUT_MODES)
+def test_reused_then_updated_in_place(in_clone, origin, tmp_path, mode):
+    dest = tmp_path / "wt"
+    materialize("main", origin["v2"], dest, mode, SPEC)
+    marker = dest / "docs" / "guide.md"
+    mtime = marker.stat().st_mtime_ns
+    assert materialize("main", origin["v2"], dest, mode, SPEC) == "reused"
+    assert marker.stat().st_mtime_ns == mtime
+
+    assert materialize("v1.0.0", origin["v1"], dest, mode, SPEC) == "updated"
+    assert not (dest / "docs" / "new.md").exists()
+    assert marker.read_text(encoding="utf-8") == "# Guide\n"
+    assert read_stamp(dest)["commit"] == origin["v1"]
+
+
+@pytest.mark.parametrize("mode", CHECKOUT_MODES)
+def test_other_spec_or_mode_starts_over(in_clone, origin, tmp_path, mode):
+    dest = tmp_path / "wt"
+    materialize("main", origin["v2"], dest, mode, CheckoutSpec())
+    assert materialize("main", origin["v2"], dest, mode, SPEC) == "created"
+    assert "data_juicer/core/base.py" in files_below(dest)
+    other = CHECKOUT_MODES[(CHECKOUT_MODES.index(mode) + 1) % len(CHECKOUT_MODES)]
+    assert materialize("main", origin["v2"], dest, other, SPEC) == "created"
+    assert read_stamp(dest)["spec"]["mode"] == other
+
+
+@pytest.mark.parametrize("mode", ["worktree", "sparse"])
+def test_worktrees_are_detached(in_clone, origin, tmp_path, mode):
+    dest = tmp_path / "wt"
+    materialize("main", origin["v2"], dest, mode, SPEC)
+    assert git(dest, "rev-parse", "HEAD") == origin["v2"]
+    assert git(dest, "branch", "--show-current") == ""
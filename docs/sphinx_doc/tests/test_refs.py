@@ -0,0 +1,51 @@
+from conftest import git
+
+from refs import RefIndex, load_previous
+
+
+def test_branch_only_on_the_remote(ci_clone, origin):
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert index.branches == []
+    assert index.resolve("main") == origin["v2"]
+    assert index.resolve("origin/main") == origin["v2"]
+
+
+def test_local_branch_wins_over_the_remote(ci_clone, origin):
+    git(ci_clone, "branch", "main", origin["v1"])
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert index.resolve("main") == origin["v1"]
+
+
+def test_fetched_remote_first(ci_clone, origin):
+    git(ci_clone, "update-ref", "refs/remotes/fork/main", origin["v1"])
+    assert RefIndex.load("origin", False, ci_clone).resolve("main") == origin["v2"]
+    assert RefIndex.load("fork", False, ci_clone).resolve("main") == origin["v1"]
+
+
+def test_tags_are_peeled(ci_clone, origin):
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert index.tags == ["v1.0.0"]
+    assert index.resolve("v1.0.0") == origin["v1"]
+
+
+def test_head_is_the_local_checkout(ci_clone, origin):
+    git(ci_clone, "checkout", "-q", "--detach", origin["v1"])
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert index.resolve("HEAD") == origin["v1"]
+
+
+def test_other_revisions_and_unknown_refs(ci_clone, origin):
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert index.resolve(origin["v1"][:10]) == origin["v1"]
+    assert index.resolve("origin/main~1") == origin["v1"]
+    assert index.resolve("no-such-branch") is None
+
+
+def test_moved_since(ci_clone, origin, tmp_path):
+    index = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    saved = tmp_path / "refs.json"
+    index.save(saved)
+    git(ci_clone, "update-ref", "refs/remotes/origin/main", origin["v1"])
+    moved = RefIndex.load("origin", fetch=False, cwd=ci_clone)
+    assert "origin/main" in moved.moved_since(load_previous(saved))
+    assert "v1.0.0" not in moved.moved_since(load_previous(saved))
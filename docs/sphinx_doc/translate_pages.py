@@ -0,0 +1,599 @@
+"""Machine translation of the Markdown pages that have no ``_ZH`` counterpart
+
+The zh_CN site falls back to the English page wherever ``a/b.md`` has no
+``a/b_ZH.md``. ``translate_missing`` runs on an assembled Sphinx source
+directory before the builds and writes a translated ``_ZH`` sibling for
+each of those pages:
+
+* a page is split into segments: paragraphs, headings, list items and
+  table cells. Fenced code, math, HTML blocks and link definitions are kept
+  as they are, and inside a segment inline code, roles, URLs, HTML tags and
+  link targets are replaced by placeholders before translation;
+* the segments of all pages are translated in batches, several batches at a
+  time. Each translation is stored in a persistent cache keyed by the hash of
+  the source text, so a later run only translates new or edited segments;
+* links to pages that have a Chinese version point to it, and heading
+  anchors are mapped to those of the translated headings. The mapping is
+  also saved to ``ANCHORS_FILE`` for the ``zh-page-link`` rewrite rule of
+  ``conf.py``, which points the links of hand-written ``_ZH`` pages there.
+
+A generated page starts with ``MARKER``: it is rewritten when its source
+changes and removed with it, while a real translation added later replaces
+it and is never touched. A segment whose translation fails or loses a
+placeholder stays in English and is not cached.
+
+The backend is ``translators:<engine>`` (the ``translators`` package) or
+``<module>:<function>``, any function translating a list of texts, e.g. a
+local stand-in for tests::
+
+    python translate_pages.py source --backend my_stub:translate --cache /tmp/t
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from myst_parser.mdit_to_docutils.base import default_slugify
+
+DEFAULT_BACKEND = "translators:alibaba"
+SOURCE_LANG, TARGET_LANG = "en", "zh"
+MARKER = "<!-- machine-translated -->"
+# English heading anchor -> translated one per page, for links from other pages
+ANCHORS_FILE = ".translation_anchors.json"
+NOTICE = "```{note}\n本页由英文文档机器翻译生成，内容仅供参考，请以英文原文为准。\n```"
+BATCH_SEGMENTS = 40  # Segments per backend request
+BATCH_CHARS = 4000  # Characters per backend request
+CONCURRENCY = 8  # Backend requests in flight
+SEPARATOR = "\n\n"  # Between the segments of a batch sent as one text
+# Directories of the source dir that hold no translatable pages
+SKIP_DIRS = {"api", "extra", "build"}
+# Fenced directives whose content is Markdown to translate
+ADMONITIONS = {
+    "admonition",
+    "attention",
+    "caution",
+    "danger",
+    "error",
+    "hint",
+    "important",
+    "note",
+    "seealso",
+    "tip",
+    "warning",
+}
+
+FENCE_RE = re.compile(r"^\s*(?P<fence>`{3,}|~{3,})\s*(?:\{(?P<directive>[\w-]+)\})?")
+HEADING_RE = re.compile(r"^(?P<prefix>#{1,6}\s+)(?P<text>.*)$")
+PREFIX_RE = re.compile(
+    r"^(?P<prefix>\s*(?:>\s*)*(?:[-*+]\s+(?:\[[ xX]\]\s+)?|\d+[.)]\s+)?)"
+)
+TABLE_SEP_RE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+LINK_DEF_RE = re.compile(r"^\s*\[[^\]]+\]:\s")
+# Parts of a segment that are never translated; the link target is group "target"
+PROTECT_RE = re.compile(
+    r"\{[\w:-]+\}`[^`]*`"  # MyST role
+    r"|`+[^`\n]*`+"  # Inline code
+    r"|\]\((?P<target>[^)\s]*)(?:\s+\"[^\"]*\")?\)"  # Link or image target
+    r"|<https?://[^>]+>|https?://[^\s)>\]]+"  # URLs
+    r"|<[^>\n]+>"  # Inline HTML
+    r"|\$[^$\n]+\$"  # Inline math
+)
+PLACEHOLDER_RE = re.compile(r"[{｛]{2}\s*(\d+)\s*[}｝]{2}")
+LETTER_RE = re.compile(r"[A-Za-z]{2}")
+LINK_TEXT_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+
+
+@dataclass
+class Segment:
+    """Translatable text with placeholders for its protected parts"""
+
+    text: str
+    protected: list[str] = field(default_factory=list)
+    heading: str | None = None  # Slug source of a heading
+
+
+def protect(text: str) -> Segment:
+    protected = []
+
+    def replace(match):
+        protected.append(match.group(0))
+        return "{{%d}}" % (len(protected) - 1)
+
+    return Segment(PROTECT_RE.sub(replace, text), protected)
+
+
+def translatable(text: str) -> Segment | str:
+    """A segment, or the text itself if there is nothing to translate"""
+    segment = protect(text.strip())
+    if not LETTER_RE.search(PLACEHOLDER_RE.sub("", segment.text)):
+        return text
+    return segment
+
+
+def heading_slug_text(text: str) -> str:
+    """Text MyST builds a heading anchor from: no markup, link text only"""
+    return LINK_TEXT_RE.sub(r"\1", text).replace("`", "").replace("*", "").strip()
+
+
+def split_page(text: str) -> list:
+    """Lines and segments of a page; a line item is a list of str/Segment"""
+    items = []
+    lines = text.split("\n")
+    fences = []  # Open admonition fences
+    paragraph = None  # Item whose last segment continuation lines join
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        stripped = line.strip()
+        fence = FENCE_RE.match(line)
+        if i == 1 and stripped == "---":  # Front matter
+            end = lines.index("---", 1) + 1 if "---" in lines[1:] else 1
+            items.append(["\n".join(lines[:end])])
+            i, paragraph = end, None
+            continue
+        if fences and stripped.startswith(fences[-1]) and not stripped.strip("`~"):
+            fences.pop()
+            items.append([line])
+            paragraph = None
+            continue
+        if fence:
+            paragraph = None
+            if fence["directive"] in ADMONITIONS:
+                fences.append(fence["fence"])
+                items.append([line])
+                continue
+            block = [line]  # Verbatim up to the closing fence
+            while i < len(lines):
+                block.append(lines[i])
+                i += 1
+                closing = block[-1].strip()
+                if closing.startswith(fence["fence"]) and not closing.strip("`~"):
+                    break
+            items.append(["\n".join(block)])
+            continue
+        if stripped.startswith("$$"):
+            block = [line]
+            closed = len(stripped) > 2 and stripped.endswith("$$")
+            while not closed and i < len(lines):
+                block.append(lines[i])
+                closed = lines[i].strip().endswith("$$")
+                i += 1
+            items.append(["\n".join(block)])
+            paragraph = None
+            continue
+        if (
+            not stripped
+            or stripped.startswith("<")
+            or LINK_DEF_RE.match(line)
+            or (stripped.startswith(":") and fences)  # Directive option
+            or TABLE_SEP_RE.match(line)
+            or (stripped.startswith("(") and stripped.endswith(")="))  # Label
+        ):
+            items.append([line])
+            paragraph = None
+            continue
+        if stripped.startswith("|"):
+            items.append(table_row(line.split("|")))
+            paragraph = None
+            continue
+        heading = HEADING_RE.match(line)
+        if heading:
+            segment = translatable(heading["text"])
+            if isinstance(segment, Segment):
+                segment.heading = heading_slug_text(heading["text"])
+            items.append([heading["prefix"], segment])
+            paragraph = None
+            continue
+        prefix = PREFIX_RE.match(line)["prefix"]
+        if paragraph is not None and not prefix.strip():
+            # Continuation of the previous paragraph or list item
+            last = paragraph[-1]
+            if isinstance(last, Segment):
+                paragraph[-1] = protect(
+                    restore(last.text, last.protected) + " " + stripped
+                )
+                continue
+        item = [prefix, translatable(line[len(prefix) :])]
+        items.append(item)
+        paragraph = item
+    return items
+
+
+def table_row(cells: list[str]) -> list:
+    """Items of a table row: the cell separators and one segment per cell"""
+    item = [cells[0]]
+    for cell in cells[1:-1]:
+        item.append("|")
+        segment = translatable(cell)
+        if isinstance(segment, Segment):
+            item += [" ", segment, " "]
+        else:
+            item.append(cell)
+    if len(cells) > 1:
+        item += ["|", cells[-1]]
+    return item
+
+
+def restore(text: str, protected: list[str]) -> str:
+    return PLACEHOLDER_RE.sub(lambda m: protected[int(m.group(1))], text)
+
+
+def segment_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SegmentCache:
+    """Translations of one backend, keyed by the hash of the source text
+
+    Stored as JSON lines in ``<cache_dir>/<backend>.jsonl``; new entries are
+    appended. One instance per file is shared by the threads of a run.
+    """
+
+    _instances: dict[Path, "SegmentCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: dict[str, str] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["text"]
+                    except (ValueError, KeyError):
+                        continue  # Truncated line of an interrupted run
+        except OSError:
+            pass
+
+    @classmethod
+    def open(cls, cache_dir: Path, backend: str) -> "SegmentCache":
+        name = re.sub(r"[^\w.-]+", "_", backend)
+        path = Path(cache_dir) / f"{name}.{SOURCE_LANG}-{TARGET_LANG}.jsonl"
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def get(self, text: str) -> str | None:
+        return self.entries.get(segment_key(text))
+
+    def add(self, translations: dict[str, str]):
+        """Store source text -> translation pairs"""
+        with self.lock:
+            lines = []
+            for source, text in translations.items():
+                key = segment_key(source)
+                if self.entries.get(key) != text:
+                    self.entries[key] = text
+                    lines.append(json.dumps({"key": key, "text": text}) + "\n")
+            if lines:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+
+
+def translators_backend(engine: str):
+    def translate(texts: list[str], source: str, target: str) -> list[str]:
+        # Imported on first use: the package sets up its sessions on import
+        import translators
+
+        joined = translators.translate_text(
+            SEPARATOR.join(texts),
+            translator=engine,
+            from_language=source,
+            to_language=target,
+        )
+        parts = [p.strip() for p in re.split(r"\n\s*\n", joined)]
+        if len(parts) == len(texts):
+            return parts
+        # The service merged or split paragraphs: one request per segment
+        return [
+            translators.translate_text(
+                text, translator=engine, from_language=source, to_language=target
+            )
+            for text in texts
+        ]
+
+    return translate
+
+
+def load_backend(spec: str):
+    """Translation function ``(texts, source, target) -> texts`` of a backend"""
+    module, _, name = spec.partition(":")
+    if module == "translators":
+        return translators_backend(name or "alibaba")
+    if not name:
+        raise ValueError(f"Backend must be translators:<engine> or module:function")
+    return getattr(importlib.import_module(module), name)
+
+
+def batches(texts: list[str]):
+    batch, size = [], 0
+    for text in texts:
+        if batch and (len(batch) >= BATCH_SEGMENTS or size + len(text) > BATCH_CHARS):
+            yield batch
+            batch, size = [], 0
+        batch.append(text)
+        size += len(text)
+    if batch:
+        yield batch
+
+
+def valid(segment_text: str, translation: str) -> bool:
+    """Whether a translation kept every placeholder exactly once"""
+    expected = sorted(PLACEHOLDER_RE.findall(segment_text))
+    return (
+        bool(translation.strip())
+        and sorted(PLACEHOLDER_RE.findall(translation)) == expected
+    )
+
+
+def translate_segments(
+    texts: set[str], backend, cache: SegmentCache, jobs: int, counts: dict, log=None
+) -> dict[str, str]:
+    """Translations of ``texts``: from the cache, the rest from the backend"""
+    result = {}
+    missing = []
+    for text in sorted(texts):
+        cached = cache.get(text)
+        if cached is None:
+            missing.append(text)
+        else:
+            result[text] = cached
+    counts["cached"] += len(result)
+
+    def run_batch(batch):
+        try:
+            translated = backend(batch, SOURCE_LANG, TARGET_LANG)
+        except Exception as e:  # Network, quota, ...: the batch stays English
+            log_print(f"[TRANSLATE] batch of {len(batch)} failed: {e}", log)
+            return {}
+        return {
+            source: text
+            for source, text in zip(batch, translated)
+            if isinstance(text, str) and valid(source, text)
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for done in pool.map(run_batch, batches(missing)):
+            cache.add(done)
+            result.update(done)
+            counts["translated"] += len(done)
+    counts["failed"] += len(missing) - (len(result) - counts["cached"])
+    return result
+
+
+def log_print(message: str, log=None):
+    """Print a progress message to the console or to a job log"""
+    if log is None:
+        print(message)
+    else:
+        log.write(message + "\n")
+        log.flush()
+
+
+def zh_name(rel: str) -> str:
+    base, ext = os.path.splitext(rel)
+    return f"{base}_ZH{ext}"
+
+
+def is_generated(path: Path) -> bool:
+    """Whether a ``_ZH`` file was written by this module"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.readline().rstrip("\n") == MARKER
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def find_pages(src: Path) -> tuple[list[str], set[str]]:
+    """Pages to translate and every page that has a Chinese version
+
+    Both as posix paths relative to ``src``; generated translations of pages
+    that no longer exist are removed.
+    """
+    pages, chinese = [], set()
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel_dir = Path(dirpath).relative_to(src)
+        dirnames[:] = sorted(
+            d
+            for d in dirnames
+            if not d.startswith((".", "_")) and (rel_dir.parts or d not in SKIP_DIRS)
+        )
+        names = set(filenames)
+        for name in sorted(names):
+            rel = (rel_dir / name).as_posix()
+            if name.endswith("_ZH.md"):
+                english = name[: -len("_ZH.md")] + ".md"
+                if english not in names and is_generated(Path(dirpath) / name):
+                    (Path(dirpath) / name).unlink()
+                continue
+            if not name.endswith(".md"):
+                continue
+            zh = zh_name(name)
+            if zh not in names or is_generated(Path(dirpath) / zh):
+                pages.append(rel)
+            chinese.add(rel)
+    return pages, chinese
+
+
+def heading_slugs(items: list, translations: dict[str, str]) -> dict[str, str]:
+    """English anchor -> anchor of the translated heading, for one page"""
+    mapping, seen_en, seen_zh = {}, set(), set()
+
+    def unique(slug, seen):
+        base, n = slug, 1
+        while slug in seen:
+            slug, n = f"{base}-{n}", n + 1
+        seen.add(slug)
+        return slug
+
+    for item in items:
+        for part in item:
+            if isinstance(part, Segment) and part.heading is not None:
+                en = unique(default_slugify(part.heading), seen_en)
+                text = translations.get(part.text)
+                zh = restore(text, part.protected) if text else part.heading
+                mapping[en] = unique(default_slugify(heading_slug_text(zh)), seen_zh)
+    return mapping
+
+
+def render_page(
+    rel: str,
+    items: list,
+    translations: dict[str, str],
+    chinese: set[str],
+    slugs: dict[str, dict[str, str]],
+) -> str:
+    """The translated page; links point to Chinese pages and anchors"""
+    page_dir = os.path.dirname(rel)
+
+    def link(target: str) -> str:
+        path, hash_, fragment = target.partition("#")
+        if "://" in path or path.startswith(("/", "mailto:")):
+            return target
+        if path:
+            resolved = os.path.normpath(os.path.join(page_dir, path)).replace(
+                os.sep, "/"
+            )
+            if not path.endswith(".md") or resolved not in chinese:
+                return target
+            anchors = slugs.get(resolved, {})
+            path = zh_name(path)
+        else:
+            anchors = slugs.get(rel, {})
+        if fragment:
+            fragment = anchors.get(fragment, fragment)
+        return path + hash_ + fragment
+
+    def protected_part(part: str) -> str:
+        match = PROTECT_RE.fullmatch(part)
+        if match and match["target"] is not None:
+            return part.replace(match["target"], link(match["target"]), 1)
+        return part
+
+    out = []
+    for item in items:
+        line = []
+        for part in item:
+            if isinstance(part, str):
+                line.append(part)
+                continue
+            text = translations.get(part.text, part.text)
+            line.append(
+                PLACEHOLDER_RE.sub(
+                    lambda m: protected_part(part.protected[int(m.group(1))]), text
+                )
+            )
+        out.append("".join(line))
+    text = "\n".join(out)
+    # The notice goes below the title, which must stay the first heading
+    title = re.search(r"^#\s.*$", text, re.MULTILINE)
+    at = title.end() if title else 0
+    return f"{MARKER}\n{text[:at]}\n\n{NOTICE}\n\n{text[at:].lstrip()}"
+
+
+def translate_missing(
+    src: Path,
+    backend: str = DEFAULT_BACKEND,
+    cache_dir: Path | None = None,
+    jobs: int = CONCURRENCY,
+    log=None,
+) -> dict:
+    """Write a translated ``_ZH`` page for every page of ``src`` without one"""
+    src = Path(src)
+    translate = load_backend(backend)
+    cache = SegmentCache.open(cache_dir or src / ".translations", backend)
+    pages, chinese = find_pages(src)
+    counts = {
+        "pages": len(pages),
+        "written": 0,
+        "segments": 0,
+        "cached": 0,
+        "translated": 0,
+        "failed": 0,
+    }
+
+    parsed = {}
+    for rel in pages:
+        parsed[rel] = split_page((src / rel).read_text(encoding="utf-8"))
+    texts = {
+        part.text
+        for items in parsed.values()
+        for item in items
+        for part in item
+        if isinstance(part, Segment)
+    }
+    counts["segments"] = len(texts)
+    translations = translate_segments(texts, translate, cache, jobs, counts, log)
+
+    slugs = {rel: heading_slugs(items, translations) for rel, items in parsed.items()}
+    for rel, items in parsed.items():
+        text = render_page(rel, items, translations, chinese, slugs)
+        target = src / zh_name(rel)
+        try:
+            if target.read_text(encoding="utf-8") == text:
+                continue  # Keep the mtime for incremental builds
+        except OSError:
+            pass
+        target.write_text(text, encoding="utf-8")
+        counts["written"] += 1
+
+    anchors = {
+        rel: {en: zh for en, zh in mapping.items() if en != zh}
+        for rel, mapping in sorted(slugs.items())
+    }
+    data = json.dumps({rel: m for rel, m in anchors.items() if m}, indent=1)
+    path = src / ANCHORS_FILE
+    try:
+        unchanged = path.read_text(encoding="utf-8") == data
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        path.write_text(data, encoding="utf-8")
+    return counts
+
+
+def summarize(counts: dict) -> str:
+    return (
+        "{pages} pages ({written} written), {segments} segments: {cached} cached, "
+        "{translated} translated, {failed} left in English".format(**counts)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Translate the pages of a Sphinx source dir that have no _ZH page"
+    )
+    parser.add_argument("source_dir", type=Path, help="Sphinx source directory")
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        help="translators:<engine> or module:function (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Segment cache directory (default: SOURCE_DIR/.translations)",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+    counts = translate_missing(args.source_dir, args.backend, args.cache, args.jobs)
+    print(f"[TRANSLATE] {summarize(counts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())